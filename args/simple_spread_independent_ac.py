@@ -1,6 +1,4 @@
 from collections import namedtuple
-from multiagent.environment import MultiAgentEnv
-import multiagent.scenarios as scenario
 from utilities.gym_wrapper import *
 import numpy as np
 from aux import *
@@ -18,55 +16,69 @@ scenario_name = 'simple_spread'
 aux_args = AuxArgs[model_name]()
 alias = '_new_1'
 
-'''load scenario from script'''
-scenario = scenario.load(scenario_name+".py").Scenario()
-
-'''create world'''
-world = scenario.make_world()
-
-'''create multiagent environment'''
-env = MultiAgentEnv(world, scenario.reset_world, scenario.reward, scenario.observation, info_callback=None, shared_viewer=True)
-env = GymWrapper(env)
+'''define the environment, built when train.py or test.py calls make_env'''
+def make_env():
+    from multiagent.environment import MultiAgentEnv
+    import multiagent.scenarios as scenario
+    # load scenario from script
+    sc = scenario.load(scenario_name+".py").Scenario()
+    # create world
+    world = sc.make_world()
+    # create multiagent environment
+    env = MultiAgentEnv(world, sc.reset_world, sc.reward, sc.observation, info_callback=None, shared_viewer=True)
+    return GymWrapper(env)
 
 MergeArgs = namedtuple('MergeArgs', Args._fields+AuxArgs[model_name]._fields)
 
-# under offline trainer if set batch_size=replay_buffer_size=update_freq -> epoch update
-args = Args(model_name=model_name,
-            agent_num=env.get_num_of_agents(),
-            hid_size=32,
-            obs_size=np.max(env.get_shape_of_obs()),
-            continuous=False,
-            action_dim=np.max(env.get_output_shape_of_act()),
-            init_std=0.1,
-            policy_lrate=1e-6,
-            value_lrate=1e-5,
-            max_steps=200,
-            batch_size=100,
-            gamma=0.9,
-            normalize_advantages=False,
-            entr=1e-2,
-            entr_inc=0.0,
-            action_num=np.max(env.get_input_shape_of_act()),
-            q_func=True,
-            train_episodes_num=int(5e3),
-            replay=True,
-            replay_buffer_size=1e4,
-            replay_warmup=0,
-            cuda=True,
-            grad_clip=True,
-            save_model_freq=10,
-            target=True,
-            target_lr=1e-1,
-            behaviour_update_freq=100,
-            critic_update_times=10,
-            target_update_freq=200,
-            gumbel_softmax=False,
-            epsilon_softmax=False,
-            online=True,
-            reward_record_type='episode_mean_step',
-            shared_parameters=False
-           )
-
-args = MergeArgs(*(args+aux_args))
+def make_args(env):
+    '''
+    return the arguments with the number of agents and the sizes of the observations and the actions of env
+    '''
+    # under offline trainer if set batch_size=replay_buffer_size=update_freq -> epoch update
+    args = Args(model_name=model_name,
+                agent_num=env.get_num_of_agents(),
+                hid_size=32,
+                obs_size=np.max(env.get_shape_of_obs()),
+                continuous=False,
+                action_dim=np.max(env.get_output_shape_of_act()),
+                init_std=0.1,
+                policy_lrate=1e-6,
+                value_lrate=1e-5,
+                max_steps=200,
+                batch_size=100,
+                gamma=0.9,
+                normalize_advantages=False,
+                entr=1e-2,
+                entr_inc=0.0,
+                action_num=np.max(env.get_input_shape_of_act()),
+                q_func=True,
+                train_episodes_num=int(5e3),
+                replay=True,
+                replay_buffer_size=1e4,
+                replay_buffer_path=None,
+                replay_warmup=0,
+                prioritized_replay=False,
+                prioritized_replay_beta=0.4,
+                prioritized_replay_beta_steps=int(1e6),
+                cuda=True,
+                grad_clip=True,
+                save_model_freq=10,
+                target=True,
+                target_lr=1e-1,
+                behaviour_update_freq=100,
+                critic_update_times=10,
+                target_update_freq=200,
+                gumbel_softmax=False,
+                epsilon_softmax=False,
+                online=True,
+                num_envs=1,
+                actor_num=0,
+                sync_interval=100,
+                queue_depth=1000,
+                reward_record_type='episode_mean_step',
+                shared_parameters=False,
+                fused_optimizer=False
+               )
+    return MergeArgs(*(args+aux_args))
 
 log_name = scenario_name + '_' + model_name + alias
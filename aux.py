@@ -1,9 +1,22 @@
 from collections import namedtuple
-from models.maddpg import *
-from models.sqddpg import *
-from models.independent_ac import *
-from models.independent_ddpg import *
-from models.coma_fc import *
+
+
+
+class LazyRegistry(dict):
+    '''
+    map the names to 'module:attribute' paths, the module of an entry is only imported when the entry is first looked up
+    '''
+
+    def __getitem__(self, name):
+        value = dict.__getitem__(self, name)
+        if isinstance(value, str):
+            module, attribute = value.split(':')
+            value = getattr(__import__(module, fromlist=[attribute]), attribute)
+            self[name] = value
+        return value
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
 
 
 
@@ -11,7 +24,7 @@ maddpgArgs = namedtuple( 'maddpgArgs', [] )
 
 randomArgs = namedtuple( 'randomArgs', [] )
 
-sqddpgArgs = namedtuple( 'sqddpgArgs', ['sample_size'] )
+sqddpgArgs = namedtuple( 'sqddpgArgs', ['sample_size', 'shapley_mode', 'coalition_pool_size', 'coalition_refresh_freq'] ) # shapley_mode: sample|exact|stratified|antithetic
 
 independentArgs = namedtuple( 'independentArgs', [] )
 
@@ -19,12 +32,12 @@ comafcArgs = namedtuple( 'comafcArgs', [] )
 
 
 
-Model = dict(maddpg=MADDPG,
-             sqddpg=SQDDPG,
-             independent_ac=IndependentAC,
-             independent_ddpg=IndependentDDPG,
-             coma_fc=COMAFC
-            )
+Model = LazyRegistry(maddpg='models.maddpg:MADDPG',
+                     sqddpg='models.sqddpg:SQDDPG',
+                     independent_ac='models.independent_ac:IndependentAC',
+                     independent_ddpg='models.independent_ddpg:IndependentDDPG',
+                     coma_fc='models.coma_fc:COMAFC'
+                    )
 
 
 
@@ -66,7 +79,11 @@ Args = namedtuple('Args', ['model_name',
                            'train_episodes_num',
                            'replay',
                            'replay_buffer_size',
+                           'replay_buffer_path', # None keeps the online replay buffer in memory, otherwise a directory of memmap files
                            'replay_warmup',
+                           'prioritized_replay', # boolean, sum-tree prioritized sampling of the online replay buffer
+                           'prioritized_replay_beta', # the importance sampling exponent at the start, annealed linearly to 1
+                           'prioritized_replay_beta_steps', # the number of transitions over which the exponent reaches 1
                            'cuda',
                            'grad_clip',
                            'save_model_freq', # episodes
@@ -78,7 +95,12 @@ Args = namedtuple('Args', ['model_name',
                            'gumbel_softmax',
                            'epsilon_softmax',
                            'online',
+                           'num_envs', # the number of environment copies stepped in worker processes, 1 steps the environment in the main process
+                           'actor_num', # the number of asynchronous actor processes feeding the learner, 0 trains synchronously
+                           'sync_interval', # steps between two weight syncs of an asynchronous actor
+                           'queue_depth', # the maximal number of transitions queued by the asynchronous actors, in chunks of at most sync_interval
                            'reward_record_type',
-                           'shared_parameters' # boolean
+                           'shared_parameters', # boolean
+                           'fused_optimizer' # boolean, one backward and one foreach adam over all agents
                           ]
                  )
@@ -0,0 +1,71 @@
+# python -m benchmarks.action_path_benchmark
+import torch
+import numpy as np
+import argparse
+from benchmarks.common import *
+from utilities.util import *
+from environments.predator_prey_env import PredatorPreyEnv, BatchedPredatorPreyEnv
+from environments.traffic_junction_env import TrafficJunctionEnv, BatchedTrafficJunctionEnv
+from multiagent.environment import MultiAgentEnv, VectorizedMultiAgentEnv
+import multiagent.scenarios as scenario
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the action selection, the translation and the environment step of the one-hot and the index paths.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed steps.')
+argv = parser.parse_args()
+
+
+
+def check_action_forms(make_env, shape, naction, steps=5):
+    '''
+    step copies of an environment from the same seed with index, integer one-hot and float one-hot actions,
+    and return whether the observations and the rewards are the same
+    '''
+    index = np.random.RandomState(1).randint(naction, size=(steps,)+shape)
+    transitions = []
+    for dtype in [None, int, float]:
+        np.random.seed(0)
+        env = make_env()
+        env.reset()
+        transitions.append([])
+        for t in range(steps):
+            act = index[t] if dtype is None else np.eye(naction, dtype=dtype)[index[t]]
+            obs, reward = env.step(act)[:2]
+            transitions[-1].append((np.array(obs, dtype=float), np.array(reward, dtype=float)))
+    return all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1]) for other in transitions[1:] for a, b in zip(transitions[0], other))
+
+def unbind_path(args, logits, env):
+    '''
+    the previous path which hands one array per agent to the environment
+    '''
+    action = select_action(args, logits, status='train')
+    actual = [act.detach().squeeze().cpu().numpy() for act in torch.unbind(action, 1)]
+    return env.step(actual)
+
+def index_path(args, logits, env):
+    action, index = select_action(args, logits, status='train', return_index=True)
+    _, actual = translate_action(args, action, env, index)
+    return env.step(actual)
+
+
+
+sc = scenario.load("simple_spread.py").Scenario()
+checks = [('traffic_junction', lambda: TrafficJunctionEnv(), (TrafficJunctionEnv().ncar,), 2),
+          ('batched_traffic_junction', lambda: BatchedTrafficJunctionEnv(16), (16, TrafficJunctionEnv().ncar), 2),
+          ('predator_prey', lambda: PredatorPreyEnv(dim=10), (3,), PredatorPreyEnv().naction),
+          ('batched_predator_prey', lambda: BatchedPredatorPreyEnv(16, dim=10), (16, 3), PredatorPreyEnv().naction),
+          ('simple_spread', lambda: MultiAgentEnv(sc.make_world(), sc.reset_world, sc.reward, sc.observation), (3,), 5),
+          ('vectorized_simple_spread', lambda: VectorizedMultiAgentEnv(sc.make_vectorized_world(16), sc.reset_vectorized_world, sc.vectorized_reward, sc.vectorized_observation), (16, 3), 5)]
+print ('{:>26s} {:>32s}'.format('env', 'same transitions of all forms'))
+for name, make_env, shape, naction in checks:
+    print ('{:>26s} {:>32s}'.format(name, str(check_action_forms(make_env, shape, naction))))
+
+print ('\n{:>8s} {:>10s} {:>16s}'.format('agents', 'path', 'time (us)'))
+for n in [3, 10, 20]:
+    env = PredatorPreyEnv(dim=8, npredator=n)
+    args = make_args(agent_num=n, action_dim=env.naction)._replace(gumbel_softmax=False)
+    logits = torch.randn(1, n, env.naction)
+    env.reset()
+    print ('{:8d} {:>10s} {:16.2f}'.format(n, 'unbind', timeit(lambda: unbind_path(args, logits, env), repeat=argv.repeat)*1e3))
+    print ('{:8d} {:>10s} {:16.2f}'.format(n, 'index', timeit(lambda: index_path(args, logits, env), repeat=argv.repeat)*1e3))
@@ -0,0 +1,40 @@
+# python -m benchmarks.async_trainer_benchmark
+import time
+import numpy as np
+import argparse
+from benchmarks.common import *
+from aux import Model
+from utilities.trainer import PGTrainer
+from utilities.async_trainer import AsyncPGTrainer
+from multiagent.environment import MultiAgentEnv
+import multiagent.scenarios as scenario
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the transitions and the updates per second of the synchronous and the asynchronous trainers.')
+parser.add_argument('--model', type=str, default='sqddpg', help='Please input the name of the model.')
+parser.add_argument('--scenario', type=str, default='simple_spread', help='Please input the name of the scenario.')
+parser.add_argument('--episodes', type=int, default=40, help='Please input the number of timed episodes.')
+argv = parser.parse_args()
+
+
+
+sc = scenario.load(argv.scenario+".py").Scenario()
+env = MultiAgentEnv(sc.make_world(), sc.reset_world, sc.reward, sc.observation)
+n, o = env.n, env.observation_space[0].shape[0]
+
+print ('{:>8s} {:>8s} {:>16s} {:>12s}'.format('trainer', 'actors', 'transitions/s', 'updates/s'))
+for actor_num in [0, 1, 2, 4]:
+    args = make_args(model_name=argv.model, agent_num=n, obs_size=o, action_dim=5, hid_size=128, batch_size=128)
+    args = args._replace(max_steps=25, behaviour_update_freq=25, critic_update_times=5, actor_num=actor_num)
+    trainer = AsyncPGTrainer(args, Model[argv.model], env, None, True) if actor_num > 0 else PGTrainer(args, Model[argv.model], env, None, True)
+    stat = dict()
+    start = time.perf_counter()
+    for _ in range(argv.episodes):
+        trainer.run(stat)
+    elapsed = time.perf_counter() - start
+    # the synchronous trainer runs one update every behaviour_update_freq steps
+    updates = trainer.updates if actor_num > 0 else max(0, trainer.steps - args.batch_size) // args.behaviour_update_freq
+    print ('{:>8s} {:8d} {:16.0f} {:12.1f}'.format('async' if actor_num > 0 else 'sync', actor_num, trainer.steps / elapsed, updates / elapsed))
+    if actor_num > 0:
+        trainer.close()
@@ -0,0 +1,44 @@
+# python -m benchmarks.batched_traffic_junction_benchmark
+import time
+import numpy as np
+import argparse
+from environments.traffic_junction_env import TrafficJunctionEnv, BatchedTrafficJunctionEnv
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the car steps per second and compare the episode statistics of the traffic junction and the batched traffic junctions.')
+parser.add_argument('--episodes', type=int, default=256, help='Please input the number of episodes per setting.')
+parser.add_argument('--max-steps', type=int, default=50, help='Please input the number of steps per episode.')
+parser.add_argument('--gas', type=float, default=0.7, help='Please input the probability of the random policy to take GAS.')
+argv = parser.parse_args()
+
+
+
+def run(env, batch_size):
+    '''
+    run episodes of the random policy and return the car steps per second, the mean reward per step and the success rate
+    '''
+    rewards, successes, steps = [], [], 0
+    start = time.perf_counter()
+    for _ in range(max(1, argv.episodes // batch_size)):
+        env.reset()
+        for _ in range(argv.max_steps):
+            act = (np.random.uniform(size=(batch_size, env.ncar)) > argv.gas).astype(int)
+            if isinstance(env, BatchedTrafficJunctionEnv):
+                _, reward, _, debug = env.step(env.action_onehot[act])
+                rewards.append(reward[:, 0])
+            else:
+                _, reward, _, debug = env.step(env.action_onehot[act[0]])
+                rewards.append([reward[0]])
+            steps += batch_size
+        successes.append(np.atleast_1d(debug['success']))
+    elapsed = time.perf_counter() - start
+    return steps * env.ncar / elapsed, np.mean(np.concatenate(rewards)), np.mean(np.concatenate(successes))
+
+
+
+np.random.seed(0)
+print ('{:>10s} {:>8s} {:>16s} {:>14s} {:>10s}'.format('env', 'batch', 'car steps/s', 'mean reward', 'success'))
+print ('{:>10s} {:8d} {:16.0f} {:14.4f} {:10.3f}'.format('single', 1, *run(TrafficJunctionEnv(), 1)))
+for batch_size in [1, 16, 64, 256]:
+    print ('{:>10s} {:8d} {:16.0f} {:14.4f} {:10.3f}'.format('batched', batch_size, *run(BatchedTrafficJunctionEnv(batch_size), batch_size)))
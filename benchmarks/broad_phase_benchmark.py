@@ -0,0 +1,58 @@
+# python -m benchmarks.broad_phase_benchmark
+import copy
+import numpy as np
+import argparse
+from benchmarks.common import *
+from multiagent.core import World, Agent, Landmark
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the step time of the particle world with and without the broad phase of the collision response.')
+parser.add_argument('--steps', type=int, default=3, help='Please input the number of timed steps.')
+parser.add_argument('--density', type=float, default=2.0, help='Please input the number of entities per unit area.')
+argv = parser.parse_args()
+
+
+
+def make_world(agent_num):
+    '''
+    a world with agents and a tenth as many obstacles spread over a square at a fixed density
+    '''
+    world = World()
+    world.agents = [Agent() for _ in range(agent_num)]
+    world.landmarks = [Landmark() for _ in range(max(1, agent_num // 10))]
+    side = np.sqrt(len(world.entities) / argv.density)
+    for agent in world.agents:
+        agent.silent = True
+        agent.size = 0.05
+        agent.accel = 3.0
+        agent.max_speed = 1.0
+        agent.state.c = np.zeros(world.dim_c)
+        agent.action.c = np.zeros(world.dim_c)
+    for landmark in world.landmarks:
+        landmark.size = 0.2
+    for entity in world.entities:
+        entity.state.p_pos = np.random.uniform(-side/2, side/2, world.dim_p)
+        entity.state.p_vel = np.zeros(world.dim_p)
+    return world
+
+def step(world, actions):
+    for agent, u in zip(world.agents, actions):
+        agent.action.u = u.copy()
+    world.step()
+
+
+
+np.random.seed(0)
+print ('{:>8s} {:>10s} {:>16s} {:>16s} {:>10s} {:>16s}'.format('agents', 'entities', 'all pairs (ms)', 'broad phase (ms)', 'speedup', 'max pos diff'))
+for agent_num in [10, 30, 100, 300, 1000]:
+    world = make_world(agent_num)
+    actions = np.random.uniform(-3, 3, (argv.steps, agent_num, world.dim_p))
+    worlds = [world, copy.deepcopy(world)]
+    worlds[1].broad_phase = True
+    elapsed = []
+    for w in worlds:
+        t = iter(actions)
+        elapsed.append(timeit(lambda: step(w, next(t)), repeat=argv.steps, warmup=0))
+    diff = max(np.abs(a.state.p_pos - b.state.p_pos).max() for a, b in zip(worlds[0].entities, worlds[1].entities))
+    print ('{:8d} {:10d} {:16.2f} {:16.2f} {:10.1f} {:16.1e}'.format(agent_num, len(world.entities), elapsed[0], elapsed[1], elapsed[0]/elapsed[1], diff))
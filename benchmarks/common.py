@@ -0,0 +1,77 @@
+import sys
+import time
+import torch
+import numpy as np
+from aux import *
+
+
+
+AUX_DEFAULTS = dict(sample_size=1, shapley_mode='sample', coalition_pool_size=4096, coalition_refresh_freq=100)
+
+def make_args(model_name='sqddpg', agent_num=3, obs_size=18, action_dim=5, hid_size=32, batch_size=32, shared_parameters=False, fused_optimizer=False, **aux_kwargs):
+    '''
+    build the merged arguments of a model without loading any environment,
+    q_func and gumbel_softmax are set as the inspector requires them for the model
+    '''
+    # the inspector compares the model names by identity, so a name from the command line is interned
+    model_name = sys.intern(model_name)
+    args = Args(model_name=model_name,
+                agent_num=agent_num,
+                hid_size=hid_size,
+                obs_size=obs_size,
+                continuous=False,
+                action_dim=action_dim,
+                init_std=0.1,
+                policy_lrate=1e-4,
+                value_lrate=1e-3,
+                max_steps=50,
+                batch_size=batch_size,
+                gamma=0.99,
+                normalize_advantages=False,
+                entr=1e-4,
+                entr_inc=0.0,
+                action_num=action_dim,
+                q_func=model_name != 'independent_ddpg',
+                train_episodes_num=1,
+                replay=True,
+                replay_buffer_size=1e4,
+                replay_buffer_path=None,
+                replay_warmup=0,
+                prioritized_replay=False,
+                prioritized_replay_beta=0.4,
+                prioritized_replay_beta_steps=int(1e4),
+                cuda=False,
+                grad_clip=True,
+                save_model_freq=1,
+                target=True,
+                target_lr=0.1,
+                behaviour_update_freq=25,
+                critic_update_times=10,
+                target_update_freq=50,
+                gumbel_softmax=model_name in ['sqddpg', 'maddpg', 'independent_ddpg'],
+                epsilon_softmax=False,
+                online=True,
+                num_envs=1,
+                actor_num=0,
+                sync_interval=100,
+                queue_depth=1000,
+                reward_record_type='episode_mean_step',
+                shared_parameters=shared_parameters,
+                fused_optimizer=fused_optimizer
+               )
+    aux_kwargs = dict(AUX_DEFAULTS, **aux_kwargs)
+    aux_fields = AuxArgs[model_name]._fields
+    MergeArgs = namedtuple('MergeArgs', Args._fields+aux_fields)
+    aux_args = AuxArgs[model_name](*[aux_kwargs[f] for f in aux_fields])
+    return MergeArgs(*(args+aux_args))
+
+def timeit(fn, repeat=20, warmup=3):
+    '''
+    return the mean wall time of fn in milliseconds
+    '''
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
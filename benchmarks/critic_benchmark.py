@@ -0,0 +1,54 @@
+# python -m benchmarks.critic_benchmark
+import torch
+import torch.nn as nn
+import argparse
+from benchmarks.common import *
+from models.sqddpg import SQDDPG
+from models.model import grouped_linear
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the critic of sqddpg against the number of agents.')
+parser.add_argument('--agents', type=int, nargs='+', default=[3, 5, 10, 20], help='Please input the numbers of agents.')
+parser.add_argument('--batch-size', type=int, default=32, help='Please input the batch size.')
+parser.add_argument('--sample-size', type=int, default=5, help='Please input the sample size of grand coalitions.')
+parser.add_argument('--obs-size', type=int, default=30, help='Please input the dimension of observation.')
+parser.add_argument('--repeat', type=int, default=20, help='Please input the number of repeats.')
+argv = parser.parse_args()
+
+
+
+def layer_1(d, inp):
+    # the first layer applied to the joint observation and action at once
+    return nn.functional.linear(inp, torch.cat((d['layer_1_obs'].weight, d['layer_1_act'].weight), dim=1), d['layer_1_obs'].bias)
+
+def loop_critic(model, inp):
+    # the per-agent loop evaluated before the grouped critic, kept as a reference
+    values = []
+    for i in range(model.n_):
+        h = torch.relu( layer_1(model.value_dicts[i], inp[:, :, i, :]) )
+        h = torch.relu( model.value_dicts[i]['layer_2'](h) )
+        values.append(model.value_dicts[i]['value_head'](h))
+    return torch.stack(values, dim=2)
+
+def grouped_critic(model, inp):
+    b, n_s, n, d = inp.size()
+    inp = inp.permute(2, 0, 1, 3).contiguous().view(n, b*n_s, d)
+    obs_dim = model.n_*model.obs_dim
+    h = grouped_linear([v['layer_1_obs'] for v in model.value_dicts], inp[:, :, :obs_dim]) + grouped_linear([v['layer_1_act'] for v in model.value_dicts], inp[:, :, obs_dim:])
+    h = torch.relu(h)
+    values = model.grouped_mlp(model.value_dicts, ['layer_2', 'value_head'], h)
+    return values.contiguous().view(n, b, n_s, 1).permute(1, 2, 0, 3)
+
+print ('{:>6s} {:>14s} {:>14s} {:>8s}'.format('agents', 'loop (ms)', 'grouped (ms)', 'speedup'))
+for n in argv.agents:
+    # one backward pass over all agents as the updates without shared parameters run it
+    args = make_args(agent_num=n, obs_size=argv.obs_size, hid_size=128, sample_size=argv.sample_size)
+    model = SQDDPG(args)
+    inp = torch.randn(argv.batch_size, argv.sample_size, n, n*(args.obs_size+args.action_dim))
+    def step(critic):
+        model.zero_grad()
+        critic(model, inp).sum().backward()
+    loop_time = timeit(lambda: step(loop_critic), repeat=argv.repeat)
+    grouped_time = timeit(lambda: step(grouped_critic), repeat=argv.repeat)
+    print ('{:6d} {:14.3f} {:14.3f} {:8.2f}'.format(n, loop_time, grouped_time, loop_time/grouped_time))
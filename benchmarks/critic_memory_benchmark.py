@@ -0,0 +1,82 @@
+# python -m benchmarks.critic_memory_benchmark
+import torch
+import torch.nn as nn
+import resource
+import argparse
+import multiprocessing
+from benchmarks.common import *
+from models.sqddpg import SQDDPG
+
+
+
+def expanded_marginal_contribution(model, obs, act):
+    # the critic input used before the split first layer, which copies the joint observation n*n_s times
+    batch_size, n, n_s = obs.size(0), model.n_, model.sample_size
+    subcoalition_map, grand_coalitions = model.sample_grandcoalitions(batch_size, obs.device)
+    grand_coalitions = grand_coalitions.unsqueeze(-1).expand(batch_size, n_s, n, n, model.act_dim)
+    act = act.unsqueeze(1).unsqueeze(2).expand(batch_size, n_s, n, n, model.act_dim).gather(3, grand_coalitions)
+    act = (act * subcoalition_map.unsqueeze(-1)).contiguous().view(batch_size, n_s, n, -1)
+    obs = obs.unsqueeze(1).unsqueeze(2).expand(batch_size, n_s, n, n, model.obs_dim).contiguous().view(batch_size, n_s, n, -1)
+    inp = torch.cat((obs, act), dim=-1).permute(2, 0, 1, 3).contiguous().view(n, batch_size*n_s, -1)
+    values = []
+    for i, d in enumerate(model.value_dicts):
+        # one layer over the joint observation and action as the critic was stored before the split
+        weight = torch.cat((d['layer_1_obs'].weight, d['layer_1_act'].weight), dim=1)
+        h = torch.relu( nn.functional.linear(inp[i], weight, d['layer_1_obs'].bias) )
+        h = torch.relu( d['layer_2'](h) )
+        values.append(d['value_head'](h))
+    return torch.stack(values, dim=0).contiguous().view(n, batch_size, n_s, 1).permute(1, 2, 0, 3)
+
+def split_marginal_contribution(model, obs, act):
+    return model.marginal_contribution(obs, act)
+
+VARIANTS = dict(expanded=expanded_marginal_contribution, split=split_marginal_contribution)
+
+def run(variant, argv, queue):
+    args = make_args(agent_num=argv.agents, obs_size=argv.obs_size, hid_size=argv.hid_size, sample_size=argv.sample_size)
+    model = SQDDPG(args)
+    cuda = torch.cuda.is_available()
+    if cuda:
+        model = model.cuda()
+    device = next(model.parameters()).device
+    obs = torch.randn(argv.batch_size, argv.agents, args.obs_size, device=device)
+    act = torch.softmax(torch.randn(argv.batch_size, argv.agents, args.action_dim, device=device), dim=-1)
+    def step():
+        model.zero_grad()
+        VARIANTS[variant](model, obs, act).sum().backward()
+        if cuda:
+            torch.cuda.synchronize()
+    if cuda:
+        torch.cuda.reset_peak_memory_stats()
+        base = torch.cuda.memory_allocated()
+    else:
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    elapsed = timeit(step, repeat=argv.repeat, warmup=1)
+    if cuda:
+        peak = torch.cuda.max_memory_allocated() - base
+    else:
+        # growth of the peak resident set size over the model and the batch
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - base
+    queue.put((elapsed, peak))
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the peak memory and the step time of the sqddpg critic.')
+    parser.add_argument('--agents', type=int, default=20, help='Please input the number of agents.')
+    parser.add_argument('--batch-size', type=int, default=32, help='Please input the batch size.')
+    parser.add_argument('--sample-size', type=int, default=1, help='Please input the sample size of grand coalitions.')
+    parser.add_argument('--obs-size', type=int, default=1381, help='Please input the dimension of observation (1381 for hard traffic junction).')
+    parser.add_argument('--hid-size', type=int, default=128, help='Please input the hidden size.')
+    parser.add_argument('--repeat', type=int, default=10, help='Please input the number of repeats.')
+    argv = parser.parse_args()
+    # each variant runs in a fresh process such that the peak memory is not shared
+    context = multiprocessing.get_context('spawn')
+    print ('{:>10s} {:>14s} {:>16s}'.format('critic', 'step (ms)', 'peak (MB)'))
+    for variant in ['expanded', 'split']:
+        queue = context.Queue()
+        process = context.Process(target=run, args=(variant, argv, queue))
+        process.start()
+        elapsed, peak = queue.get()
+        process.join()
+        print ('{:>10s} {:14.3f} {:16.1f}'.format(variant, elapsed, peak/2**20))
@@ -0,0 +1,76 @@
+# python -m benchmarks.episode_replay_benchmark
+import time
+import torch
+import numpy as np
+import argparse
+from benchmarks.common import *
+from models.sqddpg import SQDDPG
+from utilities.replay_buffer import EpisodeReplayBuffer
+from utilities.returns import td_returns
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the list and the segment-indexed episode buffers.')
+parser.add_argument('--agents', type=int, default=3, help='Please input the number of agents.')
+parser.add_argument('--obs-size', type=int, default=8, help='Please input the dimension of observation.')
+parser.add_argument('--episode-length', type=int, default=25, help='Please input the length of the episodes.')
+parser.add_argument('--batch-size', type=int, default=32, help='Please input the number of sampled episodes.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed operations.')
+argv = parser.parse_args()
+
+
+
+class ListEpisodeReplayBuffer(object):
+    '''
+    the previous buffer which keeps the episodes in a list and evicts with pop(0)
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = []
+
+    def get_batch(self, batch_size):
+        indices = np.random.choice(len(self.buffer), batch_size, replace=False)
+        batch = []
+        for i in indices:
+            batch.extend(self.buffer[i])
+        return batch
+
+    def add_experience(self, episode):
+        if len(self.buffer) + 1 > self.size:
+            self.buffer.pop(0)
+        self.buffer.append(episode)
+
+def returns(model, batch):
+    if isinstance(batch, list):
+        batch = model.Transition(*zip(*batch))
+    rewards, last_step, done, actions, state, next_state = model.unpack_data(batch)
+    return td_returns(rewards, last_step, done, rewards, model.args.gamma)
+
+def throughput(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return repeat / (time.perf_counter() - start)
+
+
+
+args = make_args(agent_num=argv.agents, obs_size=argv.obs_size)
+model = SQDDPG(args)
+n, o, a, l = argv.agents, argv.obs_size, args.action_dim, argv.episode_length
+episode = [model.Transition(np.random.randn(n, o), np.eye(a)[np.random.randint(a, size=n)][None], np.random.randn(n), np.random.randn(n, o), t==l-1, t==l-1) for t in range(l)]
+
+print ('{:>10s} {:>10s} {:>16s} {:>16s}'.format('episodes', 'buffer', 'episode adds/s', 'batches/s'))
+for size in [int(1e3), int(1e4), int(1e5)]:
+    for name in ['list', 'segment']:
+        if name == 'list':
+            buffer = ListEpisodeReplayBuffer(size)
+            buffer.buffer = [episode] * size
+        else:
+            buffer = EpisodeReplayBuffer(size, l)
+            for _ in range(size):
+                buffer.add_experience(episode)
+        adds = throughput(lambda: buffer.add_experience(episode), argv.repeat)
+        batches = throughput(lambda: returns(model, buffer.get_batch(argv.batch_size)), argv.repeat)
+        print ('{:10d} {:>10s} {:16.0f} {:16.0f}'.format(size, name, adds, batches))
+        del buffer
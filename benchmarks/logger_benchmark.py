@@ -0,0 +1,47 @@
+# python -m benchmarks.logger_benchmark
+import os
+import sys
+import time
+import shutil
+import resource
+import tempfile
+import numpy as np
+import argparse
+from benchmarks.common import *
+from utilities.logger import Logger
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the import, the summaries and the flushes of the buffered event writer.')
+parser.add_argument('--episodes', type=int, default=10000, help='Please input the number of logged episodes.')
+parser.add_argument('--tags', type=int, default=8, help='Please input the number of scalar tags logged every episode.')
+parser.add_argument('--repeat', type=int, default=100, help='Please input the number of timed histograms and images.')
+argv = parser.parse_args()
+
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+path = tempfile.mkdtemp()
+stat = {'tag_{}'.format(i): np.random.rand() for i in range(argv.tags)}
+
+print ('{:>40s} {:>12s}'.format('operation', 'time (us)'))
+for name, downsample in [('scalar_summary', None), ('scalar_summary (downsample 10)', {tag: 10 for tag in stat})]:
+    logger = Logger(os.path.join(path, name), downsample=downsample)
+    start = time.perf_counter()
+    for episode in range(argv.episodes):
+        for tag, value in stat.items():
+            logger.scalar_summary(tag, value, episode)
+    elapsed = time.perf_counter() - start
+    logger.close()
+    print ('{:>40s} {:12.2f}'.format(name, elapsed / (argv.episodes*argv.tags) * 1e6))
+logger = Logger(os.path.join(path, 'summaries'))
+values = np.random.randn(10000)
+images = np.random.rand(4, 64, 64, 3)
+print ('{:>40s} {:12.2f}'.format('hist_summary (1000 bins)', timeit(lambda: logger.hist_summary('hist', values, 0), repeat=argv.repeat)*1e3))
+print ('{:>40s} {:12.2f}'.format('image_summary (4 x 64 x 64 x 3)', timeit(lambda: logger.image_summary('image', images, 0), repeat=argv.repeat)*1e3))
+logger.close()
+files = [os.path.join(root, f) for root, _, fs in os.walk(path) for f in fs]
+print ('event files: {:.1f} MB, tensorflow imported: {}, max rss: {:.0f} MB'.format(sum(os.path.getsize(f) for f in files) / 2**20, 'tensorflow' in sys.modules, rss_mb()))
+shutil.rmtree(path)
@@ -0,0 +1,63 @@
+# python -m benchmarks.memmap_replay_benchmark
+import os
+import time
+import shutil
+import resource
+import tempfile
+import numpy as np
+import argparse
+from collections import namedtuple
+from benchmarks.common import *
+from utilities.replay_buffer import TransReplayBuffer, PrioritizedTransReplayBuffer
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the appends, the sampling, the reopening and the resident memory of the memmap replay buffer.')
+parser.add_argument('--size', type=int, default=int(1e8), help='Please input the capacity of the buffer.')
+parser.add_argument('--adds', type=int, default=int(2e5), help='Please input the number of appended transitions.')
+parser.add_argument('--agents', type=int, default=5, help='Please input the number of agents.')
+parser.add_argument('--obs-size', type=int, default=16, help='Please input the dimension of observation.')
+parser.add_argument('--batch-size', type=int, default=32, help='Please input the batch size.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed batches.')
+parser.add_argument('--path', type=str, default=None, help='Please input the directory of the buffer, a temporary one by default.')
+argv = parser.parse_args()
+
+
+
+Transition = namedtuple('Transition', ('state', 'action', 'reward', 'next_state', 'done', 'last_step'))
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def disk_mb(path):
+    # the files are sparse, so only the written records take disk space
+    return sum(os.stat(os.path.join(path, f)).st_blocks * 512 for f in os.listdir(path)) / 2**20
+
+base_rss = rss_mb()
+path = argv.path or tempfile.mkdtemp()
+n, o, a = argv.agents, argv.obs_size, 5
+trans = Transition(np.random.randn(n, o), np.eye(a)[np.random.randint(a, size=n)][None], np.random.randn(n), np.random.randn(n, o), False, False)
+record_mb = (2*n*o + n*a + n + 2) * 4 * argv.size / 2**20
+
+print ('{:>12s} {:>10s} {:>12s} {:>12s} {:>14s} {:>12s} {:>12s} {:>12s}'.format('buffer', 'size', 'adds/s', 'batches/s', 'reopen (ms)', 'records (MB)', 'disk (MB)', 'rss +(MB)'))
+for name, buffer_type in [('uniform', TransReplayBuffer), ('prioritized', PrioritizedTransReplayBuffer)]:
+    buffer_path = os.path.join(path, name)
+    buffer = buffer_type(argv.size, buffer_path)
+    start = time.perf_counter()
+    for _ in range(argv.adds):
+        buffer.add_experience(trans)
+    adds = argv.adds / (time.perf_counter() - start)
+    buffer.flush()
+    if buffer_type is PrioritizedTransReplayBuffer:
+        batches = 1e3 / timeit(lambda: buffer.get_weighted_batch(argv.batch_size), repeat=argv.repeat)
+    else:
+        batches = 1e3 / timeit(lambda: buffer.get_batch(argv.batch_size), repeat=argv.repeat)
+    del buffer
+    start = time.perf_counter()
+    buffer = buffer_type(argv.size, buffer_path)
+    reopen = (time.perf_counter() - start) * 1e3
+    assert len(buffer) == argv.adds
+    print ('{:>12s} {:10d} {:12.0f} {:12.0f} {:14.1f} {:12.0f} {:12.0f} {:12.0f}'.format(name, argv.size, adds, batches, reopen, record_mb, disk_mb(buffer_path), rss_mb()-base_rss))
+    del buffer
+if argv.path is None:
+    shutil.rmtree(path)
@@ -0,0 +1,49 @@
+# python -m benchmarks.obs_path_benchmark
+import torch
+import numpy as np
+import argparse
+from benchmarks.common import *
+from utilities.util import *
+from environments.traffic_junction_env import TrafficJunctionEnv
+from environments.predator_prey_env import PredatorPreyEnv
+from multiagent.environment import MultiAgentEnv
+import multiagent.scenarios as scenario
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the environment step plus the observation tensor of the list and the preallocated buffer paths.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed steps.')
+argv = parser.parse_args()
+
+
+
+def list_path(env, action, n, o):
+    '''
+    the previous path of train_process which returns the observations as a list and builds the tensor twice
+    '''
+    state, _, _, _ = env.step(action)
+    prep_obs(state).contiguous().view(1, n, o)
+    return prep_obs(state).contiguous().view(1, n, o)
+
+def buffer_path(env, action, buffers, tensors, t):
+    env.step(action, obs_out=buffers[t%2, 0])
+    return tensors[t%2]
+
+
+
+sc = scenario.load("simple_spread.py").Scenario()
+envs = [('simple_spread', MultiAgentEnv(sc.make_world(), sc.reset_world, sc.reward, sc.observation)),
+        ('traffic_junction', TrafficJunctionEnv()),
+        ('predator_prey', PredatorPreyEnv())
+       ]
+print ('{:>18s} {:>8s} {:>10s} {:>16s}'.format('env', 'obs_dim', 'path', 'time (us)'))
+for name, env in envs:
+    n, o, a = env.n, env.observation_space[0].shape[0], env.action_space[0].n
+    action = list(np.eye(a)[np.random.randint(a, size=n)])
+    tensors = torch.zeros(2, 1, n, o)
+    buffers = tensors.numpy()
+    env.reset()
+    print ('{:>18s} {:8d} {:>10s} {:16.2f}'.format(name, o, 'list', timeit(lambda: list_path(env, action, n, o), repeat=argv.repeat)*1e3))
+    env.reset(obs_out=buffers[0, 0])
+    steps = iter(range(10**9))
+    print ('{:>18s} {:8d} {:>10s} {:16.2f}'.format(name, o, 'buffer', timeit(lambda: buffer_path(env, action, buffers, tensors, next(steps)), repeat=argv.repeat)*1e3))
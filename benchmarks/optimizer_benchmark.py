@@ -0,0 +1,44 @@
+# python -m benchmarks.optimizer_benchmark
+import torch
+import numpy as np
+import argparse
+from benchmarks.common import *
+from aux import Model
+from utilities.trainer import PGTrainer
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark one value and one action update of the per-agent and the fused optimizers.')
+parser.add_argument('--model', type=str, default='sqddpg', help='Please input the name of the model.')
+parser.add_argument('--batch-size', type=int, default=128, help='Please input the batch size.')
+parser.add_argument('--obs-size', type=int, default=40, help='Please input the dimension of observation.')
+parser.add_argument('--repeat', type=int, default=10, help='Please input the number of timed updates.')
+argv = parser.parse_args()
+
+
+
+def make_batch(model, batch_size, agent_num, obs_size, action_dim):
+    trans = []
+    for _ in range(batch_size):
+        action = np.eye(action_dim)[np.random.randint(action_dim, size=agent_num)][None]
+        trans.append(model.Transition(np.random.randn(agent_num, obs_size), action, np.random.randn(agent_num), np.random.randn(agent_num, obs_size), False, np.random.rand()<0.05))
+    return model.Transition(*zip(*trans))
+
+def update(trainer, stat, batch):
+    trainer.value_transition_process(stat, batch)
+    trainer.action_transition_process(stat, batch)
+
+
+
+print ('{:>8s} {:>14s} {:>12s} {:>10s}'.format('agents', 'per-agent (ms)', 'fused (ms)', 'speedup'))
+for agent_num in [3, 10, 20]:
+    elapsed = []
+    for fused in [False, True]:
+        torch.manual_seed(0)
+        np.random.seed(0)
+        args = make_args(model_name=argv.model, agent_num=agent_num, obs_size=argv.obs_size, batch_size=argv.batch_size, hid_size=128, sample_size=5, fused_optimizer=fused)
+        trainer = PGTrainer(args, Model[argv.model], None, None, True)
+        batch = make_batch(trainer.behaviour_net, argv.batch_size, agent_num, argv.obs_size, args.action_dim)
+        stat = dict()
+        elapsed.append(timeit(lambda: update(trainer, stat, batch), repeat=argv.repeat))
+    print ('{:8d} {:14.3f} {:12.3f} {:10.2f}'.format(agent_num, elapsed[0], elapsed[1], elapsed[0]/elapsed[1]))
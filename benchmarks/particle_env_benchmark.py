@@ -0,0 +1,36 @@
+# python -m benchmarks.particle_env_benchmark
+import time
+import numpy as np
+import argparse
+from multiagent.environment import MultiAgentEnv, VectorizedMultiAgentEnv
+import multiagent.scenarios as scenario
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the environment steps per second of the particle world and the vectorized particle world.')
+parser.add_argument('--steps', type=int, default=200, help='Please input the number of timed steps.')
+argv = parser.parse_args()
+
+
+
+def throughput(env, action, batch_size):
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(argv.steps):
+        env.step(action)
+    return batch_size * argv.steps / (time.perf_counter() - start)
+
+
+
+print ('{:>14s} {:>10s} {:>8s} {:>16s}'.format('scenario', 'world', 'batch', 'env steps/s'))
+for scenario_name in ['simple_spread', 'simple_tag']:
+    module = scenario.load(scenario_name+".py")
+    sc = module.Scenario()
+    env = MultiAgentEnv(sc.make_world(), sc.reset_world, sc.reward, sc.observation)
+    action = list(np.eye(5)[np.random.randint(5, size=env.n)])
+    print ('{:>14s} {:>10s} {:8d} {:16.0f}'.format(scenario_name, 'loop', 1, throughput(env, action, 1)))
+    for batch_size in [1, 4, 16, 64, 256, 1024]:
+        sc = module.Scenario()
+        env = VectorizedMultiAgentEnv(sc.make_vectorized_world(batch_size), sc.reset_vectorized_world, sc.vectorized_reward, sc.vectorized_observation)
+        action = np.eye(5)[np.random.randint(5, size=(batch_size, env.n))]
+        print ('{:>14s} {:>10s} {:8d} {:16.0f}'.format(scenario_name, 'vectorized', batch_size, throughput(env, action, batch_size)))
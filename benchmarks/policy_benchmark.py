@@ -0,0 +1,36 @@
+# python -m benchmarks.policy_benchmark
+import torch
+import argparse
+from benchmarks.common import *
+from models.sqddpg import SQDDPG
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the per-step policy inference latency against the number of agents.')
+parser.add_argument('--agents', type=int, nargs='+', default=[3, 10, 20], help='Please input the numbers of agents.')
+parser.add_argument('--obs-size', type=int, default=30, help='Please input the dimension of observation.')
+parser.add_argument('--repeat', type=int, default=200, help='Please input the number of repeats.')
+argv = parser.parse_args()
+
+
+
+def loop_policy(model, obs):
+    # the per-agent loop evaluated before the grouped policy, kept as a reference
+    actions = []
+    for i in range(model.n_):
+        h = torch.relu( model.action_dicts[i]['layer_1'](obs[:, i, :]) )
+        h = torch.relu( model.action_dicts[i]['layer_2'](h) )
+        actions.append(model.action_dicts[i]['action_head'](h))
+    return torch.stack(actions, dim=1)
+
+print ('{:>6s} {:>8s} {:>14s} {:>14s} {:>8s}'.format('agents', 'shared', 'loop (ms)', 'grouped (ms)', 'speedup'))
+with torch.no_grad():
+    for n in argv.agents:
+        for shared in [False, True]:
+            args = make_args(agent_num=n, obs_size=argv.obs_size, hid_size=128, shared_parameters=shared, sample_size=1)
+            model = SQDDPG(args)
+            # a single environment step feeds a batch of size 1
+            obs = torch.randn(1, n, args.obs_size)
+            loop_time = timeit(lambda: loop_policy(model, obs), repeat=argv.repeat)
+            grouped_time = timeit(lambda: model.policy(obs), repeat=argv.repeat)
+            print ('{:6d} {:>8s} {:14.3f} {:14.3f} {:8.2f}'.format(n, str(shared), loop_time, grouped_time, loop_time/grouped_time))
@@ -0,0 +1,29 @@
+# python -m benchmarks.predator_prey_benchmark
+import time
+import numpy as np
+import argparse
+from environments.predator_prey_env import PredatorPreyEnv, BatchedPredatorPreyEnv
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the game steps per second of the predator prey game and the batched predator prey games.')
+parser.add_argument('--steps', type=int, default=200, help='Please input the number of timed steps.')
+argv = parser.parse_args()
+
+
+
+def throughput(env, batch_shape):
+    env.reset()
+    actions = np.eye(env.naction)[np.random.randint(env.naction, size=(argv.steps,) + batch_shape + (env.n,))]
+    start = time.perf_counter()
+    for action in actions:
+        env.step(action)
+    return int(np.prod(batch_shape)) * argv.steps / (time.perf_counter() - start)
+
+
+
+print ('{:>6s} {:>10s} {:>10s} {:>8s} {:>16s}'.format('dim', 'predators', 'game', 'batch', 'game steps/s'))
+for dim, npredator in [(5, 3), (10, 5), (20, 10)]:
+    print ('{:6d} {:10d} {:>10s} {:8d} {:16.0f}'.format(dim, npredator, 'single', 1, throughput(PredatorPreyEnv(dim, npredator), ())))
+    for batch_size in [16, 256]:
+        print ('{:6d} {:10d} {:>10s} {:8d} {:16.0f}'.format(dim, npredator, 'batched', batch_size, throughput(BatchedPredatorPreyEnv(batch_size, dim, npredator), (batch_size,))))
@@ -0,0 +1,49 @@
+# python -m benchmarks.prioritized_replay_benchmark
+import numpy as np
+import argparse
+from collections import namedtuple
+from benchmarks.common import *
+from utilities.replay_buffer import TransReplayBuffer, PrioritizedTransReplayBuffer
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the sampling and the priority updates of the prioritized replay buffer.')
+parser.add_argument('--size', type=int, default=int(1e6), help='Please input the number of entries in the buffer.')
+parser.add_argument('--agents', type=int, default=3, help='Please input the number of agents.')
+parser.add_argument('--obs-size', type=int, default=8, help='Please input the dimension of observation.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed operations.')
+argv = parser.parse_args()
+
+
+
+Transition = namedtuple('Transition', ('state', 'action', 'reward', 'next_state', 'done', 'last_step'))
+
+def fill(buffer):
+    n, o = argv.agents, argv.obs_size
+    buffer.add_experience(Transition(np.zeros((n, o)), np.zeros((1, n, 5)), np.zeros(n), np.zeros((n, o)), False, False))
+    for column in buffer.columns.values():
+        column[:] = np.random.rand(*column.shape)
+    buffer.position, buffer.length = 0, buffer.size
+    if isinstance(buffer, PrioritizedTransReplayBuffer):
+        buffer.priorities.update(np.arange(buffer.size), np.random.rand(buffer.size))
+
+np.random.seed(0)
+uniform = TransReplayBuffer(argv.size)
+fill(uniform)
+prioritized = PrioritizedTransReplayBuffer(argv.size)
+fill(prioritized)
+trans = prioritized.get_single(0)
+
+print ('{:>10s} {:>48s} {:>12s}'.format('size', 'operation', 'time (us)'))
+for batch_size in [32, 256, 1024]:
+    indices = prioritized.sample(batch_size)
+    td_errors = np.random.randn(batch_size)
+    costs = [ ('uniform get_batch (batch {})'.format(batch_size), lambda: uniform.get_batch(batch_size)),
+              ('prioritized sample indices (batch {})'.format(batch_size), lambda: prioritized.sample(batch_size)),
+              ('prioritized get_weighted_batch (batch {})'.format(batch_size), lambda: prioritized.get_weighted_batch(batch_size)),
+              ('prioritized update_priorities (batch {})'.format(batch_size), lambda: prioritized.update_priorities(indices, td_errors))
+            ]
+    for name, fn in costs:
+        print ('{:10d} {:>48s} {:12.2f}'.format(argv.size, name, timeit(fn, repeat=argv.repeat)*1e3))
+print ('{:10d} {:>48s} {:12.2f}'.format(argv.size, 'uniform add_experience', timeit(lambda: uniform.add_experience(trans), repeat=argv.repeat)*1e3))
+print ('{:10d} {:>48s} {:12.2f}'.format(argv.size, 'prioritized add_experience', timeit(lambda: prioritized.add_experience(trans), repeat=argv.repeat)*1e3))
@@ -0,0 +1,83 @@
+# python -m benchmarks.replay_benchmark
+import time
+import torch
+import numpy as np
+import argparse
+from collections import namedtuple
+from benchmarks.common import *
+from models.sqddpg import SQDDPG
+from utilities.replay_buffer import TransReplayBuffer
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the list and the columnar replay buffers against the buffer size.')
+parser.add_argument('--agents', type=int, default=3, help='Please input the number of agents.')
+parser.add_argument('--obs-size', type=int, default=8, help='Please input the dimension of observation (the columnar buffer of 1e7 transitions takes 2.5GB with 8).')
+parser.add_argument('--batch-size', type=int, default=32, help='Please input the batch size.')
+parser.add_argument('--max-list-size', type=int, default=int(1e6), help='Please input the largest size of the list buffer.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed operations.')
+argv = parser.parse_args()
+
+
+
+class ListReplayBuffer(object):
+    '''
+    the previous buffer which keeps the transitions in a list and evicts with pop(0)
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = []
+
+    def get_batch(self, batch_size):
+        indices = np.random.choice(len(self.buffer), batch_size, replace=False)
+        return [self.buffer[i] for i in indices]
+
+    def add_experience(self, trans):
+        if len(self.buffer) + 1 > self.size:
+            self.buffer.pop(0)
+        self.buffer.append(trans)
+
+def prefill(buffer, trans):
+    '''
+    fill the buffer to its capacity such that every timed add evicts the oldest transition
+    '''
+    if isinstance(buffer, ListReplayBuffer):
+        buffer.buffer = [trans] * buffer.size
+    else:
+        buffer.add_experience(trans)
+        for field, column in buffer.columns.items():
+            column[:] = column[0]
+        buffer.position, buffer.length = 0, buffer.size
+
+def sample(buffer, model):
+    batch = buffer.get_batch(argv.batch_size)
+    if isinstance(batch, list):
+        batch = model.Transition(*zip(*batch))
+    return model.unpack_data(batch)
+
+def throughput(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return repeat / (time.perf_counter() - start)
+
+
+
+args = make_args(agent_num=argv.agents, obs_size=argv.obs_size)
+model = SQDDPG(args)
+n, o, a = argv.agents, argv.obs_size, args.action_dim
+trans = model.Transition(np.random.randn(n, o), np.eye(a)[np.random.randint(a, size=n)][None], np.random.randn(n), np.random.randn(n, o), False, False)
+
+print ('{:>10s} {:>10s} {:>14s} {:>16s}'.format('size', 'buffer', 'adds/s', 'batches/s'))
+for size in [int(1e4), int(1e5), int(1e6), int(1e7)]:
+    for name, buffer_type in [('list', ListReplayBuffer), ('columnar', TransReplayBuffer)]:
+        if buffer_type is ListReplayBuffer and size > argv.max_list_size:
+            print ('{:10d} {:>10s} {:>14s} {:>16s}'.format(size, name, '-', '-'))
+            continue
+        buffer = buffer_type(size)
+        prefill(buffer, trans)
+        adds = throughput(lambda: buffer.add_experience(trans), argv.repeat)
+        batches = throughput(lambda: sample(buffer, model), argv.repeat)
+        print ('{:10d} {:>10s} {:14.0f} {:16.0f}'.format(size, name, adds, batches))
+        del buffer
@@ -0,0 +1,54 @@
+# python -m benchmarks.returns_benchmark
+import torch
+import argparse
+from benchmarks.common import *
+from utilities.returns import *
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the return targets against the reversed python loops.')
+parser.add_argument('--agents', type=int, default=5, help='Please input the number of agents.')
+parser.add_argument('--episode-length', type=int, default=25, help='Please input the episode length of the synthetic batch.')
+parser.add_argument('--cuda', action='store_true', help='Please set it to run on the gpu.')
+argv = parser.parse_args()
+
+
+
+gamma = 0.99
+
+def loop_td_returns(rewards, last_step, done, next_values):
+    returns = torch.zeros_like(rewards)
+    for i in reversed(range(rewards.size(0))):
+        if last_step[i]:
+            next_return = 0 if done[i] else next_values[i].detach()
+        else:
+            next_return = next_values[i].detach()
+        returns[i] = rewards[i] + gamma * next_return
+    return returns
+
+def synchronized(fn):
+    def run():
+        fn()
+        if argv.cuda:
+            torch.cuda.synchronize()
+    return run
+
+
+
+device = torch.device('cuda' if argv.cuda else 'cpu')
+torch.manual_seed(0)
+targets = [ ('td', loop_td_returns, lambda *x: td_returns(*x, gamma)) ]
+
+print ('{:>8s} {:>8s} {:>12s} {:>12s} {:>10s}'.format('target', 'batch', 'loop (ms)', 'vector (ms)', 'speedup'))
+for name, loop_fn, vector_fn in targets:
+    for batch_size in [32, 128, 512, 1024, 4096]:
+        rewards = torch.randn(batch_size, argv.agents, device=device)
+        next_values = torch.randn(batch_size, argv.agents, device=device)
+        last_step = (torch.arange(batch_size, device=device) % argv.episode_length == argv.episode_length-1).float().view(-1, 1)
+        done = (torch.rand(batch_size, 1, device=device) < 0.5).float()
+        inputs = (rewards, last_step, done, next_values)
+        assert torch.allclose(loop_fn(*inputs), vector_fn(*inputs), atol=1e-4)
+        repeat = max(1, 1024 // batch_size)
+        loop_time = timeit(synchronized(lambda: loop_fn(*inputs)), repeat=repeat, warmup=1)
+        vector_time = timeit(synchronized(lambda: vector_fn(*inputs)), repeat=100)
+        print ('{:>8s} {:8d} {:12.3f} {:12.3f} {:10.1f}'.format(name, batch_size, loop_time, vector_time, loop_time/vector_time))
@@ -0,0 +1,30 @@
+# python -m benchmarks.scenario_callbacks_benchmark
+import numpy as np
+import argparse
+from benchmarks.common import *
+import multiagent.scenarios as scenario
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the per-agent and the batch observation and reward callbacks of the particle scenarios.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed calls.')
+argv = parser.parse_args()
+
+
+
+def per_agent(sc, world, agents):
+    return [sc.observation(agent, world) for agent in agents], [sc.reward(agent, world) for agent in agents]
+
+def batch(sc, world):
+    return sc.observations(world), sc.rewards(world)
+
+
+
+print ('{:>18s} {:>8s} {:>16s} {:>12s} {:>10s}'.format('scenario', 'agents', 'per-agent (us)', 'batch (us)', 'speedup'))
+for scenario_name in ['simple_spread', 'simple_tag', 'simple_world_comm']:
+    sc = scenario.load(scenario_name+".py").Scenario()
+    world = sc.make_world()
+    agents = world.policy_agents
+    per_agent_time = timeit(lambda: per_agent(sc, world, agents), repeat=argv.repeat) * 1e3
+    batch_time = timeit(lambda: batch(sc, world), repeat=argv.repeat) * 1e3
+    print ('{:>18s} {:8d} {:16.1f} {:12.1f} {:10.2f}'.format(scenario_name, len(agents), per_agent_time, batch_time, per_agent_time/batch_time))
@@ -0,0 +1,42 @@
+# python -m benchmarks.shapley_benchmark
+import torch
+import argparse
+from benchmarks.common import *
+from models.sqddpg import SQDDPG, CoalitionSampler
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the variance and the cost of the shapley estimators of sqddpg.')
+parser.add_argument('--agents', type=int, default=5, help='Please input the number of agents.')
+parser.add_argument('--batch-size', type=int, default=32, help='Please input the batch size.')
+parser.add_argument('--sample-size', type=int, default=5, help='Please input the sample size of each estimator.')
+parser.add_argument('--obs-size', type=int, default=30, help='Please input the dimension of observation.')
+parser.add_argument('--repeat', type=int, default=100, help='Please input the number of estimates used for the variance.')
+argv = parser.parse_args()
+
+
+
+modes = ['sample', 'antithetic', 'stratified']
+if argv.agents <= 10:
+    modes.append('exact')
+
+torch.manual_seed(0)
+args = make_args(agent_num=argv.agents, obs_size=argv.obs_size, hid_size=128, sample_size=argv.sample_size, shapley_mode='sample')
+model = SQDDPG(args)
+obs = torch.randn(argv.batch_size, argv.agents, args.obs_size)
+act = torch.softmax(torch.randn(argv.batch_size, argv.agents, args.action_dim), dim=-1)
+
+print ('{:>10s} {:>12s} {:>12s} {:>14s} {:>16s}'.format('mode', 'coalitions', 'time (ms)', 'variance', 'variance x ms'))
+with torch.no_grad():
+    for mode in modes:
+        model.coalition_sampler = CoalitionSampler(argv.agents, argv.sample_size, mode, args.coalition_pool_size, args.coalition_refresh_freq)
+        if mode == 'sample':
+            # one critic row per permutation, duplicates included
+            coalitions = argv.sample_size
+        else:
+            # the critic rows per agent of a batch, the padding up to the largest drawn row included
+            coalitions = model.sample_coalitions(argv.batch_size, obs.device)[0].size(2)
+        estimates = torch.stack([model.shapley_values(obs, act) for _ in range(argv.repeat)], dim=0)
+        variance = estimates.var(dim=0).mean().item()
+        elapsed = timeit(lambda: model.shapley_values(obs, act), repeat=argv.repeat)
+        print ('{:>10s} {:12d} {:12.3f} {:14.3e} {:16.3e}'.format(mode, coalitions, elapsed, variance, variance*elapsed))
@@ -0,0 +1,32 @@
+# python -m benchmarks.traffic_junction_init_benchmark
+import time
+import shutil
+import tempfile
+import argparse
+import environments.traffic_junction_env as traffic_junction
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the construction time of the traffic junction without and with the precomputed junctions.')
+parser.add_argument('--repeat', type=int, default=100, help='Please input the number of timed constructions.')
+argv = parser.parse_args()
+
+
+
+def construct(cache_path=None, clear=False):
+    start = time.perf_counter()
+    for _ in range(argv.repeat):
+        if clear:
+            traffic_junction.JUNCTIONS.clear()
+        traffic_junction.TrafficJunctionEnv(cache_path)
+    return (time.perf_counter() - start) / argv.repeat * 1e3
+
+
+
+path = tempfile.mkdtemp()
+print ('{:>24s} {:>12s}'.format('junction', 'time (ms)'))
+print ('{:>24s} {:12.2f}'.format('built every time', construct(clear=True)))
+construct(path, clear=True)
+print ('{:>24s} {:12.2f}'.format('loaded from .npz', construct(path, clear=True)))
+print ('{:>24s} {:12.2f}'.format('memoized in process', construct(path)))
+shutil.rmtree(path)
@@ -0,0 +1,45 @@
+# python -m benchmarks.traffic_junction_obs_benchmark
+import numpy as np
+import argparse
+from benchmarks.common import *
+from environments.traffic_junction_env import TrafficJunctionEnv
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the observation builder of the traffic junction in the hard setting with 20 cars.')
+parser.add_argument('--warmup-steps', type=int, default=100, help='Please input the number of steps taken to fill the junction with cars.')
+parser.add_argument('--repeat', type=int, default=1000, help='Please input the number of timed observations.')
+argv = parser.parse_args()
+
+
+
+def loop_obs(env):
+    '''
+    the previous builder which marks the cars and slices the vision squares car by car and builds the one-hot tables on every call
+    '''
+    bool_base_grid = env.empty_bool_base_grid.copy()
+    for i, p in enumerate(env.car_loc):
+        bool_base_grid[p[0] + env.vision, p[1] + env.vision, env.CAR_CLASS] += 1
+    obs = []
+    for i, p in enumerate(env.car_loc):
+        act, r_i = env.car_last_act[i], env.route_id[i]
+        v_sq = bool_base_grid[p[0]:p[0] + 2*env.vision + 1, p[1]:p[1] + 2*env.vision + 1]
+        if env.alive_mask[i] == 0:
+            act, r_i, v_sq = np.zeros_like(act), np.zeros_like(r_i), np.zeros_like(v_sq)
+        obs.append(np.concatenate([np.eye(env.naction, dtype=np.int32)[int(act)], np.eye(env.npath, dtype=np.int32)[int(r_i)], v_sq.flatten()]))
+    return obs
+
+
+
+np.random.seed(0)
+env = TrafficJunctionEnv()
+env.add_rate = env.add_rate_max
+env.reset()
+for _ in range(argv.warmup_steps):
+    env.step(np.eye(env.naction)[np.random.randint(env.naction, size=env.ncar)])
+assert np.array_equal(np.array(loop_obs(env)), env._get_obs())
+action = np.eye(env.naction)[np.zeros(env.ncar, dtype=int)]
+
+print ('{:>6s} {:>8s} {:>12s} {:>16s}'.format('cars', 'alive', 'builder', 'time (us)'))
+print ('{:6d} {:8d} {:>12s} {:16.2f}'.format(env.ncar, int(env.alive_mask.sum()), 'loop', timeit(lambda: loop_obs(env), repeat=argv.repeat)*1e3))
+print ('{:6d} {:8d} {:>12s} {:16.2f}'.format(env.ncar, int(env.alive_mask.sum()), 'vectorized', timeit(env._get_obs, repeat=argv.repeat)*1e3))
@@ -0,0 +1,51 @@
+# python -m benchmarks.vec_env_benchmark
+import time
+import torch
+import numpy as np
+import argparse
+from benchmarks.common import *
+from models.sqddpg import SQDDPG
+from utilities.util import *
+from utilities.vec_env import SubprocVecEnv
+from multiagent.environment import MultiAgentEnv
+import multiagent.scenarios as scenario
+
+
+
+parser = argparse.ArgumentParser(description='Benchmark the transitions per second of the policy and the particle environment in the main process and in worker processes.')
+parser.add_argument('--scenario', type=str, default='simple_spread', help='Please input the name of the scenario.')
+parser.add_argument('--ticks', type=int, default=500, help='Please input the number of timed ticks.')
+argv = parser.parse_args()
+
+
+
+sc = scenario.load(argv.scenario+".py").Scenario()
+env = MultiAgentEnv(sc.make_world(), sc.reset_world, sc.reward, sc.observation)
+n, o = env.n, env.observation_space[0].shape[0]
+model = SQDDPG(make_args(agent_num=n, obs_size=o, action_dim=5, hid_size=128))
+
+def loop_tick(state):
+    state_ = prep_obs(state).contiguous().view(1, n, o)
+    action = select_action(model.args, model.policy(state_), status='train')
+    _, actual = translate_action(model.args, action, env)
+    return env.step(actual)[0]
+
+def vec_tick(vec_env, state):
+    action = select_action(model.args, model.policy(torch.from_numpy(state)), status='train')
+    return vec_env.step(action.numpy())[0]
+
+print ('{:>14s} {:>8s} {:>16s}'.format('runner', 'envs', 'transitions/s'))
+with torch.no_grad():
+    state = env.reset()
+    start = time.perf_counter()
+    for _ in range(argv.ticks):
+        state = loop_tick(state)
+    print ('{:>14s} {:8d} {:16.0f}'.format('main process', 1, argv.ticks / (time.perf_counter() - start)))
+    for num_envs in [1, 2, 4, 8, 16]:
+        vec_env = SubprocVecEnv(env, num_envs, 5)
+        state = vec_env.reset()
+        start = time.perf_counter()
+        for _ in range(argv.ticks):
+            state = vec_tick(vec_env, state)
+        print ('{:>14s} {:8d} {:16.0f}'.format('subprocess', num_envs, num_envs * argv.ticks / (time.perf_counter() - start)))
+        vec_env.close()
@@ -97,12 +97,24 @@ class World(object):
         # contact response parameters
         self.contact_force = 1e+2
         self.contact_margin = 1e-3
+        # if true, the contact forces are only computed for the pairs found by a uniform grid broad phase
+        self.broad_phase = False
+        # the largest soft contact force of the pairs skipped by the broad phase
+        self.broad_phase_tol = 1e-20
 
     # return all entities in the world
     @property
     def entities(self):
         return self.agents + self.landmarks
 
+    # pairs farther apart than size_a + size_b + margin are skipped by the broad phase, with the gap g the soft contact
+    # force is contact_force * k * log(1 + exp(-g/k)) < contact_force * k * exp(-g/k) for k = contact_margin,
+    # which is below broad_phase_tol beyond the margin
+    @property
+    def broad_phase_margin(self):
+        k = self.contact_margin
+        return max(0.0, k * np.log(self.contact_force * k / self.broad_phase_tol))
+
     # return all agents controllable by external policies
     @property
     def policy_agents(self):
@@ -141,19 +153,59 @@ class World(object):
 
     # gather physical forces acting on entities
     def apply_environment_force(self, p_force):
-        # simple (but inefficient) collision response
-        for a,entity_a in enumerate(self.entities):
-            for b,entity_b in enumerate(self.entities):
-                if(b <= a): continue
-                [f_a, f_b] = self.get_collision_force(entity_a, entity_b)
-                if(f_a is not None):
-                    if(p_force[a] is None): p_force[a] = 0.0
-                    p_force[a] = f_a + p_force[a] 
-                if(f_b is not None):
-                    if(p_force[b] is None): p_force[b] = 0.0
-                    p_force[b] = f_b + p_force[b]        
+        entities = self.entities
+        # simple (but inefficient) collision response unless the broad phase is on
+        if self.broad_phase:
+            pairs = self.get_contact_pairs(entities)
+        else:
+            pairs = ((a, b) for a in range(len(entities)) for b in range(a+1, len(entities)))
+        for a,b in pairs:
+            [f_a, f_b] = self.get_collision_force(entities[a], entities[b])
+            if(f_a is not None):
+                if(p_force[a] is None): p_force[a] = 0.0
+                p_force[a] = f_a + p_force[a] 
+            if(f_b is not None):
+                if(p_force[b] is None): p_force[b] = 0.0
+                p_force[b] = f_b + p_force[b]        
         return p_force
 
+    # broad phase of the collision response on a uniform grid
+    # returns the pairs (a, b) with a < b of colliding entities closer than size_a + size_b + margin,
+    # in the same order as the pairs are visited without the broad phase
+    def get_contact_pairs(self, entities):
+        index = np.array([i for i,entity in enumerate(entities) if entity.collide], dtype=np.int64)
+        if len(index) < 2: return []
+        p_pos = np.array([entities[i].state.p_pos for i in index])
+        size = np.array([entities[i].size for i in index])
+        # a cell is at least as wide as the largest contact distance, so the pairs lie in the same or in adjacent cells
+        cell_size = 2 * size.max() + self.broad_phase_margin
+        cells = np.floor(p_pos / cell_size).astype(np.int64)
+        cells -= cells.min(axis=0)
+        width = cells[:, 1].max() + 3
+        keys = (cells[:, 0] + 1) * width + cells[:, 1] + 1
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        first, second = [], []
+        # the same cell and half of the neighbouring cells, such that every pair of cells is visited once
+        for dx, dy in [(0, 0), (0, 1), (1, -1), (1, 0), (1, 1)]:
+            neighbour = keys + dx * width + dy
+            lo = np.searchsorted(sorted_keys, neighbour, side='left')
+            counts = np.searchsorted(sorted_keys, neighbour, side='right') - lo
+            candidates = order[np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+            owners = np.repeat(np.arange(len(keys)), counts)
+            # within the same cell every pair is found twice
+            keep = owners < candidates if dx == 0 and dy == 0 else np.ones(len(owners), dtype=bool)
+            first.append(owners[keep])
+            second.append(candidates[keep])
+        first, second = np.concatenate(first), np.concatenate(second)
+        # narrow phase on the candidates
+        dist = np.sqrt(np.sum(np.square(p_pos[first] - p_pos[second]), axis=1))
+        near = dist < size[first] + size[second] + self.broad_phase_margin
+        a, b = index[first[near]], index[second[near]]
+        a, b = np.minimum(a, b), np.maximum(a, b)
+        order = np.lexsort((b, a))
+        return list(zip(a[order].tolist(), b[order].tolist()))
+
     # integrate physical state
     def integrate_state(self, p_force):
         for i,entity in enumerate(self.entities):
@@ -193,4 +245,105 @@ class World(object):
         force = self.contact_force * delta_pos / dist * penetration
         force_a = +force if entity_a.movable else None
         force_b = -force if entity_b.movable else None
-        return [force_a, force_b]
\ No newline at end of file
+        return [force_a, force_b]
+# a batch of independent copies of a world whose entity states are kept in (batch, entity, dim) arrays
+# the physics follows World.step entity by entity, so the states match those of the unbatched world
+class VectorizedWorld(object):
+    def __init__(self, world, batch_size):
+        entities = world.entities
+        self.batch_size = batch_size
+        self.num_agents = len(world.agents)
+        self.num_entities = len(entities)
+        # world properties
+        self.dim_c = world.dim_c
+        self.dim_p = world.dim_p
+        self.dt = world.dt
+        self.damping = world.damping
+        self.contact_force = world.contact_force
+        self.contact_margin = world.contact_margin
+        self.collaborative = world.collaborative if hasattr(world, 'collaborative') else False
+        # the entities only hold the properties, their states are kept in the arrays below
+        self.agents = world.agents
+        self.landmarks = world.landmarks
+        # entity properties, shape = (e,)
+        self.size = np.array([entity.size for entity in entities])
+        self.mass = np.array([entity.mass for entity in entities])
+        self.movable = np.array([entity.movable for entity in entities])
+        self.collide = np.array([entity.collide for entity in entities])
+        self.max_speed = np.array([np.inf if entity.max_speed is None else entity.max_speed for entity in entities])
+        # agent properties, shape = (a,)
+        self.u_noise = np.array([agent.u_noise if agent.u_noise else 0.0 for agent in world.agents])
+        self.silent = np.array([agent.silent for agent in world.agents])
+        self.accel = np.array([np.nan if agent.accel is None else agent.accel for agent in world.agents])
+        self.policy_agents = np.array([i for i, agent in enumerate(world.agents) if agent.action_callback is None], dtype=np.int64)
+        self.scripted_agents = np.array([i for i, agent in enumerate(world.agents) if agent.action_callback is not None], dtype=np.int64)
+        # returns the forces of the scripted agents of shape (b, s, dim_p), set by the scenario
+        self.action_callback = None
+        # pairs that exert contact forces on each other, shape = (e, e)
+        self.contacts = self.collide[:, None] & self.collide[None, :] & ~np.eye(self.num_entities, dtype=bool)
+        # states, shape = (b, e, dim_p) and (b, a, dim_c)
+        self.p_pos = np.zeros((batch_size, self.num_entities, self.dim_p))
+        self.p_vel = np.zeros((batch_size, self.num_entities, self.dim_p))
+        self.c = np.zeros((batch_size, self.num_agents, self.dim_c))
+        # physical actions of all agents, shape = (b, a, dim_p)
+        self.u = np.zeros((batch_size, self.num_agents, self.dim_p))
+
+    # copy the states of the unbatched worlds into the batch
+    def load(self, worlds):
+        for b, world in enumerate(worlds):
+            for i, entity in enumerate(world.entities):
+                self.p_pos[b, i] = entity.state.p_pos
+                self.p_vel[b, i] = entity.state.p_vel
+            for i, agent in enumerate(world.agents):
+                self.c[b, i] = agent.state.c
+
+    # update state of all worlds
+    def step(self):
+        # set actions for scripted agents
+        if len(self.scripted_agents) > 0:
+            self.u[:, self.scripted_agents] = self.action_callback(self)
+        # gather forces applied to entities
+        p_force = np.zeros((self.batch_size, self.num_entities, self.dim_p))
+        # apply agent physical controls
+        p_force = self.apply_action_force(p_force)
+        # apply environment forces
+        p_force = self.apply_environment_force(p_force)
+        # integrate physical state
+        self.integrate_state(p_force)
+        # silent agents never communicate
+        self.c[:, self.silent] = 0.0
+
+    # gather agent action forces
+    def apply_action_force(self, p_force):
+        movable = self.movable[:self.num_agents]
+        noise = np.random.randn(*self.u.shape) * self.u_noise[:, None] if self.u_noise.any() else 0.0
+        p_force[:, :self.num_agents][:, movable] = (self.u + noise)[:, movable]
+        return p_force
+
+    # gather physical forces acting on entities
+    def apply_environment_force(self, p_force):
+        # pairwise collision response, delta_pos[:, a, b] is the position of a relative to b
+        delta_pos = self.p_pos[:, :, None, :] - self.p_pos[:, None, :, :]
+        dist = np.sqrt(np.sum(np.square(delta_pos), axis=-1))
+        dist_min = self.size[:, None] + self.size[None, :]
+        # softmax penetration
+        k = self.contact_margin
+        penetration = np.logaddexp(0, -(dist - dist_min)/k)*k
+        with np.errstate(divide='ignore', invalid='ignore'):
+            force = self.contact_force * delta_pos / dist[..., None] * penetration[..., None]
+        force = np.where((self.contacts & self.movable[:, None])[None, :, :, None], force, 0.0)
+        # the forces are added in the same order as the pairs are visited by World
+        for b in range(self.num_entities):
+            p_force += force[:, :, b]
+        return p_force
+
+    # integrate physical state
+    def integrate_state(self, p_force):
+        movable = self.movable[None, :, None]
+        p_vel = self.p_vel * (1 - self.damping)
+        p_vel += (p_force / self.mass[None, :, None]) * self.dt
+        speed = np.sqrt(np.square(p_vel[..., 0]) + np.square(p_vel[..., 1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_vel = np.where((speed > self.max_speed)[..., None], p_vel / speed[..., None] * self.max_speed[None, :, None], p_vel)
+        self.p_vel = np.where(movable, p_vel, self.p_vel)
+        self.p_pos = np.where(movable, self.p_pos + self.p_vel * self.dt, self.p_pos)
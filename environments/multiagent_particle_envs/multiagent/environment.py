@@ -3,6 +3,14 @@ from gym import spaces
 from gym.envs.registration import EnvSpec
 import numpy as np
 from multiagent.multi_discrete import MultiDiscrete
+from multiagent.scenario import BaseScenario
+
+# get the batch version of a per-agent scenario callback if the scenario ships one
+def batch_callback(callback, name):
+    scenario = getattr(callback, '__self__', None)
+    if not isinstance(scenario, BaseScenario) or getattr(type(scenario), name) is getattr(BaseScenario, name):
+        return None
+    return getattr(scenario, name)
 
 # environment for all agents in the multiagent world
 # currently code assumes that no agents will be created/destroyed at runtime!
@@ -25,6 +33,9 @@ class MultiAgentEnv(gym.Env):
         self.observation_callback = observation_callback
         self.info_callback = info_callback
         self.done_callback = done_callback
+        # batch callbacks computing all agents at once are preferred when the scenario ships them
+        self.observations_callback = batch_callback(observation_callback, 'observations')
+        self.rewards_callback = batch_callback(reward_callback, 'rewards')
         # environment parameters
         self.discrete_action_space = True
         # if true, action is a number 0...N, otherwise action is a one-hot N-dimensional vector
@@ -69,6 +80,9 @@ class MultiAgentEnv(gym.Env):
             self.observation_space.append(spaces.Box(low=-np.inf, high=+np.inf, shape=(obs_dim,), dtype=np.float32))
             agent.action.c = np.zeros(self.world.dim_c)
 
+        # if true, an index array of shape (n,) is accepted in place of the one-hot actions
+        self.index_action_input = all([isinstance(act_space, spaces.Discrete) for act_space in self.action_space])
+
         # rendering
         self.shared_viewer = shared_viewer
         if self.shared_viewer:
@@ -77,8 +91,9 @@ class MultiAgentEnv(gym.Env):
             self.viewers = [None] * self.n
         self._reset_render()
 
-    def step(self, action_n):
-        obs_n = []
+    # the observations are written into obs_out with the shape of (n, obs_dim) if given, which is returned instead of a list
+    def step(self, action_n, obs_out=None):
+        obs_n = [] if obs_out is None else obs_out
         reward_n = []
         done_n = []
         info_n = {'n': []}
@@ -88,10 +103,16 @@ class MultiAgentEnv(gym.Env):
             self._set_action(action_n[i], agent, self.action_space[i])
         # advance world state
         self.world.step()
+        obs_batch = self._get_obs_batch()
+        reward_batch = self._get_reward_batch()
         # record observation for each agent
-        for agent in self.agents:
-            obs_n.append(self._get_obs(agent))
-            reward_n.append(self._get_reward(agent))
+        for i, agent in enumerate(self.agents):
+            obs = self._get_obs(agent) if obs_batch is None else obs_batch[i]
+            if obs_out is None:
+                obs_n.append(obs)
+            else:
+                obs_out[i] = obs
+            reward_n.append(self._get_reward(agent) if reward_batch is None else reward_batch[i])
             done_n.append(self._get_done(agent))
 
             info_n['n'].append(self._get_info(agent))
@@ -103,16 +124,20 @@ class MultiAgentEnv(gym.Env):
 
         return obs_n, reward_n, done_n, info_n
 
-    def reset(self):
+    def reset(self, obs_out=None):
         # reset world
         self.reset_callback(self.world)
         # reset renderer
         self._reset_render()
         # record observations for each agent
-        obs_n = []
         self.agents = self.world.policy_agents
-        for agent in self.agents:
-            obs_n.append(self._get_obs(agent))
+        obs_n = self._get_obs_batch()
+        if obs_out is not None:
+            for i, agent in enumerate(self.agents):
+                obs_out[i] = self._get_obs(agent) if obs_n is None else obs_n[i]
+            return obs_out
+        if obs_n is None:
+            obs_n = [self._get_obs(agent) for agent in self.agents]
         return obs_n
 
     # get info used for benchmarking
@@ -127,6 +152,12 @@ class MultiAgentEnv(gym.Env):
             return np.zeros(0)
         return self.observation_callback(agent, self.world)
 
+    # get observations for all agents at once, None without the batch callback
+    def _get_obs_batch(self):
+        if self.observations_callback is None:
+            return None
+        return list(self.observations_callback(self.world))
+
     # get dones for a particular agent
     # unused right now -- agents are allowed to go beyond the viewing screen
     def _get_done(self, agent):
@@ -140,10 +171,18 @@ class MultiAgentEnv(gym.Env):
             return 0.0
         return self.reward_callback(agent, self.world)
 
+    # get rewards for all agents at once, None without the batch callback
+    def _get_reward_batch(self):
+        if self.rewards_callback is None:
+            return None
+        return list(self.rewards_callback(self.world))
+
     # set env action for a particular agent
     def _set_action(self, action, agent, action_space, time=None):
         agent.action.u = np.zeros(self.world.dim_p)
         agent.action.c = np.zeros(self.world.dim_c)
+        # an integer is the index of a one-hot action
+        index_input = np.ndim(action) == 0 and not self.discrete_action_input
         # process action
         if isinstance(action_space, MultiDiscrete):
             act = []
@@ -165,6 +204,11 @@ class MultiAgentEnv(gym.Env):
                 if action[0] == 2: agent.action.u[0] = +1.0
                 if action[0] == 3: agent.action.u[1] = -1.0
                 if action[0] == 4: agent.action.u[1] = +1.0
+            elif index_input:
+                if action[0] == 1: agent.action.u[0] = +1.0
+                if action[0] == 2: agent.action.u[0] = -1.0
+                if action[0] == 3: agent.action.u[1] = +1.0
+                if action[0] == 4: agent.action.u[1] = -1.0
             else:
                 if self.force_discrete_action:
                     d = np.argmax(action[0])
@@ -182,7 +226,7 @@ class MultiAgentEnv(gym.Env):
             action = action[1:]
         if not agent.silent:
             # communication action
-            if self.discrete_action_input:
+            if self.discrete_action_input or index_input:
                 agent.action.c = np.zeros(self.world.dim_c)
                 agent.action.c[action[0]] = 1.0
             else:
@@ -333,3 +377,84 @@ class BatchMultiAgentEnv(gym.Env):
         for env in self.env_batch:
             results_n += env.render(mode, close)
         return results_n
+
+
+# environment for a batch of copies of a multi-agent world that are stepped in one call
+# the world is a VectorizedWorld and the scenario callbacks take the whole batch
+# actions are one-hot arrays of shape (batch, n, dim_p * 2 + 1 [+ dim_c]) and the returns are stacked over the batch
+class VectorizedMultiAgentEnv(object):
+    def __init__(self, world, reset_callback=None, reward_callback=None,
+                 observation_callback=None, done_callback=None):
+
+        self.world = world
+        self.agents = world.policy_agents
+        self.n = len(world.policy_agents)
+        self.batch_size = world.batch_size
+        # scenario callbacks
+        self.reset_callback = reset_callback
+        self.reward_callback = reward_callback
+        self.observation_callback = observation_callback
+        self.done_callback = done_callback
+        # if true, every agent has the same reward
+        self.shared_reward = world.collaborative
+        # physical action sensitivity of the policy agents
+        accel = world.accel[self.agents]
+        self.sensitivity = np.where(np.isnan(accel), 5.0, accel)
+        assert world.movable[self.agents].all()
+        self.time = 0
+
+    def step(self, action_n):
+        action_n = np.asarray(action_n)
+        # set action for all agents
+        u = np.zeros((self.batch_size, self.n, self.world.dim_p))
+        # told apart from the one-hot actions of shape (b, n, a) by the shape since those may be integer
+        index_input = action_n.ndim == 2
+        if index_input:
+            # index arrays of shape (b, n) of the one-hot actions
+            u[..., 0] += (action_n == 1).astype(float) - (action_n == 2)
+            u[..., 1] += (action_n == 3).astype(float) - (action_n == 4)
+        else:
+            u[..., 0] += action_n[..., 1] - action_n[..., 2]
+            u[..., 1] += action_n[..., 3] - action_n[..., 4]
+        u *= self.sensitivity[:, None]
+        self.world.u[:, self.agents] = u
+        speakers = ~self.world.silent[self.agents]
+        if speakers.any():
+            assert not index_input, "Speakers need one-hot actions."
+            self.world.c[:, self.agents[speakers]] = action_n[:, speakers, 5:5+self.world.dim_c]
+        # advance world state
+        self.world.step()
+        # record observation for all agents
+        obs_n = self._get_obs()
+        reward_n = self._get_reward()
+        done_n = self._get_done()
+
+        # all agents get total reward in cooperative case
+        if self.shared_reward:
+            reward_n = np.repeat(np.sum(reward_n, axis=1, keepdims=True), self.n, axis=1)
+
+        return obs_n, reward_n, done_n, {}
+
+    # reset the worlds selected by index (all by default)
+    def reset(self, index=None):
+        self.reset_callback(self.world, index)
+        return self._get_obs()
+
+    # get observations, shape = (b, n, obs_dim)
+    def _get_obs(self):
+        if self.observation_callback is None:
+            return np.zeros((self.batch_size, self.n, 0))
+        return self.observation_callback(self.world)
+
+    # get dones, shape = (b, n)
+    def _get_done(self):
+        if self.done_callback is None:
+            return np.zeros((self.batch_size, self.n), dtype=bool)
+        done = self.done_callback(self.world)
+        return np.broadcast_to(done.reshape(self.batch_size, -1), (self.batch_size, self.n))
+
+    # get rewards, shape = (b, n)
+    def _get_reward(self):
+        if self.reward_callback is None:
+            return np.zeros((self.batch_size, self.n))
+        return self.reward_callback(self.world)
@@ -1,4 +1,5 @@
 import numpy as np
+from multiagent.core import VectorizedWorld
 
 # defines scenario upon which the world is built
 class BaseScenario(object):
@@ -8,3 +9,31 @@ class BaseScenario(object):
     # create initial conditions of the world
     def reset_world(self, world):
         raise NotImplementedError()
+    # optional batch version of observation, returns the observations of all policy agents at once
+    def observations(self, world):
+        raise NotImplementedError()
+    # optional batch version of reward, returns the rewards of all policy agents at once
+    def rewards(self, world):
+        raise NotImplementedError()
+
+    # the states of world as a batch of one world for the batched callbacks, shape = (1, ...),
+    # the batch is built at the first call and loaded again at every call
+    def single_batch(self, world):
+        if getattr(world, 'single_batch', None) is None:
+            world.single_batch = VectorizedWorld(world, 1)
+        world.single_batch.load([world])
+        return world.single_batch
+
+    # indices of the policy agents in world.agents
+    def policy_indices(self, world):
+        return [i for i, agent in enumerate(world.agents) if agent.action_callback is None]
+    # positions of all entities, shape = (e, dim_p)
+    def positions(self, world):
+        return np.array([entity.state.p_pos for entity in world.entities])
+    # pairwise distances between all entities, shape = (e, e)
+    def distances(self, p_pos):
+        return np.sqrt(np.sum(np.square(p_pos[:, None, :] - p_pos[None, :, :]), axis=-1))
+    # pairwise collisions between all entities, shape = (e, e)
+    def collisions(self, world, dists):
+        size = np.array([entity.size for entity in world.entities])
+        return dists < size[:, None] + size[None, :]
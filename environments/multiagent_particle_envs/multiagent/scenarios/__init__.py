@@ -1,7 +1,7 @@
-import imp
+import importlib
 import os.path as osp
 
 
 def load(name):
-    pathname = osp.join(osp.dirname(__file__), name)
-    return imp.load_source('', pathname)
+    # a scenario module is only imported on its first load and shared by the later ones
+    return importlib.import_module('.' + osp.splitext(name)[0], __name__)
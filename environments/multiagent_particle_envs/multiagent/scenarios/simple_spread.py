@@ -1,5 +1,5 @@
 import numpy as np
-from multiagent.core import World, Agent, Landmark
+from multiagent.core import World, Agent, Landmark, VectorizedWorld
 from multiagent.scenario import BaseScenario
 
 
@@ -44,6 +44,20 @@ class Scenario(BaseScenario):
             landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
             landmark.state.p_vel = np.zeros(world.dim_p)
 
+    def make_vectorized_world(self, batch_size):
+        world = VectorizedWorld(self.make_world(), batch_size)
+        self.reset_vectorized_world(world)
+        return world
+
+    def reset_vectorized_world(self, world, index=None):
+        # set random initial states of the worlds selected by index
+        index = slice(None) if index is None else index
+        batch_size = len(world.p_pos[index])
+        world.p_pos[index, :world.num_agents] = np.random.uniform(-1, +1, (batch_size, world.num_agents, world.dim_p))
+        world.p_pos[index, world.num_agents:] = np.random.uniform(-1, +1, (batch_size, len(world.landmarks), world.dim_p))
+        world.p_vel[index] = 0.0
+        world.c[index] = 0.0
+
     def benchmark_data(self, agent, world):
         rew = 0
         collisions = 0
@@ -81,6 +95,14 @@ class Scenario(BaseScenario):
                     rew -= 1
         return rew
 
+    def rewards(self, world):
+        # the same rewards as reward for all policy agents from vectorized_reward with one world
+        return self.vectorized_reward(self.single_batch(world))[0]
+
+    def observations(self, world):
+        # the same observations as observation for all policy agents from vectorized_observation with one world
+        return self.vectorized_observation(self.single_batch(world))[0]
+
     def observation(self, agent, world):
         # get positions of all entities in this agent's reference frame
         entity_pos = []
@@ -98,3 +120,30 @@ class Scenario(BaseScenario):
             comm.append(other.state.c)
             other_pos.append(other.state.p_pos - agent.state.p_pos)
         return np.concatenate([agent.state.p_vel] + [agent.state.p_pos] + entity_pos + other_pos + comm)
+
+    def vectorized_reward(self, world):
+        # the same rewards as reward for all worlds and all policy agents, shape = (b, n)
+        agent_pos = world.p_pos[:, :world.num_agents]
+        landmark_pos = world.p_pos[:, world.num_agents:]
+        dists = np.sqrt(np.sum(np.square(agent_pos[:, :, None] - landmark_pos[:, None]), axis=-1))
+        rew = -np.sum(np.min(dists, axis=1), axis=-1)[:, None]
+        # every agent collides with itself as well
+        agent_dists = np.sqrt(np.sum(np.square(agent_pos[:, :, None] - agent_pos[:, None]), axis=-1))
+        size = world.size[:world.num_agents]
+        collisions = (agent_dists < size[:, None] + size[None, :]) & world.collide[:world.num_agents][:, None]
+        rew = rew - np.sum(collisions, axis=-1)
+        return rew[:, world.policy_agents]
+
+    def vectorized_observation(self, world):
+        # the same observations as observation for all worlds and all policy agents, shape = (b, n, obs_dim)
+        batch_size, num_agents = world.batch_size, world.num_agents
+        agent_pos = world.p_pos[:, :num_agents]
+        others = ~np.eye(num_agents, dtype=bool)
+        entity_pos = world.p_pos[:, None, num_agents:] - agent_pos[:, :, None]
+        other_pos = (agent_pos[:, None] - agent_pos[:, :, None])[:, others]
+        comm = np.broadcast_to(world.c[:, None], (batch_size, num_agents, num_agents, world.dim_c))[:, others]
+        obs = np.concatenate([world.p_vel[:, :num_agents], agent_pos,
+                              entity_pos.reshape(batch_size, num_agents, -1),
+                              other_pos.reshape(batch_size, num_agents, -1),
+                              comm.reshape(batch_size, num_agents, -1)], axis=-1)
+        return obs[:, world.policy_agents]
@@ -2,9 +2,17 @@
 COPY this file into multiagent(openai) repr to replace the old one and install again
 '''
 import numpy as np
-from multiagent.core import World, Agent, Landmark, Action
+from multiagent.core import World, Agent, Landmark, Action, VectorizedWorld
 from multiagent.scenario import BaseScenario
 
+# agents are penalized for exiting the screen, so that they can be caught by the adversaries
+def bound(x):
+    if x < 0.9:
+        return 0
+    if x < 1.0:
+        return (x - 0.9) * 10
+    return min(np.exp(2 * x - 2), 10)
+
 # By Yuan Zhang:
 def random_action(agent,world):
     action = Action()
@@ -24,6 +32,17 @@ def random_action(agent,world):
     action.u *= sensitivity
     return action
 
+# random actions of the scripted agents in all worlds, shape = (b, s, dim_p)
+def vectorized_random_action(world):
+    random_action = np.random.choice(5, (world.batch_size, len(world.scripted_agents)))
+    u = np.zeros((world.batch_size, len(world.scripted_agents), world.dim_p))
+    u[..., 0] = np.where(random_action == 1, -1.0, np.where(random_action == 2, +1.0, 0.0))
+    u[..., 1] = np.where(random_action == 3, -1.0, np.where(random_action == 4, +1.0, 0.0))
+    # accel of prey
+    accel = world.accel[world.scripted_agents]
+    u *= np.where(np.isnan(accel), 5.0, accel)[:, None]
+    return u
+
 class Scenario(BaseScenario):
     def make_world(self):
         world = World()
@@ -82,6 +101,26 @@ class Scenario(BaseScenario):
                 landmark.state.p_vel = np.zeros(world.dim_p)
 
 
+    def make_vectorized_world(self, batch_size):
+        world = VectorizedWorld(self.make_world(), batch_size)
+        world.action_callback = vectorized_random_action
+        self.vectorized_done = np.zeros(batch_size, dtype=bool)
+        self.reset_vectorized_world(world)
+        return world
+
+    def reset_vectorized_world(self, world, index=None):
+        # set random initial states of the worlds selected by index
+        index = slice(None) if index is None else index
+        self.vectorized_done[index] = False
+        batch_size = len(world.p_pos[index])
+        world.p_pos[index, :world.num_agents] = np.random.uniform(-1, +1, (batch_size, world.num_agents, world.dim_p))
+        world.p_vel[index] = 0.0
+        world.c[index] = 0.0
+        for i, landmark in enumerate(world.landmarks):
+            if not landmark.boundary:
+                world.p_pos[index, world.num_agents+i] = np.random.uniform(-0.9, +0.9, (batch_size, world.dim_p))
+
+
     def benchmark_data(self, agent, world):
         # returns data for benchmarking purposes
         if agent.adversary:
@@ -128,12 +167,6 @@ class Scenario(BaseScenario):
                     rew -= 10
 
         # agents are penalized for exiting the screen, so that they can be caught by the adversaries
-        def bound(x):
-            if x < 0.9:
-                return 0
-            if x < 1.0:
-                return (x - 0.9) * 10
-            return min(np.exp(2 * x - 2), 10)
         for p in range(world.dim_p):
             x = abs(agent.state.p_pos[p])
             rew -= bound(x)
@@ -157,6 +190,16 @@ class Scenario(BaseScenario):
                         self.done = True
         return rew
 
+    def rewards(self, world):
+        # the same rewards as reward for all policy agents from the batched rewards with one world
+        rew, caught = self.batch_reward(self.single_batch(world))
+        self.done = self.done or bool(caught[0])
+        return rew[0]
+
+    def observations(self, world):
+        # the same observations as observation for all policy agents from vectorized_observation with one world
+        return self.vectorized_observation(self.single_batch(world))[0]
+
     def observation(self, agent, world):
         # get positions of all entities in this agent's reference frame
         entity_pos = []
@@ -177,3 +220,47 @@ class Scenario(BaseScenario):
 
     def episode_over(self, agent, world):
         return self.done
+
+    def vectorized_reward(self, world):
+        # the same rewards as reward for all worlds and all policy agents, shape = (b, n)
+        rew, caught = self.batch_reward(world)
+        self.vectorized_done |= caught
+        return rew
+
+    def batch_reward(self, world):
+        # the rewards of shape (b, n) and whether an adversary with collide caught a good agent in each world, shape = (b,)
+        agent_pos = world.p_pos[:, :world.num_agents]
+        adversary = np.array([agent.adversary for agent in world.agents])
+        good_agents, adversaries = np.flatnonzero(~adversary), np.flatnonzero(adversary)
+        collide = world.collide[:world.num_agents]
+        dists = np.sqrt(np.sum(np.square(agent_pos[:, :, None] - agent_pos[:, None]), axis=-1))
+        size = world.size[:world.num_agents]
+        collisions = dists < size[:, None] + size[None, :]
+        # the shaped reward is the same for all adversaries and every catch of a good agent adds 10
+        shaped = -0.1 * np.sum(np.min(dists[:, good_agents[:, None], adversaries], axis=1), axis=-1)
+        catches = np.sum(collisions[:, good_agents[:, None], adversaries], axis=(1, 2))
+        adversary_rew = shaped[:, None] + 10 * catches[:, None] * collide
+        # good agents lose 10 per adversary touching them and are penalized for exiting the screen
+        x = np.abs(agent_pos)
+        outside = np.sum(np.where(x < 0.9, 0, np.where(x < 1.0, (x - 0.9) * 10, np.minimum(np.exp(2 * x - 2), 10))), axis=-1)
+        good_rew = -10 * np.sum(collisions[:, adversaries], axis=1) * collide - outside
+        rew = np.where(adversary, adversary_rew, good_rew)[:, world.policy_agents]
+        caught = (catches > 0) & np.any((adversary & collide)[world.policy_agents])
+        return rew, caught
+
+    def vectorized_observation(self, world):
+        # the same observations as observation for all worlds and all policy agents, shape = (b, n, obs_dim),
+        # the policy agents are the adversaries, so all of them observe the same number of good agents
+        agent_pos = world.p_pos[:, :world.num_agents]
+        landmarks = [world.num_agents+i for i, landmark in enumerate(world.landmarks) if not landmark.boundary]
+        others = [[j for j in range(world.num_agents) if j != i] for i in world.policy_agents]
+        good_others = [[j for j in other if not world.agents[j].adversary] for other in others]
+        pos = agent_pos[:, world.policy_agents, None]
+        shape = (world.batch_size, len(others), -1)
+        return np.concatenate([world.p_vel[:, world.policy_agents], pos[:, :, 0],
+                               (world.p_pos[:, None, landmarks] - pos).reshape(shape),
+                               (agent_pos[:, others] - pos).reshape(shape),
+                               world.p_vel[:, good_others].reshape(shape)], axis=-1)
+
+    def vectorized_episode_over(self, world):
+        return self.vectorized_done
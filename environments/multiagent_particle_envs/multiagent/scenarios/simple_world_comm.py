@@ -3,6 +3,14 @@ from multiagent.core import World, Agent, Landmark
 from multiagent.scenario import BaseScenario
 
 
+def bound(x):
+    if x < 0.9:
+        return 0
+    if x < 1.0:
+        return (x - 0.9) * 10
+    return min(np.exp(2 * x - 2), 10)  # 1 + (x - 1) * (x - 1)
+
+
 class Scenario(BaseScenario):
     def make_world(self):
         world = World()
@@ -164,12 +172,6 @@ class Scenario(BaseScenario):
             for a in adversaries:
                 if self.is_collision(a, agent):
                     rew -= 5
-        def bound(x):
-            if x < 0.9:
-                return 0
-            if x < 1.0:
-                return (x - 0.9) * 10
-            return min(np.exp(2 * x - 2), 10)  # 1 + (x - 1) * (x - 1)
 
         for p in range(world.dim_p):
             x = abs(agent.state.p_pos[p])
@@ -198,6 +200,73 @@ class Scenario(BaseScenario):
         return rew
 
 
+    def rewards(self, world):
+        # the same rewards as reward for all policy agents from one pairwise distance matrix
+        num_agents = len(world.agents)
+        p_pos = self.positions(world)
+        dists = self.distances(p_pos)
+        collisions = self.collisions(world, dists)
+        adversary = np.array([agent.adversary for agent in world.agents])
+        good_agents, adversaries = np.flatnonzero(~adversary), np.flatnonzero(adversary)
+        food = [num_agents + world.landmarks.index(f) for f in world.food]
+        caught = collisions[np.ix_(good_agents, adversaries)].reshape(-1)
+        rews = []
+        for i in self.policy_indices(world):
+            agent = world.agents[i]
+            rew = 0
+            if agent.adversary:
+                rew -= 0.1 * np.min(dists[good_agents, i])
+                if agent.collide:
+                    for c in caught:
+                        if c:
+                            rew += 5
+            else:
+                if agent.collide:
+                    for a in adversaries:
+                        if collisions[a, i]:
+                            rew -= 5
+                for p in range(world.dim_p):
+                    rew -= 2 * bound(abs(p_pos[i, p]))
+                for f in food:
+                    if collisions[i, f]:
+                        rew += 2
+                rew += 0.05 * np.min(dists[food, i])
+            rews.append(rew)
+        return rews
+
+    def observations(self, world):
+        # the same observations as observation for all policy agents from one pairwise distance matrix
+        num_agents = len(world.agents)
+        p_pos = self.positions(world)
+        p_vel = np.array([agent.state.p_vel for agent in world.agents])
+        collisions = self.collisions(world, self.distances(p_pos))
+        landmarks = [num_agents + i for i, landmark in enumerate(world.landmarks) if not landmark.boundary]
+        forests = [num_agents + world.landmarks.index(f) for f in world.forests]
+        # whether every agent is in each of the first two forests, shape = (a, 2)
+        in_forest = collisions[:num_agents, forests[:2]]
+        inf1, inf2 = in_forest[:, 0], in_forest[:, 1]
+        leader = np.array([agent.leader for agent in world.agents])
+        # whether the other agent (column) is visible to the agent (row), shape = (a, a)
+        visible = (inf1[:, None] & inf1[None, :]) | (inf2[:, None] & inf2[None, :]) | \
+                  (~inf1[:, None] & ~inf1[None, :] & ~inf2[:, None] & ~inf2[None, :]) | leader[:, None]
+        other_pos = np.where(visible[:, :, None], p_pos[None, :num_agents] - p_pos[:num_agents, None], 0)
+        other_vel = np.where(visible[:, :, None], p_vel[None, :], 0)
+        in_forest = np.where(in_forest, 1, -1)
+        comm = world.agents[0].state.c
+        obs = []
+        for i in self.policy_indices(world):
+            agent = world.agents[i]
+            others = [j for j in range(num_agents) if j != i]
+            good_others = [j for j in others if not world.agents[j].adversary]
+            entity_pos = (p_pos[landmarks] - p_pos[i]).reshape(-1)
+            if agent.adversary:
+                obs.append(np.concatenate([p_vel[i], p_pos[i], entity_pos, other_pos[i, others].reshape(-1),
+                                           other_vel[i, good_others].reshape(-1), in_forest[i], comm]))
+            else:
+                obs.append(np.concatenate([p_vel[i], p_pos[i], entity_pos, other_pos[i, others].reshape(-1),
+                                           in_forest[i], other_vel[i, good_others].reshape(-1)]))
+        return obs
+
     def observation2(self, agent, world):
         # get positions of all entities in this agent's reference frame
         entity_pos = []
@@ -32,7 +32,7 @@ from gym import spaces
 class PredatorPreyEnv(gym.Env):
     # metadata = {'render.modes': ['human']}
 
-    def __init__(self,):
+    def __init__(self, dim=5, npredator=3):
         self.__version__ = "0.0.1"
 
         # TODO: better config handling
@@ -46,9 +46,9 @@ class PredatorPreyEnv(gym.Env):
 
         # init args
         self.nprey = 1 # Total number of preys in play
-        self.npredator = 3 # Total number of predators in play
+        self.npredator = npredator # Total number of predators in play
         self.no_stay = False # Whether predators have an action to stay in place
-        self.dim = 5  # Dimension of box
+        self.dim = dim  # Dimension of box
         self.vision = 1 # Vision of predator
         self.moving_prey = False # Whether prey is fixed or moxing
         self.mode = 'cooperative' # cooperative|competitive|mixed (default: mixed)
@@ -68,6 +68,8 @@ class PredatorPreyEnv(gym.Env):
             self.naction = 5
         else:
             self.naction = 4
+        # Actions can be given as indices in place of one-hot vectors
+        self.index_action_input = True
 
 
         self.BASE = (dims[0] * dims[1])
@@ -80,6 +82,13 @@ class PredatorPreyEnv(gym.Env):
         #          predator + prey + grid + outside
         # observation dim
         self.obs_dim = self.vocab_size*(2*self.vision+1)*(2*self.vision+1)
+
+        # (dy, dx) of UP, RIGHT, DOWN, LEFT and STAY
+        self.moves = np.array([[-1, 0], [0, 1], [1, 0], [0, -1], [0, 0]])[:self.naction]
+        # Channels of the occupancy of predators and preys
+        self.agent_class = np.array([0] * self.npredator + [1] * self.nprey)
+        self._set_grid()
+        self._set_obs_buffer()
         
         # gym like environment
         self.action_space = []
@@ -88,16 +97,17 @@ class PredatorPreyEnv(gym.Env):
             # Action for each agent will be naction 
             self.action_space.append(spaces.Discrete(self.naction))
             # Observation for each agent will be vision * vision ndarray
-            self.observation_space.append(spaces.Box(low=0, high=1, shape=(self.obs_dim,), dtype=int))
+            self.observation_space.append(spaces.Box(low=0, high=1, shape=(self.obs_dim,), dtype=np.float32))
         return
 
 
-    def step(self, action):
+    def step(self, action, obs_out=None):
         """
         The agents take a step in the environment.
         Parameters
         ----------
-        action : list/ndarray of length m, containing the indexes of what lever each 'm' chosen agents pulled.
+        action : list/ndarray of length m, containing the one-hot vectors or the indexes of what lever each 'm' chosen agents pulled.
+        obs_out : n x obs_dim ndarray (optional) the observation is written into and returned.
         Returns
         -------
         obs, reward, episode_over, info : tuple
@@ -106,26 +116,28 @@ class PredatorPreyEnv(gym.Env):
             episode_over (bool) : Will be true as episode length is 1
             info (dict) : diagnostic information useful for debugging.
         """
-        if self.episode_over:
+        if np.any(self.episode_over):
             raise RuntimeError("Episode is done")
-        action = np.array(action).squeeze()
-        action = np.atleast_1d(action)
-
-        for i, a in enumerate(action):
-            # a is a onehot vector
-            self._take_action(i, np.argmax(a))
+        # each action is a onehot vector or an index, told apart by the shape since one-hot may be integer
+        action = np.array(action)
+        batch_shape = self.predator_loc.shape[:-2]
+        if action.ndim == len(batch_shape) + 2 and action.shape[-1] == self.naction:
+            action = np.argmax(action, axis=-1)
+        action = action.reshape(batch_shape + (self.n,))
+        assert np.all(action < self.naction), "Actions should be in the range [0,naction)."
+        self._take_actions(action)
 
-        assert np.all(action <= self.naction), "Actions should be in the range [0,naction)."
-
-        self.episode_over = False
-        self.obs = self._get_obs()
+        obs = self._get_obs(obs_out)
 
         debug = {'predator_locs':self.predator_loc,'prey_locs':self.prey_loc}
-        return self._flatten_obs(self.obs), self._get_reward(), self.episode_over, debug
+        return obs, self._get_reward(), self.episode_over, debug
 
-    def reset(self):
+    def reset(self, obs_out=None):
         """
         Reset the state of the environment and returns an initial observation.
+        Parameters
+        ----------
+        obs_out : n x obs_dim ndarray (optional) the observation is written into and returned.
         Returns
         -------
         observation (object): the initial observation of the space.
@@ -137,14 +149,11 @@ class PredatorPreyEnv(gym.Env):
         locs = self._get_cordinates()
         self.predator_loc, self.prey_loc = locs[:self.npredator], locs[self.npredator:]
 
-        self._set_grid()
-
         # stat - like success ratio
         self.stat = dict()
 
-        # Observation will be npredator * vision * vision ndarray
-        self.obs = self._get_obs()
-        return self._flatten_obs(self.obs)
+        # Observation will be n * obs_dim ndarray
+        return self._get_obs(obs_out)
 
     def _get_cordinates(self):
         idx = np.random.choice(np.prod(self.dims),(self.npredator + self.nprey), replace=False)
@@ -159,131 +168,91 @@ class PredatorPreyEnv(gym.Env):
         # Padding for vision
         self.grid = np.pad(self.grid, self.vision, 'constant', constant_values = self.OUTSIDE_CLASS)
 
-        self.empty_bool_base_grid = self._onehot_initialization(self.grid)
-
-    def _get_obs(self):
-        self.bool_base_grid = self.empty_bool_base_grid.copy()  # size: 7*7*29=(dim+2*vision)*(dim+2*vision)*vocab
-
-
-        for i, p in enumerate(self.predator_loc):
-            self.bool_base_grid[p[0] + self.vision, p[1] + self.vision, self.PREDATOR_CLASS] += 1
-
-        for i, p in enumerate(self.prey_loc):
-            self.bool_base_grid[p[0] + self.vision, p[1] + self.vision, self.PREY_CLASS] += 1
-
-        obs = []
-        for p in self.predator_loc:
-            slice_y = slice(p[0], p[0] + (2 * self.vision) + 1)
-            slice_x = slice(p[1], p[1] + (2 * self.vision) + 1)
-            obs.append(self.bool_base_grid[slice_y, slice_x])
-
-        if self.enemy_comm:
-            for p in self.prey_loc:
-                slice_y = slice(p[0], p[0] + (2 * self.vision) + 1)
-                slice_x = slice(p[1], p[1] + (2 * self.vision) + 1)
-                obs.append(self.bool_base_grid[slice_y, slice_x])
-
-        obs = np.stack(obs)
-        return obs
-
-    def _take_action(self, idx, act):
-        # prey action
-        if idx >= self.npredator:
-            # fixed prey
-            if not self.moving_prey:
-                return
-            else:
-                raise NotImplementedError
-
-        if self.reached_prey[idx] == 1:
-            return
-
-        # STAY action
-        if act==5:
-            return
-
-        # UP
-        if act==0 and self.grid[max(0,
-                                self.predator_loc[idx][0] + self.vision - 1),
-                                self.predator_loc[idx][1] + self.vision] != self.OUTSIDE_CLASS:
-            self.predator_loc[idx][0] = max(0, self.predator_loc[idx][0]-1)
-
-        # RIGHT
-        elif act==1 and self.grid[self.predator_loc[idx][0] + self.vision,
-                                min(self.dims[1] -1,
-                                    self.predator_loc[idx][1] + self.vision + 1)] != self.OUTSIDE_CLASS:
-            self.predator_loc[idx][1] = min(self.dims[1]-1,
-                                            self.predator_loc[idx][1]+1)
-
-        # DOWN
-        elif act==2 and self.grid[min(self.dims[0]-1,
-                                    self.predator_loc[idx][0] + self.vision + 1),
-                                    self.predator_loc[idx][1] + self.vision] != self.OUTSIDE_CLASS:
-            self.predator_loc[idx][0] = min(self.dims[0]-1,
-                                            self.predator_loc[idx][0]+1)
-
-        # LEFT
-        elif act==3 and self.grid[self.predator_loc[idx][0] + self.vision,
-                                    max(0,
-                                    self.predator_loc[idx][1] + self.vision - 1)] != self.OUTSIDE_CLASS:
-            self.predator_loc[idx][1] = max(0, self.predator_loc[idx][1]-1)
+    def _set_obs_buffer(self, batch_shape=()):
+        # Offsets of the vision square in the padded grid
+        self.window = np.arange(2 * self.vision + 1)
+        # Preallocated observations, float32 as the policies read them
+        self.obs = np.zeros(batch_shape + (self.n, self.obs_dim), dtype=np.float32)
+        # shape = (games, n, 2*vision+1, 2*vision+1, vocab_size), a view of the observations
+        self.obs_vision = self.obs.reshape((-1, self.n, len(self.window), len(self.window), self.vocab_size))
+        # Flat offsets of the vocab of every vision cell, shape = (games, n, 2*vision+1, 2*vision+1)
+        self.cell_offsets = np.arange(self.obs.size, step=self.vocab_size).reshape(self.obs_vision.shape[:-1])
+        # Flat indices of the grid ones written by the last call, the rest of the buffer stays zero
+        self.cell_ones = np.zeros(0, dtype=np.int64)
+
+    def _get_obs(self, obs_out=None):
+        # Locations of all agents of all games, shape = (games, npredator+nprey, 2)
+        locs = np.concatenate([self.predator_loc, self.prey_loc], axis=-2).reshape(-1, self.npredator + self.nprey, 2)
+        games = np.arange(len(locs))[:, None]
+        h, w = self.grid.shape
+
+        # Occupancy of predators and preys from one scatter, shape = (games, h, w, 2)
+        cells = ((games * h + locs[..., 0] + self.vision) * w + locs[..., 1] + self.vision) * 2 + self.agent_class
+        occupancy = np.bincount(cells.ravel(), minlength=len(locs) * h * w * 2).reshape(len(locs), h, w, 2)
+
+        # Vision squares of all observers in one gather, shape = (games, n, 2*vision+1, 2*vision+1)
+        observers = locs if self.enemy_comm else locs[:, :self.npredator]
+        rows = observers[..., 0, None, None] + self.window[:, None]
+        cols = observers[..., 1, None, None] + self.window[None, :]
+        games = games[..., None, None]
+        # Scatter the single grid one of each vision cell by its cell id instead of copying the one-hot vocab
+        flat = self.obs.reshape(-1)
+        flat[self.cell_ones] = 0
+        self.cell_ones = (self.cell_offsets + self.grid[rows, cols]).ravel()
+        flat[self.cell_ones] = 1
+        # The grid never holds the agent classes, so their channels are overwritten
+        self.obs_vision[..., self.PREDATOR_CLASS] = occupancy[games, rows, cols, 0]
+        self.obs_vision[..., self.PREY_CLASS] = occupancy[games, rows, cols, 1]
+
+        if obs_out is None:
+            return self.obs.copy()
+        obs_out[...] = self.obs
+        return obs_out
+
+    def _take_actions(self, act):
+        # prey is fixed, predators which reached the prey stay
+        move = self.moves[act[..., :self.npredator]] * (self.reached_prey[..., None] == 0)
+        # moves out of the grid are blocked
+        np.clip(self.predator_loc + move, 0, np.array(self.dims) - 1, out=self.predator_loc)
 
     def _get_reward(self):
-        reward = np.full(self.n, self.TIMESTEP_PENALTY)
+        reward = np.full(self.predator_loc.shape[:-2] + (self.n,), self.TIMESTEP_PENALTY)
 
-        on_prey = np.where(np.all(self.predator_loc == self.prey_loc,axis=1))[0]
-        nb_predator_on_prey = on_prey.size
+        # shape = (games, npredator)
+        on_prey = np.all(self.predator_loc[..., :, None, :] == self.prey_loc[..., None, :, :], axis=-1).any(axis=-1)
+        nb_predator_on_prey = on_prey.sum(axis=-1, keepdims=True)
 
         if self.mode == 'cooperative':
-            reward[on_prey] = self.POS_PREY_REWARD * nb_predator_on_prey
+            reward[..., :self.npredator] = np.where(on_prey, self.POS_PREY_REWARD * nb_predator_on_prey, reward[..., :self.npredator])
         elif self.mode == 'competitive':
-            if nb_predator_on_prey:
-                reward[on_prey] = self.POS_PREY_REWARD / nb_predator_on_prey
+            reward[..., :self.npredator] = np.where(on_prey, self.POS_PREY_REWARD / np.maximum(nb_predator_on_prey, 1), reward[..., :self.npredator])
         elif self.mode == 'mixed':
-            reward[on_prey] = self.PREY_REWARD
+            reward[..., :self.npredator] = np.where(on_prey, self.PREY_REWARD, reward[..., :self.npredator])
         else:
             raise RuntimeError("Incorrect mode, Available modes: [cooperative|competitive|mixed]")
 
         self.reached_prey[on_prey] = 1
 
-        if np.all(self.reached_prey == 1) and self.mode == 'mixed':
-            self.episode_over = True
+        if self.mode == 'mixed':
+            self.episode_over = self.episode_over | np.all(self.reached_prey == 1, axis=-1)
 
         # Prey reward
-        if nb_predator_on_prey == 0:
-            reward[self.npredator:] = -1 * self.TIMESTEP_PENALTY
-        else:
-            # TODO: discuss & finalise
-            reward[self.npredator:] = 0
+        # TODO: discuss & finalise
+        reward[..., self.npredator:] = np.where(nb_predator_on_prey == 0, -1 * self.TIMESTEP_PENALTY, 0)
 
         # Success ratio
         if self.mode != 'competitive':
-            if nb_predator_on_prey == self.npredator:
-                self.stat['success'] = 1
-            else:
-                self.stat['success'] = 0
+            self.stat['success'] = (nb_predator_on_prey[..., 0] == self.npredator).astype(int)
 
         # global reward special for cooperative game 
         if self.mode == 'cooperative':
-            mean_reward = reward.mean()
-            reward = np.full(self.n, mean_reward)
+            reward[:] = reward.mean(axis=-1, keepdims=True)
         return reward
 
 
     def _onehot_initialization(self, a):
         ncols = self.vocab_size
-        out = np.zeros(a.shape + (ncols,), dtype=int)
-        out[self._all_idx(a, axis=2)] = 1
-        return out
-
-    def _all_idx(self, idx, axis):
-        grid = np.ogrid[tuple(map(slice, idx.shape))]
-        grid.insert(axis, idx)
-        return tuple(grid)
-
-    def _flatten_obs(self, obs):
-        obs = [ob.reshape(self.obs_dim) for ob in obs]
-        return obs
+        return np.eye(ncols, dtype=int)[a]
 
     def init_curses(self):
         self.stdscr = curses.initscr()
@@ -327,3 +296,57 @@ class PredatorPreyEnv(gym.Env):
 
     def exit_render(self):
         curses.endwin()
+
+
+
+class BatchedPredatorPreyEnv(PredatorPreyEnv):
+    """
+    Simulate batch_size independent predator prey games at once.
+    The locations of all games are kept in arrays of shape (batch_size, npredator, 2)
+    and (batch_size, nprey, 2), and the moves, the observations and the rewards
+    are computed for all games with the methods of PredatorPreyEnv.
+    """
+
+    def __init__(self, batch_size, dim=5, npredator=3):
+        self.batch_size = batch_size
+        super(BatchedPredatorPreyEnv, self).__init__(dim, npredator)
+
+    def _set_obs_buffer(self):
+        super(BatchedPredatorPreyEnv, self)._set_obs_buffer((self.batch_size,))
+
+    def reset(self, index=None, obs_out=None):
+        """
+        Reset the games selected by index (all by default) and returns the observations of all games.
+        Parameters
+        ----------
+        obs_out : batch_size x n x obs_dim ndarray (optional) the observations are written into and returned.
+        Returns
+        -------
+        observation (batch_size x n x obs_dim ndarray): the observations of all games.
+        """
+        locs = self._get_cordinates()
+        if index is None:
+            self.episode_over = np.zeros(self.batch_size, dtype=bool)
+            self.reached_prey = np.zeros((self.batch_size, self.npredator))
+            self.predator_loc, self.prey_loc = locs[:, :self.npredator], locs[:, self.npredator:]
+            self.stat = dict()
+        else:
+            self.episode_over[index] = False
+            self.reached_prey[index] = 0
+            self.predator_loc[index] = locs[index, :self.npredator]
+            self.prey_loc[index] = locs[index, self.npredator:]
+        return self._get_obs(obs_out)
+
+    def _get_cordinates(self):
+        # distinct cells of each game are the first ones of a random permutation
+        idx = np.argsort(np.random.uniform(size=(self.batch_size, np.prod(self.dims))), axis=1)[:, :self.npredator + self.nprey]
+        return np.stack(np.unravel_index(idx, self.dims), axis=-1)
+
+    def render(self, mode='human', close=False):
+        # Render the first game with the locations of a single game
+        predator_loc, prey_loc = self.predator_loc, self.prey_loc
+        self.predator_loc, self.prey_loc = predator_loc[0], prey_loc[0]
+        try:
+            super(BatchedPredatorPreyEnv, self).render(mode, close)
+        finally:
+            self.predator_loc, self.prey_loc = predator_loc, prey_loc
@@ -17,6 +17,7 @@ Design Decisions:
 """
 
 # core modules
+import os
 import random
 import math
 import curses
@@ -32,10 +33,15 @@ def nPr(n,r):
     f = math.factorial
     return f(n)//f(n-r)
 
+# Grids, routes and add matrices per (difficulty, dims, vision, vocab_type), shared by all envs of the process
+JUNCTIONS = {}
+# Version of the tables stored in the .npz cache files, files of another version are rebuilt
+JUNCTION_FORMAT = 1
+
 class TrafficJunctionEnv(gym.Env):
     # metadata = {'render.modes': ['human']}
 
-    def __init__(self,):
+    def __init__(self, cache_path=None):
         self.name = "traffic_junction"
         self.__version__ = "0.0.1"
 
@@ -95,6 +101,8 @@ class TrafficJunctionEnv(gym.Env):
         # (0: GAS, 1: BRAKE) i.e. (0: Move 1-step, 1: STAY)
         self.naction = 2
         action_space_per_agent = spaces.Discrete(self.naction)
+        # Actions can be given as indices in place of one-hot vectors
+        self.index_action_input = True
 
         # make no. of dims odd for easy case.
         if difficulty == 'easy':
@@ -124,12 +132,10 @@ class TrafficJunctionEnv(gym.Env):
         else:
             raise NotImplementedError
 
-        self._set_grid()
-
-        if difficulty == 'easy':
-            self._set_paths_easy()
-        else:
-            self._set_paths(difficulty)
+        # Directory of the .npz files of the precomputed junctions, None to keep them in memory only
+        self.cache_path = cache_path
+        self._set_junction()
+        self._set_obs_buffer()
 
         self.action_space = []
         self.observation_space = []
@@ -139,27 +145,12 @@ class TrafficJunctionEnv(gym.Env):
 
         return
 
-    def _flatten_obs(self, obs):
-        _obs=[]
-        for agent_obs in obs: #list/tuple of observations.
-            agent_onehot = self._onehot(agent_obs[0], self.naction)
-            path_onehot = self._onehot(agent_obs[1], self.npath)
-            vision_onehot = np.array(agent_obs[2]).flatten()
-            agent_obs = [agent_onehot, path_onehot, vision_onehot]
-            _obs.append(np.concatenate(agent_obs))
-        return _obs
-
-
-    def _onehot(self, a, n):
-        # a is a number
-        # return 1*n one hot vector
-        eye = np.eye(n,dtype=np.int32)
-        return eye[int(a)]
-
-
-    def reset(self, epoch=None):
+    def reset(self, epoch=None, obs_out=None):
         """
         Reset the state of the environment and returns an initial observation.
+        Parameters
+        ----------
+        obs_out : ncar x obs_dim ndarray (optional) the observation is written into and returned.
         Returns
         -------
         observation (object): the initial observation of the space.
@@ -198,16 +189,16 @@ class TrafficJunctionEnv(gym.Env):
             self.curriculum(epoch)
             self.epoch_last_update = epoch
 
-        # Observation will be ncar * vision * vision ndarray
-        obs = self._get_obs()
-        return self._flatten_obs(obs)
+        # Observation will be ncar * obs_dim ndarray
+        return self._get_obs(obs_out)
 
-    def step(self, action):
+    def step(self, action, obs_out=None):
         """
         The agents(car) take a step in the environment.
         Parameters
         ----------
-        action : shape - either ncar or ncar x 1
+        action : shape - either ncar x naction one-hot or ncar indices
+        obs_out : ncar x obs_dim ndarray (optional) the observation is written into and returned.
         Returns
         -------
         obs, reward, episode_over, info : tuple
@@ -219,10 +210,13 @@ class TrafficJunctionEnv(gym.Env):
         if self.episode_over:
             raise RuntimeError("Episode is done")
 
-        # Expected shape: either ncar or ncar x 1
-        action = np.array(action).squeeze()
+        # Expected shape: either ncar x naction one-hot or ncar indices, told apart by the shape since one-hot may be integer
+        action = np.array(action)
+        if action.ndim == 2 and action.shape[-1] == self.naction:
+            action = np.argmax(action, axis=-1)
+        action = action.reshape(-1)
 
-        assert np.all(action <= self.naction), "Actions should be in the range [0,naction)."
+        assert np.all(action < self.naction), "Actions should be in the range [0,naction)."
 
         assert len(action) == self.ncar, "Action for each agent should be provided."
 
@@ -230,11 +224,11 @@ class TrafficJunctionEnv(gym.Env):
         self.is_completed = np.zeros(self.ncar)
 
         for i, a in enumerate(action):
-            self._take_action(i, np.argmax(a))
+            self._take_action(i, a)
 
         self._add_cars()
 
-        obs = self._get_obs()
+        obs = self._get_obs(obs_out)
         reward = self._get_reward()
 
         self.stat['success'] = 1.0 - self.has_failed
@@ -248,7 +242,7 @@ class TrafficJunctionEnv(gym.Env):
                 'success': self.stat['success']
                 }
 
-        return self._flatten_obs(obs), reward, self.episode_over, debug
+        return obs, reward, self.episode_over, debug
 
     def render(self, mode='human', close=False):
 
@@ -317,55 +311,122 @@ class TrafficJunctionEnv(gym.Env):
 
         self.empty_bool_base_grid = self._onehot_initialization(self.pad_grid)
 
-    def _get_obs(self):
-        h, w = self.dims
-        self.bool_base_grid = self.empty_bool_base_grid.copy()
-
-        # Mark cars' location in Bool grid
-        for i, p in enumerate(self.car_loc):
-            self.bool_base_grid[p[0] + self.vision, p[1] + self.vision, self.CAR_CLASS] += 1
-
-
-        # remove the outside class.
-        if self.vocab_type == 'scalar':
-            self.bool_base_grid = self.bool_base_grid[:,:,1:]
-
-
-        obs = []
-        for i, p in enumerate(self.car_loc):
-            # most recent action
-            # act = self.car_last_act[i] / (self.naction - 1)
-            act = self.car_last_act[i] 
-
-            # route id
-            # r_i = self.route_id[i] / (self.npath - 1)
-            r_i = self.route_id[i] 
-
-            # loc
-            p_norm = p / (h-1, w-1)
-
-            # vision square
-            slice_y = slice(p[0], p[0] + (2 * self.vision) + 1)
-            slice_x = slice(p[1], p[1] + (2 * self.vision) + 1)
-            v_sq = self.bool_base_grid[slice_y, slice_x]
-
-            # when dead, all obs are 0. But should be masked by trainer.
-            if self.alive_mask[i] == 0:
-                act = np.zeros_like(act)
-                r_i = np.zeros_like(r_i)
-                p_norm = np.zeros_like(p_norm)
-                v_sq = np.zeros_like(v_sq)
-
-            if self.vocab_type == 'bool':
-                o = tuple((act, r_i, v_sq))
-            else:
-                o = tuple((act, r_i, p_norm, v_sq))
-            obs.append(o)
-
-        obs = tuple(obs)
+    def _set_junction(self):
+        key = (self.difficulty, tuple(self.dims), self.vision, self.vocab_type)
+        if key not in JUNCTIONS:
+            fname, tables = None, None
+            if self.cache_path is not None:
+                fname = os.path.join(self.cache_path, 'traffic_junction_{}_{}x{}_{}_{}.npz'.format(self.difficulty, self.dims[0], self.dims[1], self.vision, self.vocab_type))
+            if fname is not None and os.path.isfile(fname):
+                with np.load(fname) as f:
+                    tables = dict(f)
+                # a file of another format or with other tables is rebuilt
+                if int(tables.pop('format', -1)) != JUNCTION_FORMAT or set(tables) != self._junction_tables():
+                    tables = None
+            if tables is None:
+                tables = self._build_junction()
+                if fname is not None:
+                    os.makedirs(self.cache_path, exist_ok=True)
+                    # write to a temporary file first as several processes may build the same junction
+                    tmp = '{}.{}.tmp'.format(fname, os.getpid())
+                    with open(tmp, 'wb') as f:
+                        np.savez(f, format=np.array(JUNCTION_FORMAT), **tables)
+                    os.replace(tmp, fname)
+            for table in tables.values():
+                table.flags.writeable = False
+            JUNCTIONS[key] = tables
+
+        tables = JUNCTIONS[key]
+        for name, table in tables.items():
+            setattr(self, name, table)
+        # Routes as list of list of paths, views of the path table
+        nroute = int(self.nroute)
+        size = len(self.path_len) // nroute
+        self.routes = [[self.path_table[i, :self.path_len[i]] for i in range(r * size, (r + 1) * size)] for r in range(nroute)]
+
+    def _junction_tables(self):
+        # Names of the tables built by _build_junction
+        names = {'grid', 'pad_grid', 'empty_bool_base_grid', 'path_table', 'path_len', 'nroute'}
+        if self.vocab_type == 'bool':
+            names.add('route_grid')
+        if self.difficulty != 'easy':
+            names.update(['arrival_points', 'finish_points', 'road_dir', 'junction'])
+        return names
 
-        return obs
+    def _build_junction(self):
+        self._set_grid()
 
+        if self.difficulty == 'easy':
+            self._set_paths_easy()
+        else:
+            self._set_paths(self.difficulty)
+
+        # Unrolled paths, indexed by the route id as all routes have the same no. of paths
+        paths = [p for r in self.routes for p in r]
+        assert all(len(r) == len(self.routes[0]) for r in self.routes)
+        # shape = (npath, max path len, 2)
+        path_len = np.array([len(p) for p in paths])
+        path_table = np.zeros((len(paths), path_len.max(), len(self.dims)), dtype=int)
+        for i, p in enumerate(paths):
+            path_table[i, :len(p)] = p
+
+        tables = {'grid': self.grid,
+                  'pad_grid': self.pad_grid,
+                  'empty_bool_base_grid': self.empty_bool_base_grid,
+                  'path_table': path_table,
+                  'path_len': path_len,
+                  'nroute': np.array(len(self.routes))
+                  }
+        if self.vocab_type == 'bool':
+            tables['route_grid'] = self.route_grid
+        if self.difficulty != 'easy':
+            route_grid = self.route_grid if self.vocab_type == 'bool' else self.grid
+            arrival_points, finish_points, road_dir, junction = get_add_mat(self.dims, route_grid, self.difficulty)
+            tables.update(arrival_points=np.array(arrival_points), finish_points=np.array(finish_points), road_dir=road_dir, junction=junction)
+        return tables
+
+    def _set_obs_buffer(self, batch_shape=()):
+        # One-hot tables of the last action and the route id
+        self.action_onehot = np.eye(self.naction, dtype=int)
+        self.path_onehot = np.eye(self.npath, dtype=int)
+        # Offsets of the vision square in the padded grid
+        self.window = np.arange(2 * self.vision + 1)
+
+        # Preallocated observations, the parts below are views of it
+        self.obs = np.zeros(batch_shape + (self.ncar, self.obs_dim), dtype=int)
+        self.obs_act = self.obs[..., :self.naction]
+        self.obs_route = self.obs[..., self.naction:self.naction + self.npath]
+        # shape = batch_shape + (ncar, 2*vision+1, 2*vision+1, vocab_size)
+        self.obs_vision = self.obs[..., self.naction + self.npath:].reshape(batch_shape + (self.ncar, len(self.window), len(self.window), self.vocab_size))
+
+    def _get_obs(self, obs_out=None):
+        # when dead, act, route id and vision are 0. But should be masked by trainer.
+        alive = self.alive_mask == 1
+
+        # most recent action and route id
+        self.obs_act[:] = self.action_onehot[np.where(alive, self.car_last_act, 0)]
+        self.obs_route[:] = self.path_onehot[np.where(alive, self.route_id, 0)]
+
+        # vision squares of all cars in one gather, shape = (ncar, 2*vision+1, 2*vision+1)
+        rows = self.car_loc[:, 0, None, None] + self.window[:, None]
+        cols = self.car_loc[:, 1, None, None] + self.window[None, :]
+        self.obs_vision[:] = self.empty_bool_base_grid[rows, cols]
+
+        # Mark cars' location (dead ones at the corner as well) in the vision squares
+        pad_loc = np.ravel_multi_index((self.car_loc[:, 0] + self.vision, self.car_loc[:, 1] + self.vision), self.pad_grid.shape)
+        car_grid = np.bincount(pad_loc, minlength=self.pad_grid.size).reshape(self.pad_grid.shape)
+        self.obs_vision[..., self.CAR_CLASS] += car_grid[rows, cols]
+        self.obs_vision[~alive] = 0
+
+        return self._copy_obs(obs_out)
+
+
+    def _copy_obs(self, obs_out=None):
+        # Copy the observations out of the preallocated array, into obs_out if given
+        if obs_out is None:
+            return self.obs.copy()
+        obs_out[...] = self.obs
+        return obs_out
 
     def _add_cars(self):
         for r_i, routes in enumerate(self.routes):
@@ -599,14 +660,7 @@ class TrafficJunctionEnv(gym.Env):
             ncols = self.vocab_size
         else:
             ncols = self.vocab_size + 1 # 1 is for outside class which will be removed later.
-        out = np.zeros(a.shape + (ncols,), dtype=int)
-        out[self._all_idx(a, axis=2)] = 1
-        return out
-
-    def _all_idx(self, idx, axis):
-        grid = np.ogrid[tuple(map(slice, idx.shape))]
-        grid.insert(axis, idx)
-        return tuple(grid)
+        return np.eye(ncols, dtype=int)[a]
 
     def reward_terminal(self):
         return np.zeros_like(self._get_reward())
@@ -635,3 +689,197 @@ class TrafficJunctionEnv(gym.Env):
         curses.init_pair(4, curses.COLOR_GREEN, -1)
         curses.init_pair(5, curses.COLOR_BLUE, -1)
 
+
+
+
+class BatchedTrafficJunctionEnv(TrafficJunctionEnv):
+    """
+    Simulate batch_size independent traffic junctions at once.
+    The cars of all junctions are kept in arrays of shape (batch_size, ncar) and
+    the routes in the integer lookup table path_table, such that moving, adding and crashing
+    cars and the rewards are computed for all junctions without loops over cars.
+    """
+
+    def __init__(self, batch_size, cache_path=None):
+        self.batch_size = batch_size
+        super(BatchedTrafficJunctionEnv, self).__init__(cache_path)
+        self.env_index = np.arange(self.batch_size)[:, None]
+        self.reset()
+
+    def _set_obs_buffer(self):
+        super(BatchedTrafficJunctionEnv, self)._set_obs_buffer((self.batch_size,))
+
+    def reset(self, epoch=None, index=None, obs_out=None):
+        """
+        Reset the junctions selected by index (all by default) and returns the observations of all junctions.
+        Parameters
+        ----------
+        obs_out : batch_size x ncar x obs_dim ndarray (optional) the observations are written into and returned.
+        Returns
+        -------
+        observation (batch_size x ncar x obs_dim ndarray): the observations of all junctions.
+        """
+        if index is None:
+            b, n = self.batch_size, self.ncar
+            self.episode_over = False
+            self.has_failed = np.zeros(b)
+            self.alive_mask = np.zeros((b, n))
+            self.wait = np.zeros((b, n))
+            self.cars_in_sys = np.zeros(b, dtype=int)
+            # when dead => no route, must be masked by trainer.
+            self.route_id = np.full((b, n), -1)
+            self.car_loc = np.zeros((b, n, len(self.dims)), dtype=int)
+            self.car_last_act = np.zeros((b, n), dtype=int)
+            self.car_route_loc = np.full((b, n), -1)
+            self.is_completed = np.zeros((b, n))
+            self.stat = dict()
+        else:
+            self.has_failed[index] = 0
+            self.alive_mask[index] = 0
+            self.wait[index] = 0
+            self.cars_in_sys[index] = 0
+            self.route_id[index] = -1
+            self.car_loc[index] = 0
+            self.car_last_act[index] = 0
+            self.car_route_loc[index] = -1
+            self.is_completed[index] = 0
+
+        # set add rate according to the curriculum
+        epoch_range = (self.curr_end - self.curr_start)
+        add_rate_range = (self.add_rate_max - self.add_rate_min)
+        if epoch is not None and epoch_range > 0 and add_rate_range > 0 and epoch > self.epoch_last_update:
+            self.curriculum(epoch)
+            self.epoch_last_update = epoch
+
+        return self._get_obs(obs_out)
+
+    def step(self, action, obs_out=None):
+        """
+        The cars of all junctions take a step.
+        Parameters
+        ----------
+        action : shape - batch_size x ncar x naction one-hot or batch_size x ncar indices
+        obs_out : batch_size x ncar x obs_dim ndarray (optional) the observations are written into and returned.
+        Returns
+        -------
+        obs, reward, episode_over, info : tuple
+            obs (batch_size x ncar x obs_dim) :
+            reward (batch_size x ncar) : mean reward of the cars in sys of each junction.
+            episode_over (batch_size) : never true as for a single junction.
+            info (dict) : diagnostic information of all junctions.
+        """
+        act = np.asarray(action)
+        # one-hot actions are told apart from indices by the shape since they may be integer
+        if act.ndim == 3 and act.shape[-1] == self.naction:
+            act = np.argmax(act, axis=-1)
+        assert act.shape == (self.batch_size, self.ncar), "Action for each agent of each junction should be provided."
+
+        self._take_actions(act)
+        self._add_cars()
+
+        obs = self._get_obs(obs_out)
+        reward = self._get_reward()
+
+        self.stat['success'] = 1.0 - self.has_failed
+        self.stat['add_rate'] = self.add_rate
+
+        debug = {'car_loc':self.car_loc,
+                'alive_mask': np.copy(self.alive_mask),
+                'wait': self.wait,
+                'cars_in_sys': self.cars_in_sys,
+                'is_completed': np.copy(self.is_completed),
+                'success': self.stat['success']
+                }
+
+        return obs, reward, np.zeros(self.batch_size, dtype=bool), debug
+
+    def render(self, mode='human', close=False):
+        # Render the first game with the cars of a single game
+        car_loc, car_last_act = self.car_loc, self.car_last_act
+        self.car_loc, self.car_last_act = car_loc[0], car_last_act[0]
+        try:
+            super(BatchedTrafficJunctionEnv, self).render(mode, close)
+        finally:
+            self.car_loc, self.car_last_act = car_loc, car_last_act
+
+    def _take_actions(self, act):
+        # No one is completed before taking action
+        self.is_completed = np.zeros((self.batch_size, self.ncar))
+        alive = self.alive_mask == 1
+
+        # add wait time for active cars
+        self.wait += alive
+
+        # action BRAKE i.e STAY
+        self.car_last_act[alive & (act == 1)] = 1
+
+        # GAS or move
+        moving = alive & (act == 0)
+        self.car_route_loc[moving] += 1
+
+        # cars/agents which have reached end of their paths are put at dead loc
+        completed = moving & (self.car_route_loc == self.path_len[self.route_id])
+        self.cars_in_sys -= completed.sum(axis=1)
+        self.alive_mask[completed] = 0
+        self.wait[completed] = 0
+        self.car_loc[completed] = 0
+        self.is_completed[completed] = 1
+
+        moved = moving & ~completed
+        self.car_loc[moved] = self.path_table[self.route_id[moved], self.car_route_loc[moved]]
+        self.car_last_act[moved] = 0
+
+    def _add_cars(self):
+        for r_i, routes in enumerate(self.routes):
+            # Add car to the junctions which are not full
+            add = (self.cars_in_sys < self.ncar) & (np.random.uniform(size=self.batch_size) <= self.add_rate)
+            env = np.flatnonzero(add)
+            if len(env) == 0:
+                continue
+
+            # chose dead car on random, the keys of the dead cars are in [1, 2)
+            idx = np.argmax(np.random.uniform(size=(len(env), self.ncar)) + (self.alive_mask[env] == 0), axis=1)
+            self.alive_mask[env, idx] = 1
+
+            # choose path randomly & set it with its start loc
+            p_i = np.random.randint(len(routes), size=len(env))
+            self.route_id[env, idx] = p_i + r_i * len(routes)
+            self.car_route_loc[env, idx] = 0
+            self.car_loc[env, idx] = self.path_table[self.route_id[env, idx], 0]
+
+            # increase count
+            self.cars_in_sys[env] += 1
+
+    def _get_obs(self, obs_out=None):
+        # when dead, act, route id and vision are 0. But should be masked by trainer.
+        alive = self.alive_mask == 1
+
+        # most recent action and route id
+        self.obs_act[:] = self.action_onehot[np.where(alive, self.car_last_act, 0)]
+        self.obs_route[:] = self.path_onehot[np.where(alive, self.route_id, 0)]
+
+        # vision squares of all cars of all junctions in one gather, shape = (batch_size, ncar, 2*vision+1, 2*vision+1)
+        rows = self.car_loc[..., 0, None, None] + self.window[:, None]
+        cols = self.car_loc[..., 1, None, None] + self.window[None, :]
+        self.obs_vision[:] = self.empty_bool_base_grid[rows, cols]
+
+        # Mark cars' location (dead ones at the corner as well) in the vision squares
+        shape = (self.batch_size,) + self.pad_grid.shape
+        pad_loc = np.ravel_multi_index((np.broadcast_to(self.env_index, self.route_id.shape), self.car_loc[..., 0] + self.vision, self.car_loc[..., 1] + self.vision), shape)
+        car_grid = np.bincount(pad_loc.ravel(), minlength=int(np.prod(shape))).reshape(shape)
+        self.obs_vision[..., self.CAR_CLASS] += car_grid[self.env_index[..., None, None], rows, cols]
+        self.obs_vision[~alive] = 0
+
+        return self._copy_obs(obs_out)
+
+    def _get_reward(self):
+        reward = self.TIMESTEP_PENALTY * self.wait
+
+        # cars sharing a location other than the dead loc crash
+        loc = self.car_loc[..., 0] * self.pad_grid.shape[1] + self.car_loc[..., 1]
+        crash = ((loc[:, :, None] == loc[:, None, :]).sum(axis=2) > 1) & (loc != 0)
+        reward[crash] += self.CRASH_PENALTY
+        self.has_failed[crash.any(axis=1)] = 1
+
+        mean_reward = np.mean(self.alive_mask * reward, axis=1)
+        return np.repeat(mean_reward[:, None], self.n, axis=1)
@@ -21,3 +21,9 @@ class ReinforcementLearning(object):
 
     def get_loss(self):
         raise NotImplementedError()
+
+    def get_value_loss(self):
+        raise NotImplementedError()
+
+    def get_action_loss(self):
+        raise NotImplementedError()
@@ -2,12 +2,14 @@ import torch
 import torch.nn as nn
 import numpy as np
 from utilities.util import *
+from utilities.returns import *
 from models.model import Model
 from collections import namedtuple
 
 
 
 class COMAFC(Model):
+    on_policy = True
 
     def __init__(self, args, target_net=None):
         super(COMAFC, self).__init__(args)
@@ -68,16 +70,6 @@ class COMAFC(Model):
         self.construct_value_net()
         self.construct_policy_net()
 
-    def policy(self, obs, schedule=None, last_act=None, last_hid=None, info={}, stat={}):
-        actions = []
-        for i in range(self.n_):
-            h = torch.relu( self.action_dicts[i]['layer_1'](obs[:, i, :]) )
-            h = torch.relu( self.action_dicts[i]['layer_2'](h) )
-            a = self.action_dicts[i]['action_head'](h)
-            actions.append(a)
-        actions = torch.stack(actions, dim=1)
-        return actions
-
     def value(self, obs, act):
         batch_size = obs.size(0)
         obs_own = obs.clone()
@@ -97,41 +89,50 @@ class COMAFC(Model):
 
 
     def get_loss(self, batch):
+        action_loss, action_out = self.get_action_loss(batch)
+        value_loss, _ = self.get_value_loss(batch)
+        return action_loss, value_loss, action_out
+
+    def get_value_loss(self, batch, weights=None):
         batch_size = len(batch.state)
         rewards, last_step, done, actions, state, next_state = self.unpack_data(batch)
-        action_out = self.policy(state) #  (b,n,a) action probability
         values = self.value(state, actions) # (b,n,a) action value
-        baselines = torch.sum(values*torch.softmax(action_out, dim=-1), dim=-1)   # the only difference to ActorCritic is this  baseline (b,n)
         values = torch.sum(values*actions, dim=-1) # (b,n)
-        if self.args.target:
-            next_action_out = self.target_net.policy(next_state, last_act=actions)
-        else:
-            next_action_out = self.policy(next_state, last_act=actions)
-        next_actions = select_action(self.args, next_action_out, status='train',  exploration=False)
-        if self.args.target:
-            next_values = self.target_net.value(next_state, next_actions)
-        else:
-            next_values = self.value(next_state, next_actions)
-        next_values = torch.sum(next_values*next_actions, dim=-1) # b*n
-        # calculate the advantages
-        returns = cuda_wrapper(torch.zeros((batch_size, self.n_), dtype=torch.float), self.cuda_)
+        with torch.no_grad():
+            if self.args.target:
+                next_action_out = self.target_net.policy(next_state, last_act=actions)
+            else:
+                next_action_out = self.policy(next_state, last_act=actions)
+            next_actions = select_action(self.args, next_action_out, status='train',  exploration=False)
+            if self.args.target:
+                next_values = self.target_net.value(next_state, next_actions)
+            else:
+                next_values = self.value(next_state, next_actions)
+            next_values = torch.sum(next_values*next_actions, dim=-1) # b*n
+        # calculate the returns
         assert values.size() == next_values.size()
+        returns = td_returns(rewards, last_step, done, next_values, self.args.gamma)
         assert returns.size() == values.size()
-        for i in reversed(range(rewards.size(0))):
-            if last_step[i]:
-                next_return = 0 if done[i] else next_values[i].detach()
-            else:
-                next_return = next_values[i].detach()
-            returns[i] = rewards[i] + self.args.gamma * next_return
         # value loss
         deltas = returns - values
-        value_loss = deltas.pow(2).mean(dim=0)
-        # actio loss
-        advantages = ( values - baselines ).detach()
+        value_loss = td_loss(deltas, weights)
+        return value_loss, deltas
+
+    def get_action_loss(self, batch):
+        rewards, last_step, done, actions, state, next_state = self.unpack_data(batch)
+        action_out = self.policy(state) #  (b,n,a) action probability
+        # calculate the advantages, the critic is not updated here
+        with torch.no_grad():
+            values = self.value(state, actions) # (b,n,a) action value
+            baselines = torch.sum(values*torch.softmax(action_out, dim=-1), dim=-1)   # the only difference to ActorCritic is this  baseline (b,n)
+            values = torch.sum(values*actions, dim=-1) # (b,n)
+            advantages = values - baselines
         if self.args.normalize_advantages:
             advantages = batchnorm(advantages)
+        # actio loss
         log_prob = multinomials_log_density(actions, action_out).contiguous().view(-1, self.n_)
         assert log_prob.size() == advantages.size()
         action_loss = - advantages * log_prob
         action_loss = action_loss.mean(dim=0)
-        return action_loss, value_loss, action_out
+        return action_loss, action_out
+
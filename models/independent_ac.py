@@ -9,6 +9,7 @@ from learning_algorithms.actor_critic import *
 
 
 class IndependentAC(Model):
+    on_policy = True
 
     def __init__(self, args, target_net=None):
         super(IndependentAC, self).__init__(args)
@@ -73,18 +74,6 @@ class IndependentAC(Model):
         self.construct_value_net()
         self.construct_policy_net()
 
-    def policy(self, obs, schedule=None, last_act=None, last_hid=None, info={}, stat={}):
-        # TODO: policy params update
-        actions = []
-        for i in range(self.n_):
-            h = torch.relu( self.action_dicts[i]['layer_1'](obs[:, i, :]) )
-            h = torch.relu( self.action_dicts[i]['layer_2'](h) )
-            a = self.action_dicts[i]['action_head'](h)
-            actions.append(a)
-        actions = torch.stack(actions, dim=1)
-        return actions
-
-
     def value(self, obs, act=None):
         # TODO: policy params update
         values = []
@@ -99,3 +88,9 @@ class IndependentAC(Model):
     def get_loss(self, batch):
         action_loss, value_loss, log_p_a = self.rl.get_loss(batch, self, self.target_net)
         return action_loss, value_loss, log_p_a
+
+    def get_value_loss(self, batch, weights=None):
+        return self.rl.get_value_loss(batch, self, self.target_net, weights)
+
+    def get_action_loss(self, batch):
+        return self.rl.get_action_loss(batch, self)
@@ -70,16 +70,6 @@ class IndependentDDPG(Model):
         self.construct_value_net()
         self.construct_policy_net()
 
-    def policy(self, obs, schedule=None, last_act=None, last_hid=None, info={}, stat={}):
-        actions = []
-        for i in range(self.n_):
-            h = torch.relu( self.action_dicts[i]['layer_1'](obs[:, i, :]) )
-            h = torch.relu( self.action_dicts[i]['layer_2'](h) )
-            a = self.action_dicts[i]['action_head'](h)
-            actions.append(a)
-        actions = torch.stack(actions, dim=1)
-        return actions
-
     def value(self, obs, act):
         values = []
         for i in range(self.n_):
@@ -93,3 +83,9 @@ class IndependentDDPG(Model):
     def get_loss(self, batch):
         action_loss, value_loss, log_p_a = self.rl.get_loss(batch, self, self.target_net)
         return action_loss, value_loss, log_p_a
+
+    def get_value_loss(self, batch, weights=None):
+        return self.rl.get_value_loss(batch, self, self.target_net, weights)
+
+    def get_action_loss(self, batch):
+        return self.rl.get_action_loss(batch, self)
@@ -2,6 +2,7 @@ import torch
 import torch.nn as nn
 import numpy as np
 from utilities.util import *
+from utilities.returns import *
 from models.model import Model
 from learning_algorithms.ddpg import *
 from collections import namedtuple
@@ -71,22 +72,13 @@ class MADDPG(Model):
         self.construct_value_net()
         self.construct_policy_net()
 
-    def policy(self, obs, schedule=None, last_act=None, last_hid=None, info={}, stat={}):
-        # TODO: policy params update
-        actions = []
-        for i in range(self.n_):
-            h = torch.relu( self.action_dicts[i]['layer_1'](obs[:, i, :]) )
-            h = torch.relu( self.action_dicts[i]['layer_2'](h) )
-            a = self.action_dicts[i]['action_head'](h)
-            actions.append(a)
-        actions = torch.stack(actions, dim=1)
-        return actions
-
     def value(self, obs, act):
         # TODO: policy params update
         values = []
         for i in range(self.n_):
-            h = torch.relu( self.value_dicts[i]['layer_1']( torch.cat( ( obs.contiguous().view( -1, np.prod(obs.size()[1:]) ), act.contiguous().view( -1, np.prod(act.size()[1:]) ) ), dim=-1 ) ) )
+            # act is either the joint action (b, n, a) or one joint action per critic (b, n, n, a)
+            act_ = act[:, i] if act.dim() == 4 else act
+            h = torch.relu( self.value_dicts[i]['layer_1']( torch.cat( ( obs.contiguous().view( -1, np.prod(obs.size()[1:]) ), act_.contiguous().view( -1, np.prod(act_.size()[1:]) ) ), dim=-1 ) ) )
             h = torch.relu( self.value_dicts[i]['layer_2'](h) )
             v = self.value_dicts[i]['value_head'](h)
             values.append(v)
@@ -94,36 +86,43 @@ class MADDPG(Model):
         return values
 
     def get_loss(self, batch):
-        # TODO: fix policy params update
+        action_loss, action_out = self.get_action_loss(batch)
+        value_loss, _ = self.get_value_loss(batch)
+        return action_loss, value_loss, action_out
+
+    def get_value_loss(self, batch, weights=None):
         batch_size = len(batch.state)
         # collect the transition data
         rewards, last_step, done, actions, state, next_state = self.unpack_data(batch)
-        # construct the computational graph
-        # do the argmax action on the action loss
-        action_out = self.policy(state)
-        actions_ = select_action(self.args, action_out, status='train', exploration=False)
-        values_ = self.value(state, actions_).contiguous().view(-1, self.n_)
         # do the exploration action on the value loss
         values = self.value(state, actions).contiguous().view(-1, self.n_)
         # do the argmax action on the next value loss
-        next_action_out = self.target_net.policy(next_state)
-        next_actions_ = select_action(self.args, next_action_out, status='train', exploration=False)
-        next_values_ = self.target_net.value(next_state, next_actions_.detach()).contiguous().view(-1, self.n_)
-        returns = cuda_wrapper(torch.zeros((batch_size, self.n_), dtype=torch.float), self.cuda_)
-        assert values_.size() == next_values_.size()
+        with torch.no_grad():
+            next_action_out = self.target_net.policy(next_state)
+            next_actions_ = select_action(self.args, next_action_out, status='train', exploration=False)
+            next_values_ = self.target_net.value(next_state, next_actions_).contiguous().view(-1, self.n_)
+        assert values.size() == next_values_.size()
+        returns = td_returns(rewards, last_step, done, next_values_, self.args.gamma)
         assert returns.size() == values.size()
-        for i in reversed(range(rewards.size(0))):
-            if last_step[i]:
-                next_return = 0 if done[i] else next_values_[i].detach()
-            else:
-                next_return = next_values_[i].detach()
-            returns[i] = rewards[i] + self.args.gamma * next_return
         deltas = returns - values
+        value_loss = td_loss(deltas, weights)
+        return value_loss, deltas
+
+    def get_action_loss(self, batch):
+        # TODO: fix policy params update
+        # collect the transition data
+        rewards, last_step, done, actions, state, next_state = self.unpack_data(batch)
+        # do the argmax action on the action loss
+        action_out = self.policy(state)
+        actions_ = select_action(self.args, action_out, status='train', exploration=False)
+        if not self.args.shared_parameters:
+            actions_ = self.agent_owned_actions(actions_)
+        values_ = self.value(state, actions_).contiguous().view(-1, self.n_)
         advantages = values_
         # advantages = advantages.contiguous().view(-1, 1)
         if self.args.normalize_advantages:
             advantages = batchnorm(advantages)
         action_loss = -advantages
         action_loss = action_loss.mean(dim=0)
-        value_loss = deltas.pow(2).mean(dim=0)
-        return action_loss, value_loss, action_out
+        return action_loss, action_out
+
@@ -5,7 +5,24 @@ from utilities.util import *
 
 
 
+def grouped_linear(layers, inp, shared=False):
+    '''
+    apply one linear layer per agent, inp is with the shape of (n, b, i) and the output is with the shape of (n, b, o).
+    the stacked layers run in a single batched matmul whose backward pass writes the weight gradients of all agents
+    '''
+    if shared:
+        return layers[0](inp)
+    weight = torch.stack([layer.weight for layer in layers], dim=0) # shape = (n, o, i)
+    if layers[0].bias is None:
+        return torch.bmm(inp, weight.transpose(1, 2))
+    bias = torch.stack([layer.bias for layer in layers], dim=0).unsqueeze(1) # shape = (n, 1, o)
+    return torch.baddbmm(bias, inp, weight.transpose(1, 2))
+
+
+
 class Model(nn.Module):
+    # the replay buffer of an on-policy model is cleared after every update round
+    on_policy = False
 
     def __init__(self, args):
         super(Model, self).__init__()
@@ -32,16 +49,10 @@ class Model(nn.Module):
         if self.args.replay:
             trainer.replay_buffer.add_experience(trans)
             replay_cond = trainer.steps>self.args.replay_warmup\
-             and len(trainer.replay_buffer.buffer)>=self.args.batch_size\
+             and len(trainer.replay_buffer)>=self.args.batch_size\
              and trainer.steps%self.args.behaviour_update_freq==0
             if replay_cond:
-                for _ in range(self.args.critic_update_times):
-                    trainer.value_replay_process(stat)
-                trainer.action_replay_process(stat)
-                # TODO: hard code
-                # clear replay buffer for on policy algorithm
-                if self.__class__.__name__ in ["COMAFC","MFAC","IndependentAC"] :
-                    trainer.replay_buffer.clear()
+                self.replay_update(trainer, stat)
         else:
             trans_cond = trainer.steps%self.args.behaviour_update_freq==0
             if trans_cond:
@@ -53,11 +64,21 @@ class Model(nn.Module):
             if target_cond:
                 self.update_target()
 
+    def replay_update(self, trainer, stat):
+        '''
+        run one update round from the replay buffer of trainer and clear the buffer for an on-policy model
+        '''
+        for _ in range(self.args.critic_update_times):
+            trainer.value_replay_process(stat)
+        trainer.action_replay_process(stat)
+        if self.on_policy:
+            trainer.replay_buffer.clear()
+
     def episode_update(self, trainer, episode, stat):
         if self.args.replay:
             trainer.replay_buffer.add_experience(episode)
             replay_cond = trainer.episodes>self.args.replay_warmup\
-             and len(trainer.replay_buffer.buffer)>=self.args.batch_size\
+             and len(trainer.replay_buffer)>=self.args.batch_size\
              and trainer.episodes%self.args.behaviour_update_freq==0
             if replay_cond:
                 for _ in range(self.args.critic_update_times):
@@ -74,6 +95,26 @@ class Model(nn.Module):
     def construct_model(self):
         raise NotImplementedError()
 
+    def grouped_mlp(self, dicts, keys, inp):
+        '''
+        evaluate the per-agent mlps stored in dicts (e.g. value_dicts) for all agents at once,
+        inp is with the shape of (n, b, i) where the slice inp[i] is fed to the i-th agent
+        '''
+        h = inp
+        for key in keys[:-1]:
+            h = torch.relu( grouped_linear([d[key] for d in dicts], h, self.args.shared_parameters) )
+        return grouped_linear([d[keys[-1]] for d in dicts], h, self.args.shared_parameters)
+
+    def agent_owned_actions(self, act):
+        '''
+        expand the joint action with the shape of (b, n, a) to one copy per critic with the shape of (b, n, n, a),
+        the i-th copy only passes the gradient to the action of the i-th agent so that the action losses of
+        the agents reach disjoint policies and can be summed into one backward pass
+        '''
+        eye = torch.eye(self.n_, device=act.device).view(1, self.n_, self.n_, 1)
+        act_detached = act.detach().unsqueeze(1) # shape = (b, 1, n, a)
+        return act_detached + eye * (act.unsqueeze(1) - act_detached) # shape = (b, n, n, a)
+
     def get_agent_mask(self, batch_size, info):
         '''
         define the getter of agent mask to confirm the living agent
@@ -90,8 +131,13 @@ class Model(nn.Module):
         agent_mask = cuda_wrapper(agent_mask.expand(batch_size, self.n_, self.n_).unsqueeze(-1), self.cuda_)
         return num_agents_alive, agent_mask
 
-    def policy(self, obs, last_act=None, last_hid=None, gate=None, info={}, stat={}):
-        raise NotImplementedError()
+    def policy(self, obs, schedule=None, last_act=None, last_hid=None, info={}, stat={}):
+        '''
+        evaluate the policies of all agents in one batched forward
+        '''
+        inp = obs.transpose(0, 1) # shape = (b, n, o) -> (n, b, o)
+        actions = self.grouped_mlp(self.action_dicts, ['layer_1', 'layer_2', 'action_head'], inp) # shape = (n, b, a)
+        return actions.transpose(0, 1).contiguous() # shape = (b, n, a)
 
     def value(self, obs, act):
         raise NotImplementedError()
@@ -112,6 +158,19 @@ class Model(nn.Module):
     def get_loss(self):
         raise NotImplementedError()
 
+    def get_value_loss(self, batch, weights=None):
+        '''
+        build only the graph of the critic update and return the value loss with the shape of (n) and the td errors
+        with the shape of (b, n), the optional importance sampling weights with the shape of (b, 1) scale the squared errors
+        '''
+        raise NotImplementedError()
+
+    def get_action_loss(self, batch):
+        '''
+        build only the graph of the actor update and return the action loss with the shape of (n) and the action out
+        '''
+        raise NotImplementedError()
+
     def credit_assignment_demo(self, obs, act):
         assert isinstance(obs, np.ndarray)
         assert isinstance(act, np.ndarray)
@@ -123,19 +182,25 @@ class Model(nn.Module):
 
     def train_process(self, stat, trainer):
         info = {}
-        state = trainer.env.reset()
+        # the environment writes the observations into the two buffers in turn and the policy reads them
+        # through the tensors sharing their memory, so the state of each transition stays intact until it is pushed
+        obs_tensors = torch.zeros(2, 1, self.n_, self.obs_dim)
+        if self.cuda_:
+            obs_tensors = obs_tensors.pin_memory()
+        obs_buffers = obs_tensors.numpy()
+        state = trainer.env.reset(obs_out=obs_buffers[0, 0])
         if self.args.reward_record_type is 'episode_mean_step':
             trainer.mean_reward = 0
             trainer.mean_success = 0
 
         for t in range(self.args.max_steps):
-            state_ = cuda_wrapper(prep_obs(state).contiguous().view(1, self.n_, self.obs_dim), self.cuda_)
             start_step = True if t == 0 else False
-            state_ = cuda_wrapper(prep_obs(state).contiguous().view(1, self.n_, self.obs_dim), self.cuda_)
-            action_out = self.policy(state_, info=info, stat=stat)
-            action = select_action(self.args, action_out, status='train', info=info)
-            _, actual = translate_action(self.args, action, trainer.env)
-            next_state, reward, done, debug = trainer.env.step(actual)
+            state_ = cuda_wrapper(obs_tensors[t%2], self.cuda_)
+            with torch.no_grad():
+                action_out = self.policy(state_, info=info, stat=stat)
+                action, index = select_action(self.args, action_out, status='train', info=info, return_index=True)
+            _, actual = translate_action(self.args, action, trainer.env, index)
+            next_state, reward, done, debug = trainer.env.step(actual, obs_out=obs_buffers[(t+1)%2, 0])
             if isinstance(done, list): done = np.sum(done)
             done_ = done or t==self.args.max_steps-1
             trans = self.Transition(state,
@@ -164,8 +229,69 @@ class Model(nn.Module):
         stat['turn'] = t + 1
         trainer.episodes += 1
 
+    def vectorized_train_process(self, stat, trainer):
+        '''
+        step the k copies of the environment in trainer.vec_env for max_steps ticks with one batched policy call per tick,
+        each tick pushes k transitions and the finished episodes are reset right away, the episodes still running after
+        the last tick are cut there
+        '''
+        info = {}
+        vec_env = trainer.vec_env
+        k = len(vec_env)
+        state = vec_env.reset()
+        t = np.zeros(k, dtype=int)
+        turns = []
+        if self.args.reward_record_type is 'episode_mean_step':
+            trainer.mean_reward = 0
+            trainer.mean_success = 0
+        for tick in range(self.args.max_steps):
+            state_ = cuda_wrapper(torch.from_numpy(state), self.cuda_)
+            with torch.no_grad():
+                action_out = self.policy(state_, info=info, stat=stat)
+                action = select_action(self.args, action_out, status='train', info=info).cpu().numpy() # shape = (k, n, a)
+            next_state, reward, done, debug = vec_env.step(action)
+            done_ = done | (t==self.args.max_steps-1) | (tick==self.args.max_steps-1)
+            for i in range(k):
+                trans = self.Transition(state[i],
+                                        action[i:i+1],
+                                        reward[i],
+                                        next_state[i],
+                                        done[i],
+                                        done_[i]
+                                       )
+                self.transition_update(trainer, trans, stat)
+                trainer.steps += 1
+            success = np.mean([d['success'] if 'success' in d else 0.0 for d in debug])
+            if self.args.reward_record_type is 'mean_step':
+                trainer.mean_reward = trainer.mean_reward + k/trainer.steps*(np.mean(reward) - trainer.mean_reward)
+                trainer.mean_success = trainer.mean_success + k/trainer.steps*(success - trainer.mean_success)
+            elif self.args.reward_record_type is 'episode_mean_step':
+                trainer.mean_reward = trainer.mean_reward + 1/(tick+1)*(np.mean(reward) - trainer.mean_reward)
+                trainer.mean_success = trainer.mean_success + 1/(tick+1)*(success - trainer.mean_success)
+            else:
+                raise RuntimeError('Please enter a correct reward record type, e.g. mean_step or episode_mean_step.')
+            stat['mean_reward'] = trainer.mean_reward
+            stat['mean_success'] = trainer.mean_success
+            t += 1
+            if done_.any():
+                turns.extend(t[done_])
+                trainer.episodes += int(done_.sum())
+                next_state[done_] = vec_env.reset(done_)[done_]
+                t[done_] = 0
+            state = next_state
+        stat['turn'] = np.mean(turns)
+
 
     def unpack_data(self, batch):
+        if isinstance(batch.reward, np.ndarray):
+            # the columnar batch of the replay buffer is already stacked into float32 arrays and bool flags
+            rewards = cuda_wrapper(torch.from_numpy(batch.reward), self.cuda_)
+            last_step = cuda_wrapper(torch.from_numpy(batch.last_step).contiguous().view(-1, 1), self.cuda_).float()
+            done = cuda_wrapper(torch.from_numpy(batch.done).contiguous().view(-1, 1), self.cuda_).float()
+            actions = cuda_wrapper(torch.from_numpy(batch.action), self.cuda_)
+            state = cuda_wrapper(torch.from_numpy(batch.state), self.cuda_)
+            next_state = cuda_wrapper(torch.from_numpy(batch.next_state), self.cuda_)
+            return (rewards, last_step, done, actions, state, next_state)
         batch_size = len(batch.state)
         rewards = cuda_wrapper(torch.tensor(batch.reward, dtype=torch.float), self.cuda_)
         last_step = cuda_wrapper(torch.tensor(batch.last_step, dtype=torch.float).contiguous().view(-1, 1), self.cuda_)
@@ -2,33 +2,176 @@ import torch
 import torch.nn as nn
 import numpy as np
 from utilities.util import *
-from models.model import Model
+from utilities.returns import *
+from models.model import Model, grouped_linear
 from collections import namedtuple
 
 
 
+def unique_coalitions(masks, weights):
+    '''
+    merge the duplicate coalitions of each agent and sum up their weights,
+    masks is with the shape of (n, m, n) and weights is with the shape of (n, m),
+    the unique coalitions of all agents are padded with zero weights to the same number
+    '''
+    n = masks.size(-1)
+    assert n < 63, 'Coalitions are encoded as int64 bit masks.'
+    bits = torch.arange(n, device=masks.device)
+    codes = (masks.long() << bits).sum(dim=-1) # shape = (n, m)
+    codes, order = codes.sort(dim=-1)
+    weights = weights.gather(1, order)
+    first = torch.ones_like(codes, dtype=torch.bool)
+    first[:, 1:] = codes[:, 1:] != codes[:, :-1]
+    group = first.long().cumsum(dim=-1) - 1 # shape = (n, m)
+    k = int(group.max().item()) + 1
+    unique_codes = torch.zeros(n, k, dtype=torch.long, device=masks.device).scatter_(1, group, codes)
+    unique_weights = torch.zeros(n, k, dtype=weights.dtype, device=masks.device).scatter_add_(1, group, weights)
+    unique_masks = (unique_codes.unsqueeze(-1) >> bits) & 1 # shape = (n, k, n)
+    return unique_masks.float(), unique_weights
+
+def exact_coalitions(n):
+    '''
+    enumerate all the coalitions C+{i} of each agent i with the shapley weights |C|!(n-|C|-1)!/n!
+    '''
+    others = (torch.arange(2**(n-1)).unsqueeze(-1) >> torch.arange(n-1)) & 1 # shape = (2^(n-1), n-1)
+    masks = torch.ones(n, 2**(n-1), n)
+    for i in range(n):
+        masks[i, :, :i] = others[:, :i].float()
+        masks[i, :, i+1:] = others[:, i:].float()
+    size = others.sum(dim=-1).float()
+    weights = torch.exp( torch.lgamma(size+1) + torch.lgamma(n-size) - torch.lgamma(torch.tensor(n+1.0)) )
+    return masks, weights.unsqueeze(0).expand(n, 2**(n-1)).contiguous()
+
+def stratified_coalitions(n, sample_size):
+    '''
+    draw sample_size coalitions C+{i} for each size |C| = 0, ..., n-1 of each agent i
+    '''
+    keys = torch.rand(n, n, sample_size, n) # shape = (agent, size, sample, candidate)
+    keys[torch.arange(n), :, :, torch.arange(n)] = 2.0 # the agent itself is never drawn into C
+    rank = keys.argsort(dim=-1).argsort(dim=-1)
+    size = torch.arange(n).view(1, n, 1, 1)
+    masks = (rank < size) | torch.eye(n, dtype=torch.bool).view(n, 1, 1, n)
+    masks = masks.float().contiguous().view(n, n*sample_size, n)
+    weights = torch.full((n, n*sample_size), 1.0/(n*sample_size))
+    return masks, weights
+
+def antithetic_coalitions(n, sample_size):
+    '''
+    draw sample_size permutations and pair each of them with its reverse,
+    the predecessors of agent i in the reverse are its successors in the permutation
+    '''
+    position = torch.rand(sample_size, n).argsort(dim=-1).argsort(dim=-1) # shape = (n_s, n)
+    own = position.t().unsqueeze(-1) # shape = (n, n_s, 1)
+    agent = torch.eye(n, dtype=torch.bool).unsqueeze(1) # shape = (n, 1, n)
+    predecessors = (position.unsqueeze(0) < own) | agent
+    successors = (position.unsqueeze(0) > own) | agent
+    masks = torch.cat((predecessors, successors), dim=1).float() # shape = (n, 2*n_s, n)
+    weights = torch.full((n, 2*sample_size), 1.0/(2*sample_size))
+    return masks, weights
+
+
+
+class CoalitionSampler(object):
+    '''
+    pre-generate a pool of coalitions once per device and hand out rows of it,
+    so that no coalition is built on the hot path of the critic.
+    the pool of the sample mode holds pool_size permutations with their subcoalition maps,
+    the pools of the other modes hold about pool_size coalitions per agent as unique padded draws with their numbers of coalitions.
+    the pools are re-randomised every refresh_freq updates (never if refresh_freq is 0)
+    '''
+
+    def __init__(self, n, sample_size, shapley_mode='sample', pool_size=4096, refresh_freq=0):
+        self.n = n
+        self.sample_size = sample_size
+        self.shapley_mode = shapley_mode
+        self.pool_size = int(pool_size)
+        self.refresh_freq = int(refresh_freq)
+        if self.shapley_mode == 'exact' and self.n > 10:
+            raise RuntimeError('The exact shapley mode enumerates 2^(n-1) coalitions and is restricted to at most 10 agents.')
+        self.updates = 0
+        self.pools = dict()
+
+    def step(self):
+        '''
+        count one update and drop the pools if they are due to be re-randomised
+        '''
+        self.updates += 1
+        if self.refresh_freq > 0 and self.updates%self.refresh_freq == 0:
+            self.pools = dict()
+
+    def get_pool(self, device):
+        if device not in self.pools:
+            self.pools[device] = self.generate_pool(device)
+        return self.pools[device]
+
+    def generate_pool(self, device):
+        if self.shapley_mode == 'sample':
+            grand_coalitions = torch.rand(self.pool_size, self.n).argsort(dim=-1) # shape = (p, n)
+            # the subcoalition of the i-th row covers the first grand_coalitions[i]+1 slots of the permutation
+            subcoalition_map = (torch.arange(self.n).view(1, 1, self.n) <= grand_coalitions.unsqueeze(-1)).float() # shape = (p, n, n)
+            return grand_coalitions.to(device), subcoalition_map.to(device)
+        if self.shapley_mode == 'exact':
+            draws = [exact_coalitions(self.n)]
+        elif self.shapley_mode == 'stratified':
+            draws = [unique_coalitions(*stratified_coalitions(self.n, self.sample_size)) for _ in range(max(1, self.pool_size//(self.n*self.sample_size)))]
+        elif self.shapley_mode == 'antithetic':
+            draws = [unique_coalitions(*antithetic_coalitions(self.n, self.sample_size)) for _ in range(max(1, self.pool_size//(2*self.sample_size)))]
+        else:
+            raise RuntimeError('Please enter a correct shapley mode, e.g. sample, exact, stratified or antithetic.')
+        # pad all draws with zero weights to the same number of coalitions, the numbers stay on the host
+        counts = torch.tensor([masks.size(1) for masks, _ in draws])
+        k = int(counts.max())
+        masks = torch.zeros(len(draws), self.n, k, self.n)
+        weights = torch.zeros(len(draws), self.n, k)
+        for i, (m, w) in enumerate(draws):
+            masks[i, :, :m.size(1)] = m
+            weights[i, :, :w.size(1)] = w
+        return masks.to(device), weights.to(device), counts
+
+    def permutations(self, batch_size, device):
+        '''
+        return the subcoalition map and the grand coalitions with the shape of (b, n_s, n, n)
+        '''
+        grand_coalitions, subcoalition_map = self.get_pool(device)
+        # every row is drawn independently from the pool
+        index = torch.randint(self.pool_size, (batch_size*self.sample_size,), device=device)
+        grand_coalitions = grand_coalitions.index_select(0, index)
+        subcoalition_map = subcoalition_map.index_select(0, index)
+        subcoalition_map = subcoalition_map.view(batch_size, self.sample_size, self.n, self.n)
+        grand_coalitions = grand_coalitions.view(batch_size, self.sample_size, 1, self.n).expand(batch_size, self.sample_size, self.n, self.n)
+        return subcoalition_map, grand_coalitions
+
+    def coalitions(self, batch_size, device):
+        '''
+        return the unique coalitions with the shape of (b, n, k, n) and their weights with the shape of (b, n, k)
+        '''
+        masks, weights, counts = self.get_pool(device)
+        # every batch row is drawn independently from the pool
+        index = torch.randint(masks.size(0), (batch_size,))
+        # the padding beyond the largest of the drawn draws only has zero weights, so it is not sent through the critic
+        k = int(counts[index].max())
+        index = index.to(device)
+        return masks.index_select(0, index)[:, :, :k], weights.index_select(0, index)[:, :, :k]
+
+
+
 class SQDDPG(Model):
 
     def __init__(self, args, target_net=None):
         super(SQDDPG, self).__init__(args)
         self.construct_model()
         self.apply(self.init_weights)
+        self.register_state_dict_post_hook(SQDDPG.merge_first_critic_layer)
         if target_net != None:
             self.target_net = target_net
             self.reload_params_to_target()
         self.sample_size = self.args.sample_size
+        self.coalition_sampler = CoalitionSampler(self.n_, self.sample_size, self.args.shapley_mode, self.args.coalition_pool_size, self.args.coalition_refresh_freq)
+        if target_net != None:
+            # the behaviour and the target nets draw from the same pools
+            self.target_net.coalition_sampler = self.coalition_sampler
         self.Transition = namedtuple('Transition', ('state', 'action', 'reward', 'next_state', 'done', 'last_step'))
 
-    def unpack_data(self, batch):
-        batch_size = len(batch.state)
-        rewards = cuda_wrapper(torch.tensor(batch.reward, dtype=torch.float), self.cuda_)
-        last_step = cuda_wrapper(torch.tensor(batch.last_step, dtype=torch.float).contiguous().view(-1, 1), self.cuda_)
-        done = cuda_wrapper(torch.tensor(batch.done, dtype=torch.float).contiguous().view(-1, 1), self.cuda_)
-        actions = cuda_wrapper(torch.tensor(np.stack(list(zip(*batch.action))[0], axis=0), dtype=torch.float), self.cuda_)
-        state = cuda_wrapper(prep_obs(list(zip(batch.state))), self.cuda_)
-        next_state = cuda_wrapper(prep_obs(list(zip(batch.next_state))), self.cuda_)
-        return (rewards, last_step, done, actions, state, next_state)
-
     def construct_policy_net(self):
         action_dicts = []
         if self.args.shared_parameters:
@@ -53,13 +196,17 @@ class SQDDPG(Model):
         self.action_dicts = nn.ModuleList(action_dicts)
 
     def construct_value_net(self):
+        # the first layer is stored as an observation part with the bias and an action part,
+        # which apply W_o*obs + W_a*act + b as one linear layer over the joint observation and action
         value_dicts = []
         if self.args.shared_parameters:
-            l1 = nn.Linear( (self.obs_dim+self.act_dim)*self.n_, self.hid_dim )
+            l1_obs = nn.Linear(self.obs_dim*self.n_, self.hid_dim)
+            l1_act = nn.Linear(self.act_dim*self.n_, self.hid_dim, bias=False)
             l2 = nn.Linear(self.hid_dim, self.hid_dim)
             v = nn.Linear(self.hid_dim, 1)
             for i in range(self.n_):
-                value_dicts.append(nn.ModuleDict( {'layer_1': l1,\
+                value_dicts.append(nn.ModuleDict( {'layer_1_obs': l1_obs,\
+                                                   'layer_1_act': l1_act,\
                                                    'layer_2': l2,\
                                                    'value_head': v
                                                   }
@@ -67,7 +214,8 @@ class SQDDPG(Model):
                                   )
         else:
             for i in range(self.n_):
-                value_dicts.append(nn.ModuleDict( {'layer_1': nn.Linear( (self.obs_dim+self.act_dim)*self.n_, self.hid_dim ),\
+                value_dicts.append(nn.ModuleDict( {'layer_1_obs': nn.Linear(self.obs_dim*self.n_, self.hid_dim),\
+                                                   'layer_1_act': nn.Linear(self.act_dim*self.n_, self.hid_dim, bias=False),\
                                                    'layer_2': nn.Linear(self.hid_dim, self.hid_dim),\
                                                    'value_head': nn.Linear(self.hid_dim, 1)
                                                   }
@@ -75,103 +223,170 @@ class SQDDPG(Model):
                                   )
         self.value_dicts = nn.ModuleList(value_dicts)
 
+    def merge_first_critic_layer(self, state_dict, prefix, local_metadata):
+        '''
+        save the first critic layer as one layer over the joint observation and action,
+        so that the state dicts keep the layout of the checkpoints saved before the split
+        '''
+        for key in [k for k in state_dict if k.startswith(prefix+'value_dicts.') and k.endswith('.layer_1_obs.weight')]:
+            head = key[:-len('layer_1_obs.weight')]
+            state_dict[head+'layer_1.weight'] = torch.cat((state_dict.pop(key), state_dict.pop(head+'layer_1_act.weight')), dim=1)
+            state_dict[head+'layer_1.bias'] = state_dict.pop(head+'layer_1_obs.bias')
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # split the first critic layer of the state dicts saved with one layer over the joint observation and action
+        for key in [k for k in state_dict if k.startswith(prefix+'value_dicts.') and k.endswith('.layer_1.weight')]:
+            head = key[:-len('layer_1.weight')]
+            weight = state_dict.pop(key)
+            state_dict[head+'layer_1_obs.weight'] = weight[:, :self.n_*self.obs_dim]
+            state_dict[head+'layer_1_act.weight'] = weight[:, self.n_*self.obs_dim:]
+            if head+'layer_1.bias' in state_dict:
+                state_dict[head+'layer_1_obs.bias'] = state_dict.pop(head+'layer_1.bias')
+        super(SQDDPG, self)._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
     def construct_model(self):
         self.construct_value_net()
         self.construct_policy_net()
 
-    def policy(self, obs, schedule=None, last_act=None, last_hid=None, info={}, stat={}):
-        actions = []
-        for i in range(self.n_):
-            h = torch.relu( self.action_dicts[i]['layer_1'](obs[:, i, :]) )
-            h = torch.relu( self.action_dicts[i]['layer_2'](h) )
-            a = self.action_dicts[i]['action_head'](h)
-            actions.append(a)
-        actions = torch.stack(actions, dim=1)
-        return actions
-
-    def sample_grandcoalitions(self, batch_size):
-        seq_set = cuda_wrapper(torch.tril(torch.ones(self.n_, self.n_), diagonal=0, out=None), self.cuda_)
-        grand_coalitions = cuda_wrapper(torch.multinomial(torch.ones(batch_size*self.sample_size, self.n_)/self.n_, self.n_, replacement=False), self.cuda_)
-        individual_map = cuda_wrapper(torch.zeros(batch_size*self.sample_size*self.n_, self.n_), self.cuda_)
-        individual_map.scatter_(1, grand_coalitions.contiguous().view(-1, 1), 1)
-        individual_map = individual_map.contiguous().view(batch_size, self.sample_size, self.n_, self.n_)
-        subcoalition_map = torch.matmul(individual_map, seq_set)
-        grand_coalitions = grand_coalitions.unsqueeze(1).expand(batch_size*self.sample_size, self.n_, self.n_).contiguous().view(batch_size, self.sample_size, self.n_, self.n_) # shape = (b, n_s, n, n)
-        return subcoalition_map, grand_coalitions
+    def sample_grandcoalitions(self, batch_size, device):
+        return self.coalition_sampler.permutations(batch_size, device) # shape = (b, n_s, n, n)
 
     def marginal_contribution(self, obs, act):
         batch_size = obs.size(0)
-        subcoalition_map, grand_coalitions = self.sample_grandcoalitions(batch_size) # shape = (b, n_s, n, n)
+        subcoalition_map, grand_coalitions = self.sample_grandcoalitions(batch_size, obs.device) # shape = (b, n_s, n, n)
         grand_coalitions = grand_coalitions.unsqueeze(-1).expand(batch_size, self.sample_size, self.n_, self.n_, self.act_dim) # shape = (b, n_s, n, n, a)
-        act = act.unsqueeze(1).unsqueeze(2).expand(batch_size, self.sample_size, self.n_, self.n_, self.act_dim).gather(3, grand_coalitions) # shape = (b, n, a) -> (b, 1, 1, n, a) -> (b, n_s, n, n, a)
+        if act.dim() == 3:
+            act = act.unsqueeze(1) # shape = (b, n, a) -> (b, 1, n, a)
+        act = act.unsqueeze(1).expand(batch_size, self.sample_size, self.n_, self.n_, self.act_dim).gather(3, grand_coalitions) # shape = (b, 1 or n, n, a) -> (b, 1, 1 or n, n, a) -> (b, n_s, n, n, a)
         act_map = subcoalition_map.unsqueeze(-1).float() # shape = (b, n_s, n, n, 1)
         act = act * act_map
         act = act.contiguous().view(batch_size, self.sample_size, self.n_, -1) # shape = (b, n_s, n, n*a)
-        obs = obs.unsqueeze(1).unsqueeze(2).expand(batch_size, self.sample_size, self.n_, self.n_, self.obs_dim) # shape = (b, n, o) -> (b, 1, n, o) -> (b, 1, 1, n, o) -> (b, n_s, n, n, o)
-        obs = obs.contiguous().view(batch_size, self.sample_size, self.n_, self.n_*self.obs_dim) # shape = (b, n_s, n, n, o) -> (b, n_s, n, n*o)
-        inp = torch.cat((obs, act), dim=-1)
-        values = []
-        for i in range(self.n_):
-            h = torch.relu( self.value_dicts[i]['layer_1'](inp[:, :, i, :]) )
-            h = torch.relu( self.value_dicts[i]['layer_2'](h) )
-            v = self.value_dicts[i]['value_head'](h)
-            values.append(v)
-        values = torch.stack(values, dim=2)
+        act = act.permute(2, 0, 1, 3) # shape = (b, n_s, n, n*a) -> (n, b, n_s, n*a)
+        values = self.critic(obs, act) # shape = (n, b, n_s)
+        values = values.permute(1, 2, 0).unsqueeze(-1) # shape = (n, b, n_s) -> (b, n_s, n, 1)
         return values
 
+    def sample_coalitions(self, batch_size, device):
+        '''
+        get the unique coalitions with the shape of (b, n, k, n) and their weights with the shape of (b, n, k)
+        '''
+        return self.coalition_sampler.coalitions(batch_size, device)
+
+    def coalition_values(self, obs, act, masks, weights):
+        batch_size = obs.size(0)
+        num_coalitions = masks.size(2)
+        if act.dim() == 3:
+            act = act.unsqueeze(1) # shape = (b, n, a) -> (b, 1, n, a)
+        act = act.transpose(0, 1).unsqueeze(2) * masks.transpose(0, 1).unsqueeze(-1) # shape = (1 or n, b, 1, n, a) * (n, b, k, n, 1) -> (n, b, k, n, a)
+        act = act.contiguous().view(self.n_, batch_size, num_coalitions, self.n_*self.act_dim) # shape = (n, b, k, n*a)
+        values = self.critic(obs, act) # shape = (n, b, k)
+        return (values * weights.transpose(0, 1)).sum(dim=-1).t() # shape = (n, b, k) -> (b, n)
+
+    def critic(self, obs, act):
+        '''
+        evaluate the critics of all agents on the joint observation and the masked joint actions,
+        obs is with the shape of (b, n, o) and act is with the shape of (n, b, k, n*a).
+        the first layer is split into an observation part and an action part, so the observation
+        is projected once per batch row and broadcast over the coalitions instead of being copied
+        '''
+        batch_size, num_coalitions = act.size(1), act.size(2)
+        obs = obs.contiguous().view(batch_size, self.n_*self.obs_dim) # shape = (b, n*o)
+        act = act.contiguous().view(self.n_, batch_size*num_coalitions, self.n_*self.act_dim) # shape = (n, b*k, n*a)
+        if self.args.shared_parameters:
+            h_obs = self.value_dicts[0]['layer_1_obs'](obs).unsqueeze(0) # shape = (1, b, h)
+            h_act = self.value_dicts[0]['layer_1_act'](act) # shape = (n, b*k, h)
+        else:
+            # the joint observation is projected for all agents in one matmul over the concatenated weights
+            weight = torch.cat([d['layer_1_obs'].weight for d in self.value_dicts], dim=0) # shape = (n*h, n*o)
+            bias = torch.cat([d['layer_1_obs'].bias for d in self.value_dicts], dim=0) # shape = (n*h)
+            h_obs = nn.functional.linear(obs, weight, bias).view(batch_size, self.n_, self.hid_dim).transpose(0, 1) # shape = (n, b, h)
+            h_act = grouped_linear([d['layer_1_act'] for d in self.value_dicts], act) # shape = (n, b*k, h)
+        h_act = h_act.contiguous().view(self.n_, batch_size, num_coalitions, self.hid_dim)
+        h = torch.relu( h_act + h_obs.unsqueeze(2) ) # shape = (n, b, k, h)
+        h = h.contiguous().view(self.n_, batch_size*num_coalitions, self.hid_dim)
+        values = self.grouped_mlp(self.value_dicts, ['layer_2', 'value_head'], h) # shape = (n, b*k, 1)
+        return values.contiguous().view(self.n_, batch_size, num_coalitions)
+
+    def shapley_values(self, obs, act):
+        '''
+        estimate the shapley values of all agents with the shape of (b, n),
+        act is either the joint action (b, n, a) or one joint action per critic (b, n, n, a)
+        '''
+        if self.coalition_sampler.shapley_mode == 'sample':
+            return self.marginal_contribution(obs, act).mean(dim=1).contiguous().view(-1, self.n_)
+        masks, weights = self.sample_coalitions(obs.size(0), obs.device)
+        return self.coalition_values(obs, act, masks, weights)
+
     def get_loss(self, batch):
+        action_loss, action_out = self.get_action_loss(batch)
+        value_loss, _ = self.get_value_loss(batch)
+        return action_loss, value_loss, action_out
+
+    def get_value_loss(self, batch, weights=None):
         batch_size = len(batch.state)
         n = self.args.agent_num
-        action_dim = self.args.action_dim
         rewards, last_step, done, actions, state, next_state = self.unpack_data(batch)
-        # do the argmax action on the action loss
-        action_out = self.policy(state)
-        actions_ = select_action(self.args, action_out, status='train', exploration=False)
-        shapley_values = self.marginal_contribution(state, actions_).mean(dim=1).contiguous().view(-1, n)
         # do the exploration action on the value loss
-        shapley_values_sum = self.marginal_contribution(state, actions).mean(dim=1).contiguous().view(-1, n).sum(dim=-1, keepdim=True).expand(batch_size, self.n_)
-        # do the argmax action on the next value loss
-        if self.args.target:
-            next_action_out = self.target_net.policy(next_state)
-        else:
-            next_action_out = self.policy(next_state)
-        next_actions_ = select_action(self.args, next_action_out, status='train', exploration=False)
-        if self.args.target:
-            next_shapley_values_sum = self.target_net.marginal_contribution(next_state, next_actions_.detach()).mean(dim=1).contiguous().view(-1, n).sum(dim=-1, keepdim=True).expand(batch_size, self.n_)
+        shapley_values = self.shapley_values(state, actions)
+        if self.args.shared_parameters:
+            shapley_values_sum = shapley_values.sum(dim=-1, keepdim=True).expand(batch_size, self.n_)
         else:
-            next_shapley_values_sum = self.marginal_contribution(next_state, next_actions_.detach()).mean(dim=1).contiguous().view(-1, n).sum(dim=-1, keepdim=True).expand(batch_size, self.n_)
-        returns = cuda_wrapper(torch.zeros((batch_size, n), dtype=torch.float), self.cuda_)
+            # the same sum for all agents, but the loss of each agent only reaches its own critic
+            shapley_values_sum = shapley_values + (shapley_values.sum(dim=-1, keepdim=True) - shapley_values).detach()
+        # do the argmax action on the next value loss
+        with torch.no_grad():
+            if self.args.target:
+                next_action_out = self.target_net.policy(next_state)
+            else:
+                next_action_out = self.policy(next_state)
+            next_actions_ = select_action(self.args, next_action_out, status='train', exploration=False)
+            if self.args.target:
+                next_shapley_values_sum = self.target_net.shapley_values(next_state, next_actions_).sum(dim=-1, keepdim=True).expand(batch_size, self.n_)
+            else:
+                next_shapley_values_sum = self.shapley_values(next_state, next_actions_).sum(dim=-1, keepdim=True).expand(batch_size, self.n_)
         assert shapley_values_sum.size() == next_shapley_values_sum.size()
+        returns = td_returns(rewards, last_step, done, next_shapley_values_sum, self.args.gamma)
         assert returns.size() == shapley_values_sum.size()
-        for i in reversed(range(rewards.size(0))):
-            if last_step[i]:
-                next_return = 0 if done[i] else next_shapley_values_sum[i].detach()
-            else:
-                next_return = next_shapley_values_sum[i].detach()
-            returns[i] = rewards[i] + self.args.gamma * next_return
         deltas = returns - shapley_values_sum
+        value_loss = td_loss(deltas, weights)
+        return value_loss, deltas
+
+    def get_action_loss(self, batch):
+        rewards, last_step, done, actions, state, next_state = self.unpack_data(batch)
+        # an update round runs critic_update_times value updates and one action update, so it is counted here
+        self.coalition_sampler.step()
+        # do the argmax action on the action loss
+        action_out = self.policy(state)
+        actions_ = select_action(self.args, action_out, status='train', exploration=False)
+        if not self.args.shared_parameters:
+            actions_ = self.agent_owned_actions(actions_)
+        shapley_values = self.shapley_values(state, actions_)
         advantages = shapley_values
         if self.args.normalize_advantages:
             advantages = batchnorm(advantages)
         action_loss = -advantages
         action_loss = action_loss.mean(dim=0)
-        value_loss = deltas.pow(2).mean(dim=0)
-        return action_loss, value_loss, action_out
+        return action_loss, action_out
 
     def train_process(self, stat, trainer):
         info = {}
-        state = trainer.env.reset()
+        # the observations are written into two buffers in turn as in Model.train_process
+        obs_tensors = torch.zeros(2, 1, self.n_, self.obs_dim)
+        if self.cuda_:
+            obs_tensors = obs_tensors.pin_memory()
+        obs_buffers = obs_tensors.numpy()
+        state = trainer.env.reset(obs_out=obs_buffers[0, 0])
         if self.args.reward_record_type is 'episode_mean_step':
             trainer.mean_reward = 0
             trainer.mean_success = 0
         for t in range(self.args.max_steps):
-            state_ = cuda_wrapper(prep_obs(state).contiguous().view(1, self.n_, self.obs_dim), self.cuda_)
             start_step = True if t == 0 else False
-            state_ = cuda_wrapper(prep_obs(state).contiguous().view(1, self.n_, self.obs_dim), self.cuda_)
-            action_out = self.policy(state_, info=info, stat=stat)
-            action = select_action(self.args, action_out, status='train', info=info)
-            _, actual = translate_action(self.args, action, trainer.env)
-            next_state, reward, done, debug = trainer.env.step(actual)
+            state_ = cuda_wrapper(obs_tensors[t%2], self.cuda_)
+            with torch.no_grad():
+                action_out = self.policy(state_, info=info, stat=stat)
+                action, index = select_action(self.args, action_out, status='train', info=info, return_index=True)
+            _, actual = translate_action(self.args, action, trainer.env, index)
+            next_state, reward, done, debug = trainer.env.step(actual, obs_out=obs_buffers[(t+1)%2, 0])
             if isinstance(done, list): done = np.sum(done)
             done_ = done or t==self.args.max_steps-1
             trans = self.Transition(state,
@@ -1,3 +1,7 @@
+import sys
+from utilities.startup import ImportProfiler
+# the imports below are only timed if the profiler is created before them
+profiler = ImportProfiler() if '--profile-startup' in sys.argv else None
 import torch
 from utilities.tester import *
 from arguments import *
@@ -8,9 +12,14 @@ parser = argparse.ArgumentParser(description='Test rl agent.')
 parser.add_argument('--save-model-dir', type=str, nargs='?', default='./model_save/', help='Please input the directory of saving model.')
 parser.add_argument('--render', action='store_true', help='Please input the flag to control the render.')
 parser.add_argument('--episodes', type=int, default=10, help='Please input the number of test episodes')
+parser.add_argument('--profile-startup', action='store_true', help='Please input the flag to print the import time of every module before testing.')
 
 argv = parser.parse_args()
 
+# the environment is only built here, importing the arguments does not build it
+env = make_env()
+args = make_args(env)
+
 model = Model[model_name]
 
 strategy = Strategy[model_name]
@@ -38,6 +47,9 @@ elif strategy == 'q':
 else:
     raise RuntimeError('Please input the correct strategy, e.g. pg or q.')
 
+if argv.profile_startup:
+    profiler.report()
+
 print(args)
 test.run_game(episodes=argv.episodes, render=argv.render)
 test.print_info()
@@ -1,3 +1,7 @@
+import sys
+from utilities.startup import ImportProfiler
+# the imports below are only timed if the profiler is created before them
+profiler = ImportProfiler() if '--profile-startup' in sys.argv else None
 import numpy as np
 from utilities.trainer import *
 import torch
@@ -11,8 +15,13 @@ import argparse
 
 parser = argparse.ArgumentParser(description='Test rl agent.')
 parser.add_argument('--save-path', type=str, nargs='?', default='./', help='Please input the directory of saving model.')
+parser.add_argument('--profile-startup', action='store_true', help='Please input the flag to print the import time of every module before training.')
 argv = parser.parse_args()
 
+# the environment is only built here, importing the arguments does not build it
+env = make_env()
+args = make_args(env)
+
 
 
 if argv.save_path[-1] is '/':
@@ -44,13 +53,19 @@ strategy = Strategy[model_name]
 
 print ( '{}\n'.format(args) )
 
-if strategy == 'pg':
+if strategy == 'pg' and args.actor_num > 0:
+    from utilities.async_trainer import AsyncPGTrainer
+    train = AsyncPGTrainer(args, model, env(), logger, args.online)
+elif strategy == 'pg':
     train = PGTrainer(args, model, env(), logger, args.online)
 elif strategy == 'q':
     raise NotImplementedError('This needs to be implemented.')
 else:
     raise RuntimeError('Please input the correct strategy, e.g. pg or q.')
 
+if argv.profile_startup:
+    profiler.report()
+
 stat = dict()
 
 for i in range(args.train_episodes_num):
@@ -59,7 +74,11 @@ for i in range(args.train_episodes_num):
     if i%args.save_model_freq == args.save_model_freq-1:
         train.print_info(stat)
         torch.save({'model_state_dict': train.behaviour_net.state_dict()}, save_path+'model_save/'+log_name+'/model.pt')
+        if args.replay and args.online and args.replay_buffer_path != None:
+            train.replay_buffer.flush()
         print ('The model is saved!\n')
         with open(save_path+'model_save/'+log_name +'/log.txt', 'w+') as file:
             file.write(str(args)+'\n')
             file.write(str(i))
+
+train.close()
@@ -0,0 +1,149 @@
+import random
+import multiprocessing as mp
+import numpy as np
+import torch
+from utilities.util import *
+from utilities.trainer import PGTrainer
+
+
+
+def actor(rank, args, model, env, params, version, lock, transitions, seed):
+    '''
+    run the rollouts of train_process with a local copy of the policy, the copy is refreshed from the shared
+    parameters every sync_interval steps, the transitions are collected as plain tuples and put into the queue
+    as one chunk at every sync and at the end of every episode, together with the episode record at the end
+    '''
+    torch.set_num_threads(1)
+    np.random.seed(seed)
+    random.seed(seed)
+    torch.manual_seed(seed)
+    args = args._replace(cuda=False)
+    behaviour_net = model(args)
+    local_params = list(behaviour_net.action_dicts.parameters())
+    local_version = -1
+    steps = 0
+    info = {}
+    chunk = []
+    while True:
+        state = env.reset()
+        reward_sum, success_sum = 0.0, 0.0
+        for t in range(args.max_steps):
+            if steps%args.sync_interval == 0 and chunk:
+                transitions.put((chunk, None))
+                chunk = []
+            if steps%args.sync_interval == 0 and version.value != local_version:
+                with lock:
+                    for local_param, param in zip(local_params, params):
+                        local_param.data.copy_(param)
+                    local_version = version.value
+            with torch.no_grad():
+                state_ = prep_obs(state).contiguous().view(1, args.agent_num, args.obs_size)
+                action_out = behaviour_net.policy(state_, info=info)
+                action, index = select_action(args, action_out, status='train', info=info, return_index=True)
+            _, actual = translate_action(args, action, env, index)
+            next_state, reward, done, debug = env.step(actual)
+            if isinstance(done, list): done = np.sum(done)
+            done_ = done or t==args.max_steps-1
+            chunk.append((state, action.numpy(), np.array(reward), next_state, done, done_))
+            steps += 1
+            reward_sum += np.mean(reward)
+            success_sum += debug['success'] if 'success' in debug else 0.0
+            if done_:
+                break
+            state = next_state
+        transitions.put((chunk, (reward_sum, success_sum, t+1)))
+        chunk = []
+
+
+
+class AsyncPGTrainer(PGTrainer):
+    '''
+    the learner of an actor/learner split of PGTrainer, actor_num actor processes step their own copies of the environment
+    with a periodically synced copy of the policy and stream the transitions in chunks through a queue of about queue_depth transitions,
+    while the learner consumes the queue and runs one update round from the replay buffer every behaviour_update_freq transitions
+    '''
+
+    def __init__(self, args, model, env, logger, online):
+        if args.num_envs > 1:
+            raise RuntimeError('Please enter num_envs=1 for the asynchronous trainer, since every actor steps its own environment.')
+        super(AsyncPGTrainer, self).__init__(args, model, env, logger, online)
+        if not self.args.replay:
+            raise RuntimeError('Please enter replay=True for the asynchronous trainer.')
+        self.updates = 0
+        self.recorded_steps = 0
+        # the actors are forked because the scenario callbacks of the environments can not be pickled
+        context = mp.get_context('fork')
+        self.params = [param.detach().cpu().clone().share_memory_() for param in self.behaviour_net.action_dicts.parameters()]
+        self.version = context.Value('i', 0)
+        self.lock = context.Lock()
+        # a chunk holds at most sync_interval transitions
+        self.transitions = context.Queue(maxsize=max(1, self.args.queue_depth//self.args.sync_interval))
+        self.actors = []
+        for rank in range(self.args.actor_num):
+            process = context.Process(target=actor, args=(rank, self.args, model, env, self.params, self.version, self.lock, self.transitions, rank), daemon=True)
+            process.start()
+            self.actors.append(process)
+
+    def publish(self):
+        '''
+        copy the policy parameters to the shared memory read by the actors
+        '''
+        with self.lock:
+            for shared_param, param in zip(self.params, self.behaviour_net.action_dicts.parameters()):
+                shared_param.copy_(param.detach())
+            self.version.value += 1
+
+    def ready(self):
+        return self.steps>self.args.replay_warmup and len(self.replay_buffer)>=self.args.batch_size
+
+    def update(self, stat):
+        self.behaviour_net.replay_update(self, stat)
+        self.updates += 1
+        self.publish()
+
+    def consume(self, stat, item):
+        '''
+        add the transitions of a chunk to the replay buffer one by one with the due updates and record the finished episode
+        of the chunk if any, return whether an episode is finished
+        '''
+        chunk, episode = item
+        for data in chunk:
+            self.replay_buffer.add_experience(self.behaviour_net.Transition(*data))
+            self.steps += 1
+            # the update round and the target net follow the consumed steps as in the synchronous trainer
+            if self.ready() and self.steps%self.args.behaviour_update_freq == 0:
+                self.update(stat)
+            if self.args.target and self.steps%self.args.target_update_freq == 0:
+                self.behaviour_net.update_target()
+        if episode is None:
+            return False
+        reward_sum, success_sum, turn = episode
+        if self.args.reward_record_type is 'mean_step':
+            self.recorded_steps += turn
+            self.mean_reward = self.mean_reward + (reward_sum - turn*self.mean_reward)/self.recorded_steps
+            self.mean_success = self.mean_success + (success_sum - turn*self.mean_success)/self.recorded_steps
+        elif self.args.reward_record_type is 'episode_mean_step':
+            self.mean_reward = reward_sum/turn
+            self.mean_success = success_sum/turn
+        else:
+            raise RuntimeError('Please enter a correct reward record type, e.g. mean_step or episode_mean_step.')
+        stat['mean_reward'] = self.mean_reward
+        stat['mean_success'] = self.mean_success
+        stat['turn'] = turn
+        self.episodes += 1
+        return True
+
+    def run(self, stat):
+        '''
+        consume the queue until an actor finishes an episode, the learner blocks on the queue between the update rounds
+        '''
+        finished = False
+        while not finished:
+            finished = self.consume(stat, self.transitions.get())
+        self.entr += self.entr_inc
+
+    def close(self):
+        for process in self.actors:
+            process.terminate()
+            process.join()
+        super(AsyncPGTrainer, self).close()
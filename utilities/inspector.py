@@ -3,6 +3,8 @@ import numpy as np
 
 
 def inspector(args):
+    if args.fused_optimizer and args.shared_parameters:
+        raise RuntimeError('Please enter fused_optimizer=False for shared parameters, since the fused optimizer would clip and step their summed gradient once instead of once per agent.')
     if args.model_name is 'maddpg':
         assert args.replay is True
         assert args.q_func is True
@@ -32,6 +34,7 @@ def inspector(args):
         assert args.epsilon_softmax is False
         assert args.online is True
         assert hasattr(args, 'sample_size')
+        assert args.shapley_mode in ['sample', 'exact', 'stratified', 'antithetic']
     elif args.model_name is 'coma_fc':
         assert args.replay is True
         assert args.q_func is True
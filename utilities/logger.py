@@ -1,71 +1,181 @@
-# Code referenced from https://gist.github.com/gyglim/1f8dfb1b5c82627ae3efcfbbadb9f514
-import tensorflow as tf
+# The event files follow the record format and the protos of TensorFlow, so that TensorBoard reads them
+# without TensorFlow being installed (the API is the one of https://gist.github.com/gyglim/1f8dfb1b5c82627ae3efcfbbadb9f514)
+import os
+import time
+import zlib
+import socket
+import struct
+import atexit
+import threading
 import numpy as np
-import scipy.misc
-try:
-    from StringIO import StringIO  # Python 2.7
-except ImportError:
-    from io import BytesIO         # Python 3.x
+
+
+
+def make_crc32c_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+CRC32C_TABLE = make_crc32c_table()
+
+def crc32c(data):
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc = CRC32C_TABLE[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+def masked_crc32c(data):
+    crc = crc32c(data)
+    return (((crc >> 15) | (crc << 17)) + 0xA282EAD8) & 0xFFFFFFFF
+
+def record(data):
+    '''
+    frame the data as a record of the event file, i.e. the length, the masked crc of the length, the data and its masked crc
+    '''
+    length = struct.pack('<Q', len(data))
+    return length + struct.pack('<I', masked_crc32c(length)) + data + struct.pack('<I', masked_crc32c(data))
+
+
+
+def varint(value):
+    out = bytearray()
+    value &= 0xFFFFFFFFFFFFFFFF
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def proto_varint(field, value):
+    return varint(field << 3) + varint(value)
+
+def proto_double(field, value):
+    return varint(field << 3 | 1) + struct.pack('<d', value)
+
+def proto_float(field, value):
+    return varint(field << 3 | 5) + struct.pack('<f', value)
+
+def proto_bytes(field, value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return varint(field << 3 | 2) + varint(len(value)) + value
+
+def proto_doubles(field, values):
+    return proto_bytes(field, np.asarray(values, dtype='<f8').tobytes())
+
+def event(step, summary_values=None, file_version=None):
+    '''
+    encode an Event proto with the encoded Summary.Value protos
+    '''
+    data = proto_double(1, time.time()) + proto_varint(2, int(step))
+    if file_version is not None:
+        data += proto_bytes(3, file_version)
+    if summary_values is not None:
+        data += proto_bytes(5, b''.join(proto_bytes(1, value) for value in summary_values))
+    return data
+
+def png(image):
+    '''
+    encode an image with the shape of (h, w), (h, w, 3) or (h, w, 4) as png, the images which are not uint8
+    are scaled from their min and max to [0, 255] as scipy.misc.toimage did
+    '''
+    image = np.asarray(image)
+    if image.dtype != np.uint8:
+        low, high = float(image.min()), float(image.max())
+        image = ((image - low) * (255.0 / (high - low) if high > low else 0.0) + 0.5).astype(np.uint8)
+    height, width = image.shape[:2]
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    # colour types of grayscale, rgb and rgba
+    colour = {1: 0, 3: 2, 4: 6}[channels]
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width*channels)], axis=1)
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, colour, 0, 0, 0)) \
+        + chunk(b'IDAT', zlib.compress(rows.tobytes())) + chunk(b'IEND', b''), height, width, channels
+
 
 
 class Logger(object):
 
-    def __init__(self, log_dir):
-        """Create a summary writer logging to log_dir."""
-        self.writer = tf.summary.FileWriter(log_dir)
+    def __init__(self, log_dir, flush_secs=10, max_queue=1000, downsample=None):
+        """Create a summary writer logging to log_dir, the events are kept in memory and written every flush_secs
+        seconds or once max_queue events are queued, and a tag in downsample only keeps every downsample[tag]-th event."""
+        os.makedirs(log_dir, exist_ok=True)
+        self.path = os.path.join(log_dir, 'events.out.tfevents.{:d}.{}'.format(int(time.time()), socket.gethostname()))
+        self.file = open(self.path, 'wb')
+        self.max_queue = max_queue
+        self.downsample = downsample or {}
+        self.counts = dict()
+        self.queue = [event(0, file_version='brain.Event:2')]
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(flush_secs,), daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self, flush_secs):
+        while not self.closed.wait(flush_secs):
+            self.flush()
+
+    def add_event(self, tag, summary_value, step):
+        count = self.counts.get(tag, 0)
+        self.counts[tag] = count + 1
+        if count % self.downsample.get(tag, 1) != 0:
+            return
+        data = event(step, [summary_value])
+        with self.lock:
+            self.queue.append(data)
+            full = len(self.queue) >= self.max_queue
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Frame the queued events as records and write them to the event file."""
+        with self.lock:
+            queue, self.queue = self.queue, []
+            if queue and not self.file.closed:
+                self.file.write(b''.join(record(data) for data in queue))
+                self.file.flush()
+
+    def close(self):
+        """Write the queued events and close the event file."""
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        self.thread.join()
+        self.flush()
+        with self.lock:
+            self.file.close()
 
     def scalar_summary(self, tag, value, step):
         """Log a scalar variable."""
-        summary = tf.Summary(value=[tf.Summary.Value(tag=tag, simple_value=value)])
-        self.writer.add_summary(summary, step)
+        self.add_event(tag, proto_bytes(1, tag) + proto_float(2, float(value)), step)
 
     def image_summary(self, tag, images, step):
         """Log a list of images."""
-
-        img_summaries = []
         for i, img in enumerate(images):
-            # Write the image to a string
-            try:
-                s = StringIO()
-            except:
-                s = BytesIO()
-            scipy.misc.toimage(img).save(s, format="png")
-
-            # Create an Image object
-            img_sum = tf.Summary.Image(encoded_image_string=s.getvalue(),
-                                       height=img.shape[0],
-                                       width=img.shape[1])
-            # Create a Summary value
-            img_summaries.append(tf.Summary.Value(tag='%s/%d' % (tag, i), image=img_sum))
-
-        # Create and write Summary
-        summary = tf.Summary(value=img_summaries)
-        self.writer.add_summary(summary, step)
+            encoded, height, width, channels = png(img)
+            # Create an Image proto
+            img_sum = proto_varint(1, height) + proto_varint(2, width) + proto_varint(3, channels) + proto_bytes(4, encoded)
+            self.add_event(tag, proto_bytes(1, '%s/%d' % (tag, i)) + proto_bytes(4, img_sum), step)
 
     def hist_summary(self, tag, values, step, bins=1000):
         """Log a histogram of the tensor of values."""
 
         # Create a histogram using numpy
+        values = np.asarray(values)
         counts, bin_edges = np.histogram(values, bins=bins)
 
-        # Fill the fields of the histogram proto
-        hist = tf.HistogramProto()
-        hist.min = float(np.min(values))
-        hist.max = float(np.max(values))
-        hist.num = int(np.prod(values.shape))
-        hist.sum = float(np.sum(values))
-        hist.sum_squares = float(np.sum(values**2))
-
-        # Drop the start of the first bin
-        bin_edges = bin_edges[1:]
-
-        # Add bin edges and counts
-        for edge in bin_edges:
-            hist.bucket_limit.append(edge)
-        for c in counts:
-            hist.bucket.append(c)
-
-        # Create and write Summary
-        summary = tf.Summary(value=[tf.Summary.Value(tag=tag, histo=hist)])
-        self.writer.add_summary(summary, step)
-        self.writer.flush()
+        # Fill the fields of the histogram proto, dropping the start of the first bin
+        hist = proto_double(1, float(np.min(values))) \
+            + proto_double(2, float(np.max(values))) \
+            + proto_double(3, float(np.prod(values.shape))) \
+            + proto_double(4, float(np.sum(values))) \
+            + proto_double(5, float(np.sum(values**2))) \
+            + proto_doubles(6, bin_edges[1:]) \
+            + proto_doubles(7, counts)
+        self.add_event(tag, proto_bytes(1, tag) + proto_bytes(5, hist), step)
@@ -1,57 +1,360 @@
 import numpy as np
+import json
+import os
+from collections import namedtuple
+
+
+
+def sample_indices(length, batch_size):
+    '''
+    draw batch_size distinct indices in [0, length) without building a permutation of the whole buffer
+    '''
+    if length <= 64 * batch_size:
+        return np.random.choice(length, batch_size, replace=False)
+    indices = np.unique(np.random.randint(length, size=batch_size))
+    while indices.size < batch_size:
+        indices = np.unique(np.concatenate((indices, np.random.randint(length, size=batch_size-indices.size))))
+    return indices
+
 
 
 class TransReplayBuffer(object):
+    '''
+    a ring buffer that stores each field of the transitions in a preallocated array,
+    the arrays are allocated at the first transition with its shapes and get_batch returns
+    one array per field with the batch as the first dimension, the flags done and last_step
+    are stored as bool and the other fields as float32.
+    if path is given, each field is a fixed-record np.memmap file under path and a json header
+    records the shapes and the ring position, it is rewritten every flush_freq transitions and
+    a buffer created with the same path reopens the transitions up to the last header
+    '''
+
+    # the dtypes of the fields which are not float32
+    dtypes = dict(done=np.bool_, last_step=np.bool_)
+
+    def __init__(self, size, path=None, flush_freq=1000):
+        self.size = int(size)
+        self.path = path
+        self.flush_freq = flush_freq
+        self.columns = None
+        self.transition = None
+        self.position = 0
+        self.length = 0
+        if self.path is not None:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            if os.path.isfile(self.header_file()):
+                self.reopen()
+
+    def __len__(self):
+        return self.length
 
-    def __init__(self, size):
-        self.size = size
-        self.buffer = []
+    def header_file(self):
+        return os.path.join(self.path, 'header.json')
+
+    def header(self):
+        return dict(size=self.size,
+                    fields=list(self.transition._fields),
+                    shapes={field: list(column.shape[1:]) for field, column in self.columns.items()},
+                    dtypes={field: column.dtype.str for field, column in self.columns.items()},
+                    position=self.position,
+                    length=self.length
+                   )
+
+    def create_columns(self, shapes, dtypes, mode):
+        self.columns = dict()
+        for field, shape in shapes.items():
+            if self.path is None:
+                self.columns[field] = np.zeros((self.size,)+tuple(shape), dtype=dtypes[field])
+            else:
+                self.columns[field] = np.memmap(os.path.join(self.path, field+'.dat'), dtype=dtypes[field], mode=mode, shape=(self.size,)+tuple(shape))
+
+    def allocate(self, trans):
+        self.transition = type(trans)
+        shapes = dict(state=np.shape(trans.state),
+                      action=np.shape(trans.action[0]),
+                      reward=np.shape(trans.reward),
+                      next_state=np.shape(trans.next_state),
+                      done=(),
+                      last_step=()
+                     )
+        self.create_columns(shapes, {field: self.dtypes.get(field, np.float32) for field in shapes}, 'w+')
+        if self.path is not None:
+            self.flush()
+
+    def reopen(self):
+        with open(self.header_file()) as f:
+            header = json.load(f)
+        if header['size'] != self.size:
+            raise RuntimeError('Please enter the size {} of the replay buffer stored in {}, now {} is received.'.format(header['size'], self.path, self.size))
+        self.transition = namedtuple('Transition', header['fields'])
+        # the headers written before the bool flags hold no dtypes and all their fields are float32
+        dtypes = header.get('dtypes', {field: np.float32 for field in header['shapes']})
+        self.create_columns(header['shapes'], dtypes, 'r+')
+        self.position = header['position']
+        self.length = header['length']
+        return header
+
+    def flush(self):
+        '''
+        write the records to the disk before the header so that the header never covers unwritten records
+        '''
+        for column in self.columns.values():
+            column.flush()
+        with open(self.header_file()+'.tmp', 'w') as f:
+            json.dump(self.header(), f)
+        os.replace(self.header_file()+'.tmp', self.header_file())
 
     def get_single(self, index):
-        return self.buffer[index]
+        return self.transition(**{field: column[(self.position-self.length+index)%self.size] for field, column in self.columns.items()})
 
-    def offset(self):
-        self.buffer.pop(0)
+    def get_batch(self, batch_size):
+        indices = sample_indices(self.length, batch_size)
+        return self.transition(**{field: column[indices] for field, column in self.columns.items()})
+
+    def write(self, index, trans):
+        self.columns['state'][index] = trans.state
+        self.columns['action'][index] = trans.action[0]
+        self.columns['reward'][index] = trans.reward
+        self.columns['next_state'][index] = trans.next_state
+        self.columns['done'][index] = trans.done
+        self.columns['last_step'][index] = trans.last_step
+
+    def add_experience(self, trans):
+        if self.columns is None:
+            self.allocate(trans)
+        # the oldest transition is overwritten once the buffer is full
+        self.write(self.position, trans)
+        self.position = (self.position + 1) % self.size
+        self.length = min(self.length + 1, self.size)
+        if self.path is not None and self.position % self.flush_freq == 0:
+            self.flush()
+
+    def clear(self):
+        self.position = 0
+        self.length = 0
+        if self.path is not None and self.columns is not None:
+            self.flush()
+
+
+
+class SumTree(object):
+    '''
+    a binary tree over the priorities of a buffer where each node holds the sum of its children,
+    the leaves are stored from the index capacity on and the root is at the index 1,
+    the nodes are kept in a np.memmap file if path is given
+    '''
+
+    def __init__(self, size, path=None, mode='w+'):
+        self.capacity = 1
+        while self.capacity < size:
+            self.capacity *= 2
+        if path is None:
+            self.tree = np.zeros(2*self.capacity, dtype=np.float64)
+        else:
+            self.tree = np.memmap(path, dtype=np.float64, mode=mode, shape=(2*self.capacity,))
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[np.asarray(indices)+self.capacity]
+
+    def set(self, index, priority):
+        node = index + self.capacity
+        change = priority - self.tree[node]
+        while node >= 1:
+            self.tree[node] += change
+            node //= 2
+
+    def update(self, indices, priorities):
+        '''
+        write a batch of leaves and recompute their ancestors level by level
+        '''
+        nodes = np.asarray(indices) + self.capacity
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2*nodes] + self.tree[2*nodes+1]
+            nodes = np.unique(nodes // 2)
+
+    def rebuild(self, length, stale=0):
+        '''
+        zero the leaves in [length, length+stale) and recompute the inner nodes above the leaves [0, length+stale),
+        the untouched part of a large tree on the disk is never read
+        '''
+        end = min(length + stale, self.capacity)
+        self.tree[self.capacity+length:self.capacity+end] = 0
+        lo, hi = self.capacity, self.capacity + end
+        while lo > 1:
+            lo, hi = lo // 2, (hi + 1) // 2
+            self.tree[lo:hi] = self.tree[2*lo:2*hi:2] + self.tree[2*lo+1:2*hi:2]
+
+    def find(self, values):
+        '''
+        descend from the root for all values at once and return the leaves whose prefix sums cover the values
+        '''
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.capacity:
+            left = self.tree[2*nodes]
+            right = values >= left
+            values = values - left * right
+            nodes = 2*nodes + right
+        return nodes - self.capacity
+
+
+
+class PrioritizedTransReplayBuffer(TransReplayBuffer):
+    '''
+    the columnar ring buffer sampled in proportion to priority**alpha,
+    new transitions get the largest priority seen so far so that they are replayed at least once
+    '''
+
+    def __init__(self, size, path=None, flush_freq=1000, alpha=0.6, beta=0.4, eps=1e-6):
+        self.alpha = alpha
+        self.beta = beta
+        self.eps = eps
+        self.priorities = None
+        self.max_priority = 1.0
+        super(PrioritizedTransReplayBuffer, self).__init__(size, path, flush_freq)
+        if self.priorities is None:
+            self.priorities = SumTree(self.size, self.priority_file())
+
+    def priority_file(self):
+        return None if self.path is None else os.path.join(self.path, 'priorities.dat')
+
+    def header(self):
+        header = super(PrioritizedTransReplayBuffer, self).header()
+        header['max_priority'] = self.max_priority
+        return header
+
+    def reopen(self):
+        header = super(PrioritizedTransReplayBuffer, self).reopen()
+        self.max_priority = header['max_priority']
+        # the leaves after the header and the inner nodes may be stale if the process stopped between two flushes
+        self.priorities = SumTree(self.size, self.priority_file(), 'r+')
+        self.priorities.rebuild(self.length, 0 if self.length == self.size else self.flush_freq)
+        return header
+
+    def flush(self):
+        self.priorities.tree.flush()
+        super(PrioritizedTransReplayBuffer, self).flush()
+
+    def sample(self, batch_size):
+        '''
+        draw one index from each of batch_size equal segments of the total priority
+        '''
+        segment = self.priorities.total() / batch_size
+        values = (np.arange(batch_size) + np.random.rand(batch_size)) * segment
+        return np.minimum(self.priorities.find(values), self.length-1)
 
     def get_batch(self, batch_size):
-        length = len(self.buffer)
-        indices = np.random.choice(length, batch_size, replace=False)
-        batch_buffer = [self.buffer[i] for i in indices]
-        return batch_buffer
+        indices = self.sample(batch_size)
+        return self.transition(**{field: column[indices] for field, column in self.columns.items()})
+
+    def get_weighted_batch(self, batch_size, beta=None):
+        '''
+        return the batch, the importance sampling weights normalized by their maximum and the sampled indices,
+        the weights use the exponent beta if given (e.g. annealed by the trainer) and self.beta otherwise
+        '''
+        beta = self.beta if beta is None else beta
+        indices = self.sample(batch_size)
+        probs = self.priorities.get(indices) / self.priorities.total()
+        weights = (self.length * probs) ** (-beta)
+        weights = (weights / weights.max()).astype(np.float32)
+        batch = self.transition(**{field: column[indices] for field, column in self.columns.items()})
+        return batch, weights, indices
+
+    def update_priorities(self, indices, td_errors):
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.priorities.update(indices, priorities)
+        self.max_priority = max(self.max_priority, priorities.max())
 
     def add_experience(self, trans):
-        est_len = 1 + len(self.buffer)
-        if est_len > self.size:
-            self.offset()
-        self.buffer.append(trans)
+        self.priorities.set(self.position, self.max_priority)
+        super(PrioritizedTransReplayBuffer, self).add_experience(trans)
 
     def clear(self):
-        self.buffer = []
+        self.priorities.rebuild(0, self.size if self.length == self.size else self.length + self.flush_freq)
+        self.max_priority = 1.0
+        super(PrioritizedTransReplayBuffer, self).clear()
 
 
 
 class EpisodeReplayBuffer(object):
+    '''
+    an episode store that keeps the transitions of all episodes in one flat columnar array,
+    each episode is a contiguous segment indexed by its start and its length in a ring of size episodes,
+    the array holds size*episode_length transitions and the oldest episodes are evicted when a new one does not fit
+    '''
 
-    def __init__(self, size):
-        self.size = size
-        self.buffer = []
+    def __init__(self, size, episode_length):
+        self.size = int(size)
+        self.storage = TransReplayBuffer(self.size*episode_length)
+        self.starts = np.zeros(self.size, dtype=np.int64)
+        self.lengths = np.zeros(self.size, dtype=np.int64)
+        self.first = 0
+        self.count = 0
+        self.head = 0
 
-    def get_single(self, index):
-        return self.buffer[index]
+    def __len__(self):
+        return self.count
+
+    def overlaps(self, slot, length):
+        return self.starts[slot] < self.head + length and self.head < self.starts[slot] + self.lengths[slot]
 
     def offset(self):
-        self.buffer.pop(0)
+        self.first = (self.first + 1) % self.size
+        self.count -= 1
+
+    def rows(self, slots):
+        starts, lengths = self.starts[slots], self.lengths[slots]
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def gather(self, rows):
+        return self.storage.transition(**{field: column[rows] for field, column in self.storage.columns.items()})
+
+    def get_single(self, index):
+        '''
+        return the index-th oldest episode as views of the storage without copying
+        '''
+        slot = (self.first + index) % self.size
+        start, end = self.starts[slot], self.starts[slot] + self.lengths[slot]
+        return self.storage.transition(**{field: column[start:end] for field, column in self.storage.columns.items()})
 
     def get_batch(self, batch_size):
-        length = len(self.buffer)
-        indices = np.random.choice(length, batch_size, replace=False)
-        batch_buffer = []
-        for i in indices:
-            batch_buffer.extend(self.buffer[i])
-        return batch_buffer
+        '''
+        return the transitions of batch_size whole episodes one after another, copied by one gather per field
+        '''
+        indices = np.random.choice(self.count, batch_size, replace=False)
+        return self.gather(self.rows((self.first + indices) % self.size))
 
     def add_experience(self, episode):
-        est_len = 1 + len(self.buffer)
-        if est_len > self.size:
+        length = len(episode)
+        if length > self.storage.size:
+            raise RuntimeError('Please enter an episode with at most {} transitions, now {} is received.'.format(self.storage.size, length))
+        if self.storage.columns is None:
+            self.storage.allocate(episode[0])
+        # an episode never wraps around, the tail of the storage is left unused instead
+        if self.head + length > self.storage.size:
+            self.head = 0
+        while self.count == self.size or ( self.count > 0 and self.overlaps(self.first, length) ):
             self.offset()
-        self.buffer.append(episode)
+        # the whole episode is written into its segment at once
+        segment = slice(self.head, self.head+length)
+        columns = self.storage.columns
+        columns['state'][segment] = np.stack([trans.state for trans in episode])
+        columns['action'][segment] = np.stack([trans.action[0] for trans in episode])
+        columns['reward'][segment] = np.stack([trans.reward for trans in episode])
+        columns['next_state'][segment] = np.stack([trans.next_state for trans in episode])
+        columns['done'][segment] = [trans.done for trans in episode]
+        columns['last_step'][segment] = [trans.last_step for trans in episode]
+        slot = (self.first + self.count) % self.size
+        self.starts[slot], self.lengths[slot] = self.head, length
+        self.count += 1
+        self.head += length
+
+    def clear(self):
+        self.first = 0
+        self.count = 0
+        self.head = 0
@@ -0,0 +1,28 @@
+import torch
+
+
+
+# the return targets shared by all algorithms.
+# rewards and next_values are with the shape of (b, n), last_step and done are with the shape of (b, 1),
+# next_values[i] is the value of the state after the i-th transition and is never backpropagated.
+
+def bootstrap_mask(last_step, done):
+    '''
+    get the mask with the shape of (b, 1) which is zero where the bootstrap value is cut off by a terminal state
+    '''
+    return 1.0 - last_step * (done != 0).float()
+
+def td_returns(rewards, last_step, done, next_values, gamma):
+    '''
+    calculate the one-step td targets r + gamma * v' in closed form
+    '''
+    return rewards + gamma * bootstrap_mask(last_step, done) * next_values.detach()
+
+def td_loss(deltas, weights=None):
+    '''
+    calculate the mean squared td error of each agent with the shape of (n),
+    the importance sampling weights with the shape of (b, 1) scale the squared errors of the transitions
+    '''
+    if weights is None:
+        return deltas.pow(2).mean(dim=0)
+    return (weights * deltas.pow(2)).mean(dim=0)
@@ -0,0 +1,65 @@
+import sys
+import time
+import builtins
+import importlib
+import importlib.util
+
+
+
+class ImportProfiler(object):
+    '''
+    time the first import of every module from the creation of the profiler on by wrapping __import__ and importlib.import_module,
+    the self time of a module excludes the time of the modules imported by it
+    '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # (module, self time, cumulative time, depth) in the order the imports finish
+        self.records = []
+        self.stack = []
+        self.original_import = builtins.__import__
+        self.original_import_module = importlib.import_module
+        builtins.__import__ = self.timed_import
+        importlib.import_module = self.timed_import_module
+
+    def timed(self, fn, name, package, *args):
+        try:
+            name = importlib.util.resolve_name(name, package) if name.startswith('.') else name
+        except (ImportError, ValueError):
+            return fn(*args)
+        if name in sys.modules:
+            return fn(*args)
+        start = time.perf_counter()
+        self.stack.append(0.0)
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            if name in sys.modules:
+                self.records.append((name, elapsed - children, elapsed, len(self.stack)))
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        package = globals.get('__package__') if level > 0 and globals else None
+        return self.timed(self.original_import, '.'*level + name, package, name, globals, locals, fromlist, level)
+
+    def timed_import_module(self, name, package=None):
+        return self.timed(self.original_import_module, name, package, name, package)
+
+    def stop(self):
+        builtins.__import__ = self.original_import
+        importlib.import_module = self.original_import_module
+
+    def report(self, file=sys.stdout):
+        '''
+        stop timing and print the self and the cumulative import time of every module, the slowest first
+        '''
+        self.stop()
+        total = time.perf_counter() - self.start
+        imports = sum(record[2] for record in self.records if record[3] == 0)
+        print ('{:>10s} {:>12s}  {}'.format('self (ms)', 'cumul. (ms)', 'module'), file=file)
+        for name, self_time, cumulative, _ in sorted(self.records, key=lambda record: -record[2]):
+            print ('{:10.1f} {:12.1f}  {}'.format(self_time*1e3, cumulative*1e3, name), file=file)
+        print ('{:.1f} ms of the startup of {:.1f} ms imported {} modules.\n'.format(imports*1e3, total*1e3, len(self.records)), file=file)
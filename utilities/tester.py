@@ -14,19 +14,27 @@ class PGTester(object):
         self.behaviour_net = behaviour_net.cuda().eval() if args.cuda else behaviour_net.eval()
         self.args = args
         self.cuda_ = self.args.cuda and torch.cuda.is_available()
+        # the environment writes the observations into this buffer which the policy reads without copies
+        obs_tensor = torch.zeros(self.args.agent_num, self.args.obs_size)
+        self.obs_buffer = (obs_tensor.pin_memory() if self.cuda_ else obs_tensor).numpy()
 
     def action_logits(self, state, schedule, last_action, last_hidden, info):
-        return self.behaviour_net.policy(state, schedule=schedule, last_act=last_action, last_hid=last_hidden, info=info)
+        with torch.no_grad():
+            return self.behaviour_net.policy(state, schedule=schedule, last_act=last_action, last_hid=last_hidden, info=info)
 
     def run_step(self, state, schedule, last_action, last_hidden, info={}):
-        state = cuda_wrapper(prep_obs(state).contiguous().view(1, self.args.agent_num, self.args.obs_size), cuda=self.cuda_)
+        '''
+        state is the float32 buffer of the observations, which the next observations overwrite
+        '''
+        obs_buffer = state
+        state = cuda_wrapper(torch.from_numpy(obs_buffer).view(1, self.args.agent_num, self.args.obs_size), cuda=self.cuda_)
         if self.args.model_name in ['schednet']:
             weight = self.behaviour_net.weight_generator(state).detach()
             schedule, _ = self.behaviour_net.weight_based_scheduler(weight, exploration=False)
         action_out = self.action_logits(state, schedule, last_action, last_hidden, info)
-        action = select_action(self.args, action_out, status='test')
-        _, actual = translate_action(self.args, action, self.env)
-        next_state, reward, done, debug  = self.env.step(actual)
+        action, index = select_action(self.args, action_out, status='test', return_index=True)
+        _, actual = translate_action(self.args, action, self.env, index)
+        next_state, reward, done, debug  = self.env.step(actual, obs_out=obs_buffer)
         success = debug['success'] if 'success' in debug else 0.0
         disp = 'The rewards of agents are:'
         for r in reward:
@@ -58,7 +66,7 @@ class PGTester(object):
             print ('The episode {} starts!'.format(ep))
             episode_reward = []
             episode_success = []
-            state = self.env.reset()
+            state = self.env.reset(obs_out=self.obs_buffer)
             t = 0
             while True:
                 if render:
@@ -6,8 +6,6 @@ import torch.nn as nn
 from utilities.util import *
 from utilities.replay_buffer import *
 from utilities.inspector import *
-from arguments import *
-from utilities.logger import Logger
 
 
 
@@ -25,17 +23,30 @@ class PGTrainer(object):
         else:
             self.behaviour_net = model(self.args).cuda() if self.cuda_ else model(self.args)
         if self.args.replay:
-            if self.online:
-                self.replay_buffer = TransReplayBuffer(int(self.args.replay_buffer_size))
+            if self.online and self.args.prioritized_replay:
+                self.replay_buffer = PrioritizedTransReplayBuffer(int(self.args.replay_buffer_size), self.args.replay_buffer_path, beta=self.args.prioritized_replay_beta)
+            elif self.online:
+                self.replay_buffer = TransReplayBuffer(int(self.args.replay_buffer_size), self.args.replay_buffer_path)
             else:
-                self.replay_buffer = EpisodeReplayBuffer(int(self.args.replay_buffer_size))
+                self.replay_buffer = EpisodeReplayBuffer(int(self.args.replay_buffer_size), self.args.max_steps)
         self.env = env
-        self.action_optimizers = []
-        for action_dict in self.behaviour_net.action_dicts:
-            self.action_optimizers.append(optim.Adam(action_dict.parameters(), lr=args.policy_lrate))
-        self.value_optimizers = []
-        for value_dict in self.behaviour_net.value_dicts:
-            self.value_optimizers.append(optim.Adam(value_dict.parameters(), lr=args.value_lrate))
+        if self.args.num_envs > 1:
+            # import multiprocessing only if we step the copies in worker processes
+            from utilities.vec_env import SubprocVecEnv
+            self.vec_env = SubprocVecEnv(env, self.args.num_envs, self.args.action_dim)
+        if self.args.fused_optimizer:
+            # one multi-tensor adam over the parameters of all agents, which are never shared (see the inspector)
+            self.action_optimizers = [optim.Adam(self.behaviour_net.action_dicts.parameters(), lr=args.policy_lrate, foreach=True)]
+            self.value_optimizers = [optim.Adam(self.behaviour_net.value_dicts.parameters(), lr=args.value_lrate, foreach=True)]
+            self.action_params = [list(action_dict.parameters()) for action_dict in self.behaviour_net.action_dicts]
+            self.value_params = [list(value_dict.parameters()) for value_dict in self.behaviour_net.value_dicts]
+        else:
+            self.action_optimizers = []
+            for action_dict in self.behaviour_net.action_dicts:
+                self.action_optimizers.append(optim.Adam(action_dict.parameters(), lr=args.policy_lrate))
+            self.value_optimizers = []
+            for value_dict in self.behaviour_net.value_dicts:
+                self.value_optimizers.append(optim.Adam(value_dict.parameters(), lr=args.value_lrate))
         self.init_action = cuda_wrapper( torch.zeros(1, self.args.agent_num, self.args.action_dim), cuda=self.cuda_ )
         self.steps = 0
         self.episodes = 0
@@ -48,6 +59,14 @@ class PGTrainer(object):
         action_loss, value_loss, log_p_a = self.behaviour_net.get_loss(batch)
         return action_loss, value_loss, log_p_a
 
+    def get_value_loss(self, batch, weights=None):
+        value_loss, deltas = self.behaviour_net.get_value_loss(batch, weights)
+        return value_loss, deltas
+
+    def get_action_loss(self, batch):
+        action_loss, log_p_a = self.behaviour_net.get_action_loss(batch)
+        return action_loss, log_p_a
+
     def action_compute_grad(self, stat, loss, retain_graph):
         action_loss, log_p_a = loss
         if not self.args.continuous:
@@ -64,18 +83,74 @@ class PGTrainer(object):
         for param in params:
             param.grad.data.clamp_(-1, 1)
 
+    def fused_step(self, optimizer, agent_params):
+        '''
+        clip the gradients of all agents and step the fused optimizer after the single backward pass,
+        return the mean of the per-agent gradient norms
+        '''
+        if self.args.grad_clip:
+            nn.utils.clip_grad_value_(optimizer.param_groups[0]['params'], 1.0, foreach=True)
+        # every agent holds the same number of parameter tensors, so the mean over agents is the mean over all
+        grad_norms = torch.stack([torch.linalg.vector_norm(param.grad) for params in agent_params for param in params])
+        optimizer.step()
+        return grad_norms.mean().item()
+
+    def agent_steps(self, optimizers):
+        '''
+        clip the gradients of every agent and step its optimizer after the single backward pass,
+        return the mean of the per-agent gradient norms
+        '''
+        grad_norms = []
+        for optimizer in optimizers:
+            param = optimizer.param_groups[0]['params']
+            if self.args.grad_clip:
+                self.grad_clip(param)
+            grad_norms.append(get_grad_norm(param))
+            optimizer.step()
+        return np.array(grad_norms).mean()
+
     def action_replay_process(self, stat):
         batch = self.replay_buffer.get_batch(self.args.batch_size)
-        batch = self.behaviour_net.Transition(*zip(*batch))
+        if isinstance(batch, list):
+            batch = self.behaviour_net.Transition(*zip(*batch))
         self.action_transition_process(stat, batch)
 
+    def importance_beta(self):
+        '''
+        the importance sampling exponent annealed linearly from prioritized_replay_beta to 1 over prioritized_replay_beta_steps transitions
+        '''
+        progress = min(1.0, self.steps / self.args.prioritized_replay_beta_steps)
+        return self.args.prioritized_replay_beta + progress * (1.0 - self.args.prioritized_replay_beta)
+
     def value_replay_process(self, stat):
+        if self.args.prioritized_replay and self.online:
+            batch, weights, indices = self.replay_buffer.get_weighted_batch(self.args.batch_size, self.importance_beta())
+            weights = cuda_wrapper(torch.from_numpy(weights).contiguous().view(-1, 1), self.cuda_)
+            deltas = self.value_transition_process(stat, batch, weights)
+            self.replay_buffer.update_priorities(indices, deltas.detach().abs().mean(dim=-1).cpu().numpy())
+            return
         batch = self.replay_buffer.get_batch(self.args.batch_size)
-        batch = self.behaviour_net.Transition(*zip(*batch))
+        if isinstance(batch, list):
+            batch = self.behaviour_net.Transition(*zip(*batch))
         self.value_transition_process(stat, batch)
 
     def action_transition_process(self, stat, trans):
-        action_loss, value_loss, log_p_a = self.get_loss(trans)
+        action_loss, log_p_a = self.get_action_loss(trans)
+        if not self.args.shared_parameters:
+            # without shared parameters the action losses of the agents reach disjoint parameters, so their sum needs one backward pass
+            for action_optimizer in self.action_optimizers:
+                action_optimizer.zero_grad()
+            self.action_compute_grad(stat, (action_loss.sum(), log_p_a), False)
+            if self.args.fused_optimizer:
+                stat['policy_grad_norm'] = self.fused_step(self.action_optimizers[0], self.action_params)
+            else:
+                stat['policy_grad_norm'] = self.agent_steps(self.action_optimizers)
+            stat['action_loss'] = action_loss.mean().item()
+            if not self.args.continuous and self.entr > 0:
+                # report the entropy per agent and the action loss with the entropy term as the per-agent backward passes do
+                stat['entropy'] /= self.args.agent_num
+                stat['action_loss'] -= self.entr * stat['entropy']
+            return
         policy_grads = []
         for i in range(self.args.agent_num):
             retain_graph = False if i == self.args.agent_num-1 else True
@@ -98,8 +173,18 @@ class PGTrainer(object):
         stat['policy_grad_norm'] = np.array(policy_grad_norms).mean()
         stat['action_loss'] = action_loss.mean().item()
 
-    def value_transition_process(self, stat, trans):
-        action_loss, value_loss, log_p_a = self.get_loss(trans)
+    def value_transition_process(self, stat, trans, weights=None):
+        value_loss, deltas = self.get_value_loss(trans, weights)
+        if not self.args.shared_parameters:
+            for value_optimizer in self.value_optimizers:
+                value_optimizer.zero_grad()
+            self.value_compute_grad(value_loss.sum(), False)
+            if self.args.fused_optimizer:
+                stat['value_grad_norm'] = self.fused_step(self.value_optimizers[0], self.value_params)
+            else:
+                stat['value_grad_norm'] = self.agent_steps(self.value_optimizers)
+            stat['value_loss'] = value_loss.mean().item()
+            return deltas
         value_grads = []
         for i in range(self.args.agent_num):
             retain_graph = False if i == self.args.agent_num-1 else True
@@ -121,9 +206,13 @@ class PGTrainer(object):
             value_optimizer.step()
         stat['value_grad_norm'] = np.array(value_grad_norms).mean()
         stat['value_loss'] = value_loss.mean().item()
+        return deltas
 
     def run(self, stat):
-        self.behaviour_net.train_process(stat, self)
+        if self.args.num_envs > 1:
+            self.behaviour_net.vectorized_train_process(stat, self)
+        else:
+            self.behaviour_net.train_process(stat, self)
         self.entr += self.entr_inc
 
     def logging(self, stat):
@@ -139,3 +228,10 @@ class PGTrainer(object):
         entropy = stat.get('entropy', 0)
         print ('Episode: {:4d}, Mean Reward: {:2.4f}, Action Loss: {:2.4f}, Value Loss is: {:2.4f}, Entropy: {:2.4f}\n'\
         .format(self.episodes, stat['mean_reward'], action_loss+self.entr*entropy, value_loss, entropy))
+
+    def close(self):
+        '''
+        stop the worker processes of the environment copies
+        '''
+        if self.args.num_envs > 1:
+            self.vec_env.close()
@@ -50,7 +50,19 @@ def multinomials_log_density(actions, logits):
     assert logits.size(-1) > 1
     return GumbelSoftmax(logits=logits).log_prob(actions)
 
-def select_action(args, logits, status='train', exploration=True, info={}):
+def select_action(args, logits, status='train', exploration=True, info={}, return_index=False):
+    '''
+    with return_index=True the indices of one-hot actions with the shape of (b, n) are returned as well in one
+    device-to-host transfer, or None when the actions are continuous or soft (i.e. gumbel softmax in training)
+    '''
+    action = sample_action(args, logits, status=status, exploration=exploration, info=info)
+    if not return_index:
+        return action
+    if args.continuous or (args.gumbel_softmax and status is 'train'):
+        return action, None
+    return action, torch.argmax(action, dim=-1).cpu().numpy()
+
+def sample_action(args, logits, status='train', exploration=True, info={}):
     if args.continuous:
         act_mean = logits
         act_std = cuda_wrapper(torch.ones_like(act_mean), args.cuda)
@@ -79,10 +91,15 @@ def select_action(args, logits, status='train', exploration=True, info={}):
             p_a = torch.softmax(logits, dim=-1)
             return  (p_a == torch.max(p_a, dim=-1, keepdim=True)[0]).float()
 
-def translate_action(args, action, env):
+def translate_action(args, action, env, index=None):
+    '''
+    the environments which accept index arrays (i.e. index_action_input) get the indices from select_action with the shape
+    of (n,), others get the actions with the shape of (n, a) in one device-to-host transfer
+    '''
     if not args.continuous:
-        actual = [act.detach().squeeze().cpu().numpy() for act in torch.unbind(action, 1)]
-        return action, actual
+        if index is not None and getattr(env, 'index_action_input', False):
+            return action, index[0]
+        return action, action.detach()[0].cpu().numpy()
     else:
         actions = action.data[0].numpy()
         cp_actions = actions.copy()
@@ -142,24 +159,3 @@ def unpack_data(args, batch):
     state = cuda_wrapper(prep_obs(list(zip(batch.state))), cuda)
     next_state = cuda_wrapper(prep_obs(list(zip(batch.next_state))), cuda)
     return (rewards, last_step, done, actions, last_actions, state, next_state)
-
-def n_step(rewards, last_step, done, next_values, n_step, args):
-    cuda = torch.cuda.is_available() and args.cuda
-    returns = cuda_wrapper(torch.zeros_like(rewards), cuda=cuda)
-    i = rewards.size(0)-1
-    while i >= 0:
-        if last_step[i]:
-            next_return = 0 if done[i] else next_values[i].detach()
-            for j in reversed(range(i-n_step+1, i+1)):
-                returns[j] = rewards[j] + args.gamma * next_return
-                next_return = returns[j]
-            i -= n_step
-            continue
-        else:
-            next_return = next_values[i+n_step-1].detach()
-        for j in reversed(range(n_step)):
-            g = rewards[i+j] + args.gamma * next_return
-            next_return = g
-        returns[i] = g.detach()
-        i -= 1
-    return returns
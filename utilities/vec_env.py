@@ -0,0 +1,94 @@
+import random
+import multiprocessing as mp
+import numpy as np
+
+
+
+def worker(rank, env, pipe, buffers, seed):
+    '''
+    step one copy of the environment on the commands received from the pipe, the observations,
+    the rewards and the dones of this copy are written into its rows of the shared buffers
+    '''
+    obs, actions, rewards, dones = buffers
+    np.random.seed(seed)
+    random.seed(seed)
+    while True:
+        cmd = pipe.recv()
+        if cmd == 'step':
+            _, reward, done, debug = env.step(list(actions[rank]), obs_out=obs[rank])
+            if isinstance(done, list): done = np.sum(done)
+            rewards[rank] = reward
+            dones[rank] = done
+            pipe.send(debug)
+        elif cmd == 'reset':
+            env.reset(obs_out=obs[rank])
+            pipe.send(None)
+        elif cmd == 'close':
+            pipe.close()
+            break
+        else:
+            raise RuntimeError('Please enter a correct command, e.g. step, reset or close.')
+
+
+
+class SubprocVecEnv(object):
+    '''
+    run num_envs copies of an environment (e.g. MultiAgentEnv, TrafficJunctionEnv or PredatorPreyEnv) in worker processes,
+    the copies are forked from env and exchange the observations, the actions, the rewards and the dones through
+    shared memory, so that only the commands and the debug dicts pass the pipes
+    '''
+
+    def __init__(self, env, num_envs, action_dim, seed=0):
+        self.num_envs = num_envs
+        obs = np.array(env.reset())
+        self.n, self.obs_dim = obs.shape
+        self.action_dim = action_dim
+        # the workers are forked because the scenario callbacks of the environments can not be pickled
+        context = mp.get_context('fork')
+        shapes = [(num_envs, self.n, self.obs_dim), (num_envs, self.n, action_dim), (num_envs, self.n), (num_envs,)]
+        raws = [context.RawArray('f', int(np.prod(shape))) for shape in shapes]
+        self.obs, self.actions, self.rewards, self.dones = [np.frombuffer(raw, dtype=np.float32).reshape(shape) for raw, shape in zip(raws, shapes)]
+        self.pipes = []
+        self.processes = []
+        for rank in range(num_envs):
+            pipe, worker_pipe = context.Pipe()
+            process = context.Process(target=worker, args=(rank, env, worker_pipe, (self.obs, self.actions, self.rewards, self.dones), seed+rank), daemon=True)
+            process.start()
+            worker_pipe.close()
+            self.pipes.append(pipe)
+            self.processes.append(process)
+        self.closed = False
+
+    def __len__(self):
+        return self.num_envs
+
+    def step(self, actions):
+        '''
+        step all copies with the actions with the shape of (k, n, a) and return the next observations with the shape of (k, n, o),
+        the rewards with the shape of (k, n), the dones with the shape of (k) and the list of debug dicts
+        '''
+        self.actions[:] = actions
+        for pipe in self.pipes:
+            pipe.send('step')
+        debugs = [pipe.recv() for pipe in self.pipes]
+        return self.obs.copy(), self.rewards.copy(), self.dones.astype(bool), debugs
+
+    def reset(self, mask=None):
+        '''
+        reset the copies selected by the boolean mask with the shape of (k) (all by default) and return the observations of all copies
+        '''
+        ranks = range(self.num_envs) if mask is None else np.flatnonzero(mask)
+        for rank in ranks:
+            self.pipes[rank].send('reset')
+        for rank in ranks:
+            self.pipes[rank].recv()
+        return self.obs.copy()
+
+    def close(self):
+        if self.closed:
+            return
+        for pipe in self.pipes:
+            pipe.send('close')
+        for process in self.processes:
+            process.join()
+        self.closed = True